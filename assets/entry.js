@@ -12,6 +12,7 @@ import './css/main.scss';
 import ResourceSelect from './js/components/ResourceSelect.vue';
 import ResourceTable from './js/components/ResourceTable.vue';
 import DatePicker from './js/components/DatePickerField.vue';
+import Timeline from './js/components/Timeline.vue';
 
 window.createResourceSelect = (selector, name, options, initialSelection) => {
   const app = createApp({
@@ -21,9 +22,9 @@ window.createResourceSelect = (selector, name, options, initialSelection) => {
   app.mount(selector);
 };
 
-window.createResourceTable = ({ mount, fieldName, rows, resourceType }) => {
+window.createResourceTable = ({ mount, fieldName, resourceType, url, page, editable }) => {
   createApp({
-    render: () => h(ResourceTable, { fieldName, resourceType, rows }),
+    render: () => h(ResourceTable, { fieldName, resourceType, url, page, editable }),
   }).mount(mount);
 };
 
@@ -32,3 +33,9 @@ window.createDatePicker = (mount, props) => {
     render: () => h(DatePicker, props),
   }).mount(mount);
 };
+
+window.createTimeline = ({ mount, url, page }) => {
+  createApp({
+    render: () => h(Timeline, { url, page }),
+  }).mount(mount);
+};
@@ -1,16 +1,24 @@
 from flask import Flask, render_template, session, redirect, request, url_for, flash
-from sqlalchemy import select
 
 from crm.auth import has_role, require_auth
 from crm.views.auth import blueprint as auth_blueprint
 from crm.views.settings import blueprint as settings_blueprint
 from crm.views.resource import blueprint as resource_blueprint
+from crm.views.reports import blueprint as reports_blueprint
+from crm.views.imports import blueprint as imports_blueprint
+from crm.views.exports import blueprint as exports_blueprint
 import crm.db
+import crm.log_writer
+import crm.log_archive
+import crm.reports
+import crm.exchange_rates
+import crm.imports
+import crm.exports
+import crm.passwords
 
 from crm.config import get_config
-from crm.models import Account, Resource, User, Opportunity, SalesOrder
+from crm.models import Account, User, Opportunity, SalesOrder, UserWork
 from crm.models.user import UserRole
-from crm.models.resource import ResourceUserAssignment
 from crm.access import AccessType
 from crm.utils import generate_random_string
 
@@ -20,6 +28,13 @@ def create_app():
     app.config.from_object(get_config(app))
 
     crm.db.init_app(app)
+    crm.log_writer.init_app(app)
+    crm.log_archive.init_app(app)
+    crm.reports.init_app(app)
+    crm.exchange_rates.init_app(app)
+    crm.imports.init_app(app)
+    crm.exports.init_app(app)
+    crm.passwords.init_app(app)
 
     @app.route('/ping')
     def healthcheck():
@@ -28,35 +43,10 @@ def create_app():
     @app.route('/')
     @require_auth
     def dashboard():
-        accounts = Account.from_statement(
-            select(Account.model) \
-                .join(Resource, Resource.account_id == Account.model.variant_id) \
-                .join(ResourceUserAssignment, ResourceUserAssignment.resource_id == Resource.id) \
-                .where(ResourceUserAssignment.user_id == session['user_id'])
-                .union_all(
-                    select(Account.model).where(Account.model.created_by_id == session['user_id'])
-                )
-        )
-
-        opportunities = Opportunity.from_statement(
-            select(Opportunity.model) \
-                .join(Resource, Resource.opportunity_id == Opportunity.model.variant_id) \
-                .join(ResourceUserAssignment, ResourceUserAssignment.resource_id == Resource.id) \
-                .where(ResourceUserAssignment.user_id == session['user_id']) \
-                .union_all(
-                    select(Opportunity.model).where(Opportunity.model.created_by_id == session['user_id'])
-                )
-        )
-
-        sales_orders = SalesOrder.from_statement(
-            select(SalesOrder.model) \
-                .join(Resource, Resource.salesorder_id == SalesOrder.model.variant_id) \
-                .join(ResourceUserAssignment, ResourceUserAssignment.resource_id == Resource.id) \
-                .where(ResourceUserAssignment.user_id == session['user_id']) \
-                .union_all(
-                    select(SalesOrder.model).where(SalesOrder.model.created_by_id == session['user_id'])
-                )
-        )
+        # The cards show the titles and descriptions only
+        accounts = UserWork.resources(session['user_id'], 'Account', projection=[ 'description' ])
+        opportunities = UserWork.resources(session['user_id'], 'Opportunity', prefetch=[ 'account' ], projection=[ 'description' ])
+        sales_orders = UserWork.resources(session['user_id'], 'SalesOrder', prefetch=[ 'opportunity.account' ], projection=[ 'description' ])
 
         return render_template('dashboard.html', accounts=accounts, opportunities=opportunities, sales_orders=sales_orders)
 
@@ -99,5 +89,8 @@ def create_app():
     app.register_blueprint(auth_blueprint)
     app.register_blueprint(settings_blueprint)
     app.register_blueprint(resource_blueprint)
+    app.register_blueprint(reports_blueprint)
+    app.register_blueprint(imports_blueprint)
+    app.register_blueprint(exports_blueprint)
 
     return app
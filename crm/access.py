@@ -46,19 +46,24 @@ class AccessControlList:
             if acl is None:
                 raise ValueError(f'Invalid ACL string: unknown access type identifier {acl_name}')
 
-    def check(self, resource, user, access_type):
-        from crm.models.user import UserRole
-
-        acl = []
+    def groups(self, access_type):
+        """
+        Returns the access groups which are granted the given type of access.
+        """
 
         if access_type == AccessType.Read:
-            acl = self.read
+            return self.read
         elif access_type == AccessType.Write:
-            acl = self.write
+            return self.write
         elif access_type == AccessType.Create:
-            acl = self.create
+            return self.create
         else:
-            acl = self.delete
+            return self.delete
+
+    def check(self, resource, user, access_type):
+        from crm.models.user import UserRole
+
+        acl = self.groups(access_type)
 
         print(acl, resource, user, access_type)
 
@@ -66,7 +71,46 @@ class AccessControlList:
             (user == resource and AccessControlGroup.Self in acl) or \
             (resource.created_by and resource.created_by == user and AccessControlGroup.Owner in acl) or \
             (user in resource.assigned_users and AccessControlGroup.Assigned in acl) or \
-            (user.role == UserRole.Administrator and AccessControlGroup.Admin in acl)
+            (user.role == UserRole.Administrator and AccessControlGroup.Admin in acl) or \
+            (AccessControlGroup.Group in acl and resource.is_shared_with(user))
+
+    def condition(self, resource_cls, user, access_type):
+        """
+        Returns an SQL expression over the model of `resource_cls`, which is true for the
+        resources to which the user has the given type of access. This is the equivalent
+        of `check` for filtering queries.
+        """
+
+        from sqlalchemy import true, false, or_, exists
+        from crm.models.user import UserRole
+        from crm.models.group import UserGroup
+        from crm.models.resource import ResourceUserAssignment
+
+        acl = self.groups(access_type)
+        model = resource_cls.model
+        user_id = user.instance.variant_id
+
+        if AccessControlGroup.Other in acl or (user.role == UserRole.Administrator and AccessControlGroup.Admin in acl):
+            return true()
+
+        conditions = []
+
+        if AccessControlGroup.Self in acl and isinstance(user, resource_cls):
+            conditions.append(model.variant_id == user_id)
+
+        if AccessControlGroup.Owner in acl:
+            conditions.append(model.created_by_id == user_id)
+
+        if AccessControlGroup.Assigned in acl:
+            conditions.append(exists().where(
+                ResourceUserAssignment.resource_id == model.resource_id,
+                ResourceUserAssignment.user_id == user_id,
+            ))
+
+        if AccessControlGroup.Group in acl:
+            conditions.append(UserGroup.condition(model.resource_id, user_id))
+
+        return or_(false(), *conditions)
 
 
 class AccessType(Enum):
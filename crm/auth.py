@@ -1,7 +1,9 @@
 import functools
-from flask import request, session, redirect, flash, url_for
+from flask import request, session, redirect, flash, url_for, has_request_context, g
+from sqlalchemy import select
 
 from crm.models.user import User, UserRole
+from crm.db import db
 from crm.utils import generate_random_string
 
 
@@ -35,6 +37,9 @@ def require_role(role):
 
 
 def get_session_user():
+    if not has_request_context():
+        return None
+
     return User.get(session['user_id']) if 'user_id' in session else None
 
 
@@ -54,13 +59,62 @@ def check_csrf(handler):
     return wrapper
 
 
+def load_principal(user_id):
+    """
+    Loads the user's ID, role, groups and `principal_version` from the database,
+    or returns `None` if there is no such user.
+
+    The groups include the groups above the user's own groups, see `crm.models.group`.
+    """
+
+    from crm.models.group import UserGroup
+
+    row = db.session.execute(
+        select(User.model.principal_version, User.model.role).where(User.model.variant_id == user_id)
+    ).first()
+
+    if row is None:
+        return None
+
+    return dict(user_id=user_id, version=row.principal_version, role=row.role, groups=UserGroup.group_ids(user_id))
+
+
+def get_session_principal():
+    """
+    Returns the principal of the session's user, see `load_principal`, as cached in the session.
+
+    The cached principal is checked against the user's `principal_version` once per request,
+    and reloaded if the role, the password or the groups of the user have changed since it was cached.
+    """
+
+    if not has_request_context() or 'user_id' not in session:
+        return None
+
+    if 'principal' in g:
+        return g.principal
+
+    principal = session.get('principal')
+
+    version = db.session.execute(
+        select(User.model.principal_version).where(User.model.variant_id == session['user_id'])
+    ).scalar()
+
+    if version is None:
+        principal = None
+        session.pop('principal', None)
+    elif principal is None or principal['user_id'] != session['user_id'] or principal['version'] != version:
+        principal = load_principal(session['user_id'])
+        session['principal'] = principal
+
+    g.principal = principal
+
+    return principal
+
+
 def has_role(role):
     if isinstance(role, str):
         role = UserRole(role)
 
-    if 'user_id' not in session:
-        return False
-
-    user = User.get(session['user_id'])
+    principal = get_session_principal()
 
-    return user is not None and user.role == role
+    return principal is not None and principal['role'] == role.value
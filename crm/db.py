@@ -11,6 +11,35 @@ import crm.models
 def get_db():
     return db
 
+def insert_ignore(table):
+    """
+    Returns an INSERT statement for the table, which skips rows conflicting with existing rows.
+    """
+
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    return insert(table).on_conflict_do_nothing()
+
+def insert_or_update(table, keys):
+    """
+    Returns an INSERT statement for the table, which overwrites the rows conflicting on the `keys` columns.
+    """
+
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    statement = insert(table)
+
+    return statement.on_conflict_do_update(
+        index_elements=keys,
+        set_={ column.name: statement.excluded[column.name] for column in table.columns if column.name not in keys },
+    )
+
 def close_db(e=None):
     pass
 
@@ -32,11 +61,215 @@ def create_admin_command(username, password):
     admin.save()
 
     print(f'Administrator user account "{username}" created.')
+
+@click.command('user:offboard')
+@click.argument('username')
+@click.argument('successor')
+@with_appcontext
+def offboard_user_command(username, successor):
+    """
+    Reassigns all resources assigned to USERNAME to SUCCESSOR.
+    """
+
+    from crm.models import User
+    from crm.models.resource import ResourceUserAssignment
+
+    users = []
+
+    for name in (username, successor):
+        matches = User.filter_by(username=name)
+
+        if len(matches) == 0:
+            raise click.ClickException(f'No user account "{name}" exists.')
+
+        users.append(matches[0].instance.variant_id)
+
+    reassigned = ResourceUserAssignment.transfer(*users)
+
+    print(f'Reassigned {len(reassigned)} resources from "{username}" to "{successor}".')
+
+@click.command('user:rebuild-work-index')
+@with_appcontext
+def rebuild_work_index_command():
+    """
+    Rebuilds the index of the resources created by and assigned to each user.
+    """
+
+    from crm.models import UserWork
+
+    count = UserWork.rebuild()
+
+    print(f'Indexed {count} user resource relations.')
     
 
+@click.command('user:provision')
+@click.argument('file', type=click.File('r', encoding='utf-8'))
+@click.option('--role', default='Sales', help='Role of the users whose role is not given in the file.')
+@click.option('--batch-size', type=click.IntRange(min=1), default=None, help='Number of users created at a time.')
+@with_appcontext
+def provision_users_command(file, role, batch_size):
+    """
+    Creates user accounts from a CSV file with the columns username, password and optionally role.
+
+    The passwords are hashed in parallel, and the usernames of each batch are checked for uniqueness at once.
+    """
+
+    from crm.imports import Importer, read_rows
+    from crm.models import User
+
+    def with_default_role(rows):
+        for line, row, error in rows:
+            if row is not None and not row.get('role'):
+                row = dict(row, role=role)
+
+            yield line, row, error
+
+    def on_reject(line, errors):
+        click.echo(f'Line {line}: ' + '; '.join(errors), err=True)
+
+    def on_progress(imported, rejected):
+        click.echo(f'{imported} users created, {rejected} rejected.')
+
+    importer = Importer(User, batch_size=batch_size, on_reject=on_reject, on_progress=on_progress)
+
+    try:
+        importer.run(with_default_role(read_rows(file, 'csv', User)))
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+def find_group(name):
+    from crm.models import Group
+
+    group = Group.get_by_name(name)
+
+    if group is None:
+        raise click.ClickException(f'No group "{name}" exists.')
+
+    return group
+
+def find_user_ids(usernames):
+    from crm.models import User
+
+    user_ids = []
+
+    for name in usernames:
+        matches = User.filter_by(username=name)
+
+        if len(matches) == 0:
+            raise click.ClickException(f'No user account "{name}" exists.')
+
+        user_ids.append(matches[0].instance.variant_id)
+
+    return user_ids
+
+@click.command('group:create')
+@click.argument('name')
+@click.option('--parent', default=None, help='Name of the group to create the group under.')
+@with_appcontext
+def create_group_command(name, parent):
+    """
+    Creates a group of users named NAME.
+    """
+
+    from crm.models import Group
+
+    if Group.get_by_name(name) is not None:
+        raise click.ClickException(f'Group "{name}" already exists.')
+
+    Group.create(name, parent_id=find_group(parent).id if parent else None)
+
+    print(f'Group "{name}" created.')
+
+@click.command('group:move')
+@click.argument('name')
+@click.option('--parent', default=None, help='Name of the new parent group. Omit to move the group to the top level.')
+@with_appcontext
+def move_group_command(name, parent):
+    """
+    Moves the group NAME and its subgroups under another group.
+    """
+
+    from crm.models import Group
+
+    try:
+        Group.move(find_group(name).id, find_group(parent).id if parent else None)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    print(f'Group "{name}" moved.')
+
+@click.command('group:delete')
+@click.argument('name')
+@with_appcontext
+def delete_group_command(name):
+    """
+    Deletes the group NAME, which must not have subgroups.
+    """
+
+    from crm.models import Group
+
+    try:
+        Group.remove(find_group(name).id)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    print(f'Group "{name}" deleted.')
+
+@click.command('group:add-members')
+@click.argument('name')
+@click.argument('usernames', nargs=-1, required=True)
+@with_appcontext
+def add_group_members_command(name, usernames):
+    """
+    Adds the users USERNAMES to the group NAME.
+    """
+
+    from crm.models import Group
+
+    Group.add_members(find_group(name).id, find_user_ids(usernames))
+
+    print(f'Added {len(usernames)} users to group "{name}".')
+
+@click.command('group:remove-members')
+@click.argument('name')
+@click.argument('usernames', nargs=-1, required=True)
+@with_appcontext
+def remove_group_members_command(name, usernames):
+    """
+    Removes the users USERNAMES from the group NAME.
+    """
+
+    from crm.models import Group
+
+    Group.remove_members(find_group(name).id, find_user_ids(usernames))
+
+    print(f'Removed {len(usernames)} users from group "{name}".')
+
+@click.command('group:rebuild-closure')
+@with_appcontext
+def rebuild_group_closure_command():
+    """
+    Rebuilds the materialized group hierarchy and memberships.
+    """
+
+    from crm.models import Group
+
+    count = Group.rebuild()
+
+    print(f'Indexed {count} group memberships.')
+
 def init_app(app):
     db.init_app(app)
     migrate.init_app(app, db)
     app.teardown_appcontext(close_db)
     app.cli.add_command(init_db_command)
     app.cli.add_command(create_admin_command)
+    app.cli.add_command(offboard_user_command)
+    app.cli.add_command(rebuild_work_index_command)
+    app.cli.add_command(provision_users_command)
+    app.cli.add_command(create_group_command)
+    app.cli.add_command(move_group_command)
+    app.cli.add_command(delete_group_command)
+    app.cli.add_command(add_group_members_command)
+    app.cli.add_command(remove_group_members_command)
+    app.cli.add_command(rebuild_group_closure_command)
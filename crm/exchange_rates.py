@@ -0,0 +1,175 @@
+"""
+Locally stored exchange rates and conversion of currency amounts between currencies.
+
+Rates are imported from CSV files with `flask rates:import`, so converting amounts
+never requires network access. The CSV files have a header row and the columns
+`date` (YYYY-MM-DD), `currency` and `rate`, eg. `2026-01-02,USD,1.0321`.
+"""
+
+import click
+import csv
+from bisect import bisect_right
+from datetime import date, datetime
+from decimal import Decimal, ROUND_HALF_EVEN
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select
+
+from crm.db import db, insert_or_update
+from crm.fields import currency_precision
+
+
+def import_csv(file):
+    """
+    Imports exchange rates from a CSV file, overwriting existing rates of the same currencies and dates.
+
+    :returns: The number of imported rates.
+    """
+
+    from crm.models import ExchangeRate
+
+    rows = []
+    timestamp = datetime.now()
+
+    for line, row in enumerate(csv.DictReader(file), start=2):
+        try:
+            rows.append(dict(
+                date=date.fromisoformat(row['date'].strip()),
+                currency=row['currency'].strip().upper(),
+                rate=Decimal(row['rate'].strip()),
+                imported_at=timestamp,
+            ))
+        except (KeyError, ValueError, ArithmeticError, AttributeError):
+            raise ValueError(f'Invalid exchange rate on line {line}')
+
+    if len(rows) > 0:
+        db.session.execute(insert_or_update(ExchangeRate.__table__, [ 'currency', 'date' ]), rows)
+        db.session.commit()
+
+    return len(rows)
+
+
+class RateTable:
+    """
+    In-memory copy of the exchange rates of a set of currencies, for converting many amounts at once.
+
+    The rates of each currency are kept as sorted columns of dates and rates, and
+    the rate in effect on a date is found with a binary search. Conversion factors are
+    memoized by currency and date, as reports convert many amounts sharing both.
+    """
+
+    def __init__(self, currencies, base=None):
+        from crm.models import ExchangeRate
+
+        self.base = base or current_app.config['EXCHANGE_RATE_BASE']
+        self.dates = dict()
+        self.rates = dict()
+        self.factors = dict()
+
+        query = select(ExchangeRate.currency, ExchangeRate.date, ExchangeRate.rate) \
+            .where(ExchangeRate.currency.in_(set(currencies) - { self.base })) \
+            .order_by(ExchangeRate.currency, ExchangeRate.date)
+
+        for currency, day, rate in db.session.execute(query):
+            self.dates.setdefault(currency, []).append(day)
+            self.rates.setdefault(currency, []).append(Decimal(rate))
+
+    def rate(self, currency, day):
+        """
+        Returns the rate of a currency in effect on a date, or `None` if there is none.
+        """
+
+        if currency == self.base:
+            return Decimal(1)
+
+        dates = self.dates.get(currency)
+
+        if dates is None:
+            return None
+
+        i = bisect_right(dates, day) - 1
+
+        if i < 0:
+            return None
+
+        return self.rates[currency][i]
+
+    def factor(self, source, target, day):
+        """
+        Returns the factor which converts minor units of the source currency into minor units of the target currency.
+        """
+
+        key = (source, target, day)
+
+        if key not in self.factors:
+            source_rate = self.rate(source, day)
+            target_rate = self.rate(target, day)
+
+            if source_rate is None or target_rate is None:
+                factor = None
+            else:
+                scale = currency_precision(target) - currency_precision(source)
+                factor = (target_rate / source_rate).scaleb(scale)
+
+            self.factors[key] = factor
+
+        return self.factors[key]
+
+    def convert(self, amounts, currencies, dates, target):
+        """
+        Converts columns of amounts in minor units into minor units of the target currency.
+
+        :param amounts: Amounts in the minor units of their currencies.
+        :param currencies: Currencies of the amounts. Amounts without one are in the base currency.
+        :param dates: Dates whose rates are used for the amounts. `None` uses the latest rates.
+        :returns: List of the converted amounts, with `None` for the amounts which could not be converted.
+        """
+
+        today = date.today()
+        groups = dict()
+
+        # Amounts sharing a currency and a date share a conversion factor, so the
+        # factor is looked up once per group and applied to all of its amounts.
+        for i, (amount, currency, day) in enumerate(zip(amounts, currencies, dates)):
+            if amount is None:
+                continue
+
+            if day is None:
+                day = today
+            elif isinstance(day, datetime):
+                day = day.date()
+
+            groups.setdefault((currency or self.base, day), []).append(i)
+
+        converted = [ None ] * len(amounts)
+
+        for (currency, day), indices in groups.items():
+            factor = self.factor(currency, target, day)
+
+            if factor is None:
+                continue
+
+            for i in indices:
+                converted[i] = int((amounts[i] * factor).to_integral_value(ROUND_HALF_EVEN))
+
+        return converted
+
+
+@click.command('rates:import')
+@click.argument('file', type=click.File('r'))
+@with_appcontext
+def import_rates_command(file):
+    """
+    Imports exchange rates from a CSV file with the columns date, currency and rate.
+    """
+
+    try:
+        count = import_csv(file)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    print(f'Imported {count} exchange rates.')
+
+
+def init_app(app):
+    app.cli.add_command(import_rates_command)
@@ -0,0 +1,126 @@
+"""
+Streaming export of resources into CSV and JSON Lines files.
+
+Only the columns of the exported fields are selected, without loading the rows as
+ORM objects or wrapping them in resources, and the rows are fetched in batches with
+a server-side cursor where the database supports one. Memory use therefore does not
+depend on the number of resources. Values are written in the resource log's JSON
+representation, which `crm.imports` reads back.
+"""
+
+import click
+import csv
+import io
+import json
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select
+
+from crm.db import db
+
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+# Size of the chunks of text yielded by `export_chunks`
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+def export_fields(resource_type):
+    """
+    Returns the fields of a resource type which are exported, see `Field.export_columns`.
+    """
+
+    return [ field for field in resource_type._fields.values() if len(field.export_columns()) > 0 ]
+
+
+def export_rows(resource_type):
+    """
+    Yields the resources of a type as dictionaries of their resource IDs, as "id", and the values of their exported fields.
+    """
+
+    model = resource_type.model
+    columns = [ model.resource_id ]
+    fields = []
+
+    for field in export_fields(resource_type):
+        field_columns = field.export_columns()
+        fields.append((field, len(columns), len(columns) + len(field_columns)))
+        columns.extend(field_columns)
+
+    query = select(*columns) \
+        .order_by(model.variant_id) \
+        .execution_options(yield_per=current_app.config['EXPORT_BATCH_SIZE'])
+
+    for row in db.session.execute(query):
+        values = dict(id=row[0])
+
+        for field, start, end in fields:
+            values[field.name] = field.export(*row[start:end])
+
+        yield values
+
+
+def format_csv_value(value):
+    if value is None:
+        return ''
+
+    # Currency amounts are written as eg. "12.50 EUR"
+    if isinstance(value, list):
+        return ' '.join(str(part) for part in value if part is not None)
+
+    return value
+
+
+def export_chunks(resource_type, format):
+    """
+    Yields the contents of an export file of all the resources of a type in chunks of text.
+    """
+
+    if format not in EXPORT_FORMATS:
+        raise ValueError('Unknown export format: ' + format)
+
+    names = [ 'id' ] + [ field.name for field in export_fields(resource_type) ]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    if format == 'csv':
+        writer.writerow(names)
+
+    for values in export_rows(resource_type):
+        if format == 'csv':
+            writer.writerow([ format_csv_value(values[name]) for name in names ])
+        else:
+            buffer.write(json.dumps(values) + '\n')
+
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell() > 0:
+        yield buffer.getvalue()
+
+
+@click.command('crm:export')
+@click.argument('type')
+@click.argument('file', type=click.File('w', encoding='utf-8', lazy=True), default='-')
+@click.option('--format', type=click.Choice(EXPORT_FORMATS), default='csv')
+@with_appcontext
+def export_command(type, file, format):
+    """
+    Exports all resources of a type into a CSV or JSON Lines file, or to the standard output.
+    """
+
+    from crm.models import Resource
+
+    resource_type = Resource.get_type(type)
+
+    if resource_type is None:
+        raise click.ClickException('Unknown resource type: ' + type)
+
+    for chunk in export_chunks(resource_type, format):
+        file.write(chunk)
+
+
+def init_app(app):
+    app.cli.add_command(export_command)
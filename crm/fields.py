@@ -1,8 +1,10 @@
 from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
 from enum import Enum
-from flask import request, redirect
+from flask import current_app, request, redirect
 from sqlalchemy.sql import update, select
-from werkzeug.security import check_password_hash, generate_password_hash
+from werkzeug.security import check_password_hash
 import babel.numbers
 import json
 import sqlalchemy
@@ -13,6 +15,13 @@ from crm.db import db
 from crm.access import AccessControlList
 from crm.mutation import DecoratorMutation, Mutation, mutation
 
+# Number of rows on a page of a `TableField`, and the largest page which can be requested
+TABLE_PAGE_SIZE = 25
+MAX_TABLE_PAGE_SIZE = 200
+
+# Minimum length of passwords, both set in the edit form and imported
+MIN_PASSWORD_LENGTH = 8
+
 
 class ActionContext:
     def __init__(self, bound, edit_session):
@@ -109,8 +118,8 @@ class SetMutation(Mutation):
     def commit(self, resource):
         setattr(resource.instance, self.field.name, self.value)
 
-    def describe(self):
-        return f'Change field "{self.field.label}" to "{self.value}"'
+    def record(self, resource):
+        return self.field.dump(self.field.retrieve(resource)), self.field.dump(self.value)
 
 
 def action(func):
@@ -119,13 +128,22 @@ def action(func):
 
 
 class Field:
-    def __init__(self, column_type, *args, label=None, widget=None, acl=None, **kwargs):
+    # True if tables of resources can be sorted by this field, see `TableField.get_page`
+    sortable = False
+
+    def __init__(self, column_type, *args, label=None, widget=None, acl=None, deferred=False, **kwargs):
         self.name = None
         self.resource = None
         self.label = label
         self.widget = widget
         self.column_type = column_type
         self.acl = acl or AccessControlList()
+
+        # If true, the columns are not loaded until first accessed, unless a projection includes the field
+        self.deferred = deferred
+
+        # Names of the field's columns on the model, assigned by the resource metaclass
+        self.column_names = []
         self.column_args = args
         self.column_kwargs = kwargs
         self.state = FieldState
@@ -163,6 +181,58 @@ class Field:
     def compare(self, stored, value):
         return stored == value
 
+    def dump(self, value):
+        """
+        Converts an in-database value into the JSON representation stored in the resource log.
+        """
+
+        if isinstance(value, date):
+            return value.isoformat()
+
+        return value
+
+    def load(self, value):
+        """
+        Converts a value from the resource log's JSON representation back into the in-database representation.
+        """
+
+        return value
+
+    def restore(self, instance, value):
+        """
+        Writes a value in the resource log's JSON representation into the columns of a database row.
+        """
+
+        setattr(instance, self.name, self.load(value))
+
+    def references(self, value):
+        """
+        Returns the IDs of the resources referred to by a value stored in the resource log.
+        """
+
+        return []
+
+    def parse(self, value):
+        """
+        Converts a value read from an imported CSV or JSON Lines file into a value accepted by `set_value`.
+        """
+
+        return value
+
+    def export_columns(self):
+        """
+        Returns the columns which `export` reads the field's value from. Fields without any are not exported.
+        """
+
+        return [ self.column ]
+
+    def export(self, *values):
+        """
+        Converts the values of the columns returned by `export_columns` into the resource log's JSON representation.
+        """
+
+        return self.dump(values[0])
+
     @mutation
     def set_value(self, ctx, value):
         setattr(ctx.resource.instance, self.name, self.to_storage(value))
@@ -171,11 +241,22 @@ class Field:
     def set_value_action(self, ctx):
         ctx.dispatch(self.set_value(ctx.value))
 
+    @set_value.record
+    def record_set_value(self, resource, value):
+        return self.dump(self.retrieve(resource)), self.dump(self.to_storage(value))
+
     @set_value.describe
-    def describe_set_value(self, value):
-        return f'Change field "{self.label}" to "{value}".'
+    def describe_set_value(self, entry, titles):
+        if entry.new_value is None:
+            return f'Clear field "{self.label}".'
+
+        return f'Change field "{self.label}" to "{entry.new_value}".'
 
     def get_persisted_value(self, resource):
+        # Values loaded in bulk by `BaseResource.prefetch` are used as they are
+        if self.name in resource.prefetched:
+            return resource.prefetched[self.name]
+
         return self.from_storage(self.retrieve(resource))
 
     def get_value(self, bound):
@@ -191,6 +272,8 @@ class Field:
 
 
 class TextField(Field):
+    sortable = True
+
     def __init__(self, *args, widget=None, **kwargs):
         if widget is None:
             widget = 'text'
@@ -205,12 +288,26 @@ class TextField(Field):
 
 
 class DateField(Field):
+    sortable = True
+
     def __init__(self, *args, widget=None, **kwargs):
         if widget is None:
             widget = 'date'
 
         super().__init__(db.DateTime, *args, widget=widget, **kwargs)
 
+    def load(self, value):
+        if value is None:
+            return None
+
+        return datetime.fromisoformat(value)
+
+    def parse(self, value):
+        if isinstance(value, str):
+            return datetime.fromisoformat(value)
+
+        return value
+
     @action
     def set_value_action(self, ctx):
         value = ctx.value
@@ -221,13 +318,47 @@ class DateField(Field):
         ctx.dispatch(self.set_value(value))
 
 
+def default_currency():
+    """
+    Returns the currency of amounts which have none, the base currency of the exchange rates.
+    """
+
+    return current_app.config['EXCHANGE_RATE_BASE']
+
+
+def currency_precision(currency):
+    """
+    Returns the number of decimal digits in the minor unit of a currency, eg. 2 for EUR.
+    """
+
+    return babel.numbers.get_currency_precision(currency or default_currency())
+
+
 @dataclass(eq=True)
 class CurrencyValue:
-    amount: float
+    amount: Decimal
     currency: str
 
     def __str__(self):
-        return babel.numbers.format_currency(self.amount or 0, self.currency or 'EUR')
+        return babel.numbers.format_currency(self.amount or 0, self.currency or default_currency())
+
+    @classmethod
+    def from_minor_units(cls, minor_units, currency):
+        if minor_units is None:
+            return cls(None, currency)
+
+        return cls(Decimal(minor_units).scaleb(-currency_precision(currency)), currency)
+
+    @property
+    def minor_units(self):
+        """
+        The amount as an integer number of the currency's minor units, eg. cents.
+        """
+
+        if self.amount is None:
+            return None
+
+        return int(Decimal(self.amount).scaleb(currency_precision(self.currency)).to_integral_value(ROUND_HALF_EVEN))
 
 
 class CurrencyField(Field):
@@ -238,29 +369,83 @@ class CurrencyField(Field):
         super().__init__(None, *args, widget=widget, **kwargs)
 
     def create_columns(self):
+        # Amounts are stored as exact integer numbers of the currency's minor units
         return [
-            db.Column(self.name + '_amount', db.Integer),
+            db.Column(self.name + '_amount', db.BigInteger),
             db.Column(self.name + '_currency', db.String),
         ]
 
     def retrieve(self, resource):
-        return CurrencyValue(getattr(resource.instance, self.name), getattr(resource.instance, self.name + '_1'))
+        return CurrencyValue.from_minor_units(getattr(resource.instance, self.name), getattr(resource.instance, self.name + '_1'))
+
+    def dump(self, value):
+        return [ None if value.amount is None else str(value.amount), value.currency ]
+
+    def load(self, value):
+        amount, currency = value
+
+        # Older log entries record the amount as a number
+        return CurrencyValue(None if amount is None else Decimal(str(amount)), currency)
+
+    def restore(self, instance, value):
+        value = self.load(value)
+        setattr(instance, self.name, value.minor_units)
+        setattr(instance, self.name + '_1', value.currency)
+
+    def parse(self, value):
+        # Either an amount and a currency as in the resource log, eg. ["12.50", "EUR"],
+        # or the two separated by a space, eg. "12.50 EUR"
+        if isinstance(value, str):
+            value = value.split()
+
+        if not isinstance(value, list) or len(value) not in (1, 2):
+            raise ValueError(f'Invalid amount: {value}')
+
+        amount, currency = value if len(value) == 2 else (value[0], None)
+
+        if amount is None:
+            return None
+
+        try:
+            amount = Decimal(str(amount))
+        except InvalidOperation:
+            raise ValueError(f'Invalid amount: {amount}')
+
+        if currency is not None and currency not in babel.numbers.list_currencies():
+            raise ValueError(f'Unknown currency: {currency}')
+
+        return CurrencyValue(amount, currency)
+
+    def export_columns(self):
+        return [ self.column, getattr(self.resource.model, self.name + '_1') ]
+
+    def export(self, amount, currency):
+        return self.dump(CurrencyValue.from_minor_units(amount, currency))
 
     @mutation
     def set_value(self, ctx, value):
-        setattr(ctx.resource.instance, self.name, value.amount)
+        setattr(ctx.resource.instance, self.name, value.minor_units)
         setattr(ctx.resource.instance, self.name + '_1', value.currency)
 
+    @set_value.record
+    def record_set_value(self, resource, value):
+        # Record the amount as rounded to the stored precision
+        value = CurrencyValue.from_minor_units(value.minor_units, value.currency)
+        return self.dump(self.retrieve(resource)), self.dump(value)
+
     @set_value.describe
-    def describe_set_value(self, value):
-        return f'Set field "{self.label}" to {value}'
+    def describe_set_value(self, entry, titles):
+        return f'Set field "{self.label}" to {self.load(entry.new_value)}'
 
     @action
     def set_value_action(self, ctx):
         if ctx.value == '':
-            amount = 0
+            amount = Decimal(0)
         else:
-            amount = float(ctx.value)
+            try:
+                amount = Decimal(ctx.value)
+            except InvalidOperation:
+                raise ValueError('Invalid amount: ' + ctx.value)
 
         currency = ctx.arguments['currency']
         mutation = self.set_value(CurrencyValue(amount, currency))
@@ -270,6 +455,12 @@ class CurrencyField(Field):
         return babel.numbers.list_currencies()
 
 
+class PasswordHash(str):
+    """
+    A password which has already been hashed, eg. by `crm.passwords.hash_passwords`, and is stored as is.
+    """
+
+
 class PasswordField(Field):
     def __init__(self, *args, widget=None, **kwargs):
         if widget is None:
@@ -278,11 +469,45 @@ class PasswordField(Field):
         super().__init__(db.String, *args, widget=widget, **kwargs)
 
     def to_storage(self, password):
-        return generate_password_hash(password)
+        from crm.passwords import hash_password
+
+        if isinstance(password, PasswordHash):
+            return str(password)
+
+        return hash_password(password)
 
     def from_storage(self, hash):
         return '*******'
 
+    def dump(self, hash):
+        return None
+
+    def export_columns(self):
+        # Password hashes are never exported
+        return []
+
+    def parse(self, value):
+        if not isinstance(value, str):
+            raise ValueError('Invalid password')
+
+        if len(value) < MIN_PASSWORD_LENGTH:
+            raise ValueError(f'Password needs to be at least {MIN_PASSWORD_LENGTH} characters long.')
+
+        return value
+
+    @mutation
+    def set_value(self, ctx, password):
+        setattr(ctx.resource.instance, self.name, self.to_storage(password))
+
+    @set_value.record
+    def record_set_value(self, resource, password):
+        # Neither the password nor its hash is written to the log
+        return None, None
+
+    @set_value.describe
+    def describe_set_value(self, entry, titles):
+        return f'Change field "{self.label}".'
+
     @action
     def set_value_action(self, ctx):
         password = ctx.value
@@ -291,8 +516,10 @@ class PasswordField(Field):
         if password == '':
             return
 
-        if len(password) < 8:
-            ctx.commit_ctx.error('password-length', 'Password needs to be at least 8 characters long.')
+        try:
+            self.parse(password)
+        except ValueError as e:
+            ctx.commit_ctx.error('password-length', str(e))
 
         if confirmation is not None and password != confirmation:
             ctx.commit_ctx.error('password-confirmation', 'Password confirmation does not match.')
@@ -304,6 +531,8 @@ class PasswordField(Field):
 
 
 class ChoiceField(Field):
+    sortable = True
+
     def __init__(self, variants, *args, **kwargs):
         self.variants = variants
 
@@ -353,6 +582,9 @@ class FileField(Field):
         db.session.add(value)
         return value.hash
 
+    def parse(self, value):
+        raise ValueError(f'Field "{self.label}" can not be imported')
+
     @mutation
     def set_value(self, ctx, file):
         from crm.models import File
@@ -384,11 +616,23 @@ class ReferenceField(Field):
         return Resource.get_resource(resource_id)
 
     def to_storage(self, instance):
-        if isinstance(instance, int):
+        if instance is None or isinstance(instance, int):
             return instance
         else:
             return instance.id
 
+    def references(self, value):
+        if value is None:
+            return []
+
+        return [ value ]
+
+    def parse(self, value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid resource ID: {value}')
+
     @action
     def set_value_action(self, ctx):
         from crm.models import Resource
@@ -406,75 +650,100 @@ class ReferenceField(Field):
     def set_value(self, ctx, value):
         setattr(ctx.resource.instance, self.name, self.to_storage(value))
 
+    @set_value.record
+    def record_set_value(self, resource, value):
+        return self.retrieve(resource), self.to_storage(value)
+
     @set_value.describe
-    def describe_set_value(self, value):
-        if isinstance(value, int):
-            from crm.models import Resource
-            value = Resource.get_resource(value)
+    def describe_set_value(self, entry, titles):
+        if entry.new_value is None:
+            return f'Clear field "{self.label}".'
 
-        return f'Change field "{self.label}" to "{value.title()}".'
+        return f'Change field "{self.label}" to "{titles.get(entry.new_value)}".'
 
     def get_options(self):
         return json.dumps([
             { "id": instance.id, "type": self.resource_type.__name__, "title": instance.title() }
-            for instance in self.resource_type.all()
+            for instance in self.resource_type.all(projection=[])
         ])
 
 
 class TableFieldState(FieldState):
+    """
+    Staged changes to the rows of a `TableField`, as the sets of the resource IDs of the added and removed rows.
+
+    Adding a row cancels its staged removal and vice versa, so the sets are always disjoint.
+    """
+
     def __init__(self):
         super().__init__()
 
-        self.added = []
-        self.removed = []
+        self.added = set()
+        self.removed = set()
 
     def stage_mutation(self, mutation):
         if mutation.type == TableField.add_row:
-            id = mutation.args[0]
+            ids = { int(mutation.args[0]) }
+            self.added |= ids - self.removed
+            self.removed -= ids
+        elif mutation.type in (TableField.remove_row, TableField.remove_rows):
+            ids = { int(mutation.args[0]) } if mutation.type == TableField.remove_row else set(map(int, mutation.args[0]))
+            self.removed |= ids - self.added
+            self.added -= ids
+        else:
+            super().stage_mutation(mutation)
 
-            if id in self.removed:
-                self.removed.remove(id)
-            elif id not in self.added:
-                self.added.append(id)
-            else:
-                return
+    def get_mutations(self, bound):
+        mutations = [ bound.field.add_row(id) for id in sorted(self.added) ]
 
-        elif mutation.type == TableField.remove_row:
-            id = mutation.args[0]
+        if len(self.removed) > 0:
+            mutations.append(bound.field.remove_rows(sorted(self.removed)))
 
-            if id in self.added:
-                self.added.remove(id)
-            elif id not in self.removed:
-                self.removed.append(id)
-            else:
-                return
+        return mutations + self.mutations
 
-        super().stage_mutation(mutation)
+    def clear(self):
+        super().clear()
 
-    def get_mutations(self, bound):
-        return self.mutations
+        self.added = set()
+        self.removed = set()
+
+    def is_dirty(self):
+        return super().is_dirty() or len(self.added) > 0 or len(self.removed) > 0
 
     def get_value(self, bound):
-        variant_column_name = bound.foreign_type.__name__.lower() + '_id'
-        resource_model = bound.foreign_type.__resource_model__
-        variant_column = getattr(resource_model, variant_column_name)
+        rows = [ row for row in bound.get_persisted_value() if row.id not in self.removed ]
 
-        added_variant_ids = select(variant_column).where(resource_model.id.in_(self.added))
-        removed_variant_ids = select(variant_column).where(resource_model.id.in_(self.removed))
+        return rows + bound.get_rows(self.added - { row.id for row in rows })
 
-        added_resources = select(bound.foreign_type.model) \
-            .where(bound.foreign_type.model.variant_id.in_(added_variant_ids))
 
-        query = bound.get_query(bound) \
-            .where(not_(bound.foreign_type.model.variant_id.in_(removed_variant_ids))) \
-            .union(added_resources)
+@dataclass
+class TablePage:
+    """
+    A slice of the rows of a `TableField`, alongside the staged changes to the rows.
 
-        query = db.session.query(bound.foreign_type.model).from_statement(query)
+    `rows` and `total` are the persisted rows. The staged changes are applied over
+    them as a diff: the rows with staged removals are flagged, and the rows with staged
+    additions are listed separately, on the first page only.
+    """
 
-        return [
-            bound.foreign_type(from_instance=row[0])
-            for row in db.session.execute(query).all()
-        ]
+    total: int
+    offset: int
+    limit: int
+    rows: list
+    added: list
+    removed: set
+
+    def to_json(self):
+        return {
+            "total": self.total,
+            "offset": self.offset,
+            "limit": self.limit,
+            "rows": [
+                { "id": row.id, "title": row.title(), "removed": row.id in self.removed }
+                for row in self.rows
+            ],
+            "added": [ { "id": row.id, "title": row.title() } for row in self.added ],
+        }
 
 
 class TableField(Field):
@@ -517,28 +786,135 @@ class TableField(Field):
         if ctx.arguments['selected'] == '':
             return
 
-        selected = ctx.arguments['selected'].split(',')
-
-        for id in selected:
-            ctx.dispatch(self.remove_row(id))
+        ctx.dispatch(self.remove_rows([ int(id) for id in ctx.arguments['selected'].split(',') ]))
 
     @mutation
     def remove_row(self, ctx, id):
-        from crm.models import Resource
-        resource = Resource.get_resource(id)
-        resource.fields[self.foreign_field.name].set(None)
-        resource.save()
+        # Staged removals are committed in bulk by `remove_rows`, see `TableFieldState`
+        self.remove_rows.commit_func(self, ctx, [ id ])
+
+    @remove_row.record
+    def record_remove_row(self, resource, id):
+        if len(self.linked_rows(resource.id, [ id ])) == 0:
+            return None
+
+        return int(id), None
 
     @remove_row.describe
-    def describe_remove_row(self, id):
-        from crm.models import Resource
-        resource = Resource.get_resource(id)
-        return f'Remove "{resource.title()}" from "{self.label}".'
+    def describe_remove_row(self, entry, titles):
+        return f'Remove "{titles.get(entry.old_value)}" from "{self.label}".'
+
+    @mutation
+    def remove_rows(self, ctx, ids):
+        """
+        Unlinks the rows by clearing the foreign field of all of them with a single `UPDATE`.
+
+        The foreign resources are not saved one by one. Once the owner has been saved, their
+        log entries, which record the cleared field for their history, are written with a
+        single insert, and the foreign type's `after_unlink` does the rest of their book-keeping.
+        """
+
+        from crm.auth import get_session_user
+        from crm.log_writer import get_log_writer
+        from crm.models import UserWork
+
+        model = self.foreign_type.model
+        column = self.foreign_field.column
+        owner_id = ctx.resource.id
+
+        unlinked = self.linked_rows(owner_id, ids)
+
+        if len(unlinked) == 0:
+            return
+
+        db.session.execute(
+            update(model)
+                .where(model.resource_id.in_(unlinked) & (column == owner_id))
+                .values({ column.key: None })
+                .execution_options(synchronize_session=False)
+        )
+
+        user = get_session_user()
+        subject = user.instance.variant_id if user else None
+        timestamp = datetime.now()
+
+        UserWork.touch(unlinked, timestamp)
+
+        def after_commit():
+            get_log_writer().write([
+                dict(
+                    resource_id=resource_id,
+                    timestamp=timestamp,
+                    subject=subject,
+                    field=self.foreign_field.name,
+                    mutation='set_value',
+                    old_value=owner_id,
+                    new_value=None,
+                )
+                for resource_id in unlinked
+            ])
+
+            self.foreign_type.after_unlink(unlinked, self.foreign_field, owner_id)
+
+        ctx.parent_ctx.after_commit(after_commit)
+
+    @remove_rows.record
+    def record_remove_rows(self, resource, ids):
+        # Only the rows which are still linked are unlinked, see `remove_rows`
+        unlinked = self.linked_rows(resource.id, ids)
+
+        if len(unlinked) == 0:
+            return None
+
+        return unlinked, None
+
+    def linked_rows(self, owner_id, ids):
+        """
+        Returns the sorted IDs of the given rows which are linked to the owner.
+        """
+
+        model = self.foreign_type.model
+        condition = model.resource_id.in_([ int(id) for id in ids ]) & (self.foreign_field.column == owner_id)
+
+        return sorted(db.session.execute(select(model.resource_id).where(condition)).scalars())
+
+    @remove_rows.describe
+    def describe_remove_rows(self, entry, titles):
+        names = ', '.join(f'"{titles.get(id)}"' for id in entry.old_value[:3])
+
+        if len(entry.old_value) > 3:
+            names += f' and {len(entry.old_value) - 3} more'
+
+        return f'Remove {names} from "{self.label}".'
 
     @mutation
     def add_row(self, ctx, id):
         pass
 
+    def references(self, value):
+        if value is None:
+            return []
+
+        if isinstance(value, list):
+            return value[:3]
+
+        return [ value ]
+
+    def dump(self, rows):
+        return [ row.id for row in rows ]
+
+    def parse(self, value):
+        # The rows of the table are imported as the referencing resources
+        raise ValueError(f'Field "{self.label}" can not be imported')
+
+    def export_columns(self):
+        # The rows of the table are exported as the referencing resources
+        return []
+
+    def restore(self, instance, value):
+        # The rows of the table are stored on the referencing resources
+        pass
+
     def persist(self, resource, cache):
         pass
 
@@ -551,15 +927,87 @@ class TableField(Field):
             for i in self.foreign_type.model.query.filter(self.foreign_field.column == resource.id).all()
         ]
 
+    def get_rows(self, ids):
+        """
+        Fetches the foreign resources with the given resource IDs.
+        """
+
+        if len(ids) == 0:
+            return []
+
+        model = self.foreign_type.model
+
+        return [
+            self.foreign_type(from_instance=i)
+            for i in model.query.filter(model.resource_id.in_(sorted(ids))).order_by(model.resource_id).all()
+        ]
+
     def get_query(self, bound):
         if bound.resource.id is None:
             return select(self.foreign_type.model).where(sqlalchemy.sql.false())
 
         return select(self.foreign_type.model).where(self.foreign_field.column == bound.resource.id)
 
+    def count(self, bound):
+        """
+        Returns the number of persisted rows.
+        """
+
+        if bound.resource.id is None:
+            return 0
+
+        return db.session.execute(
+            select(sqlalchemy.func.count()).where(self.foreign_field.column == bound.resource.id)
+        ).scalar()
+
+    def sort_columns(self, sort):
+        """
+        Returns the `ORDER BY` columns of a sort key, which is the name of a sortable field
+        of the foreign type or "id", optionally prefixed with "-" for descending order.
+        """
+
+        model = self.foreign_type.model
+        name = sort[1:] if sort.startswith('-') else sort
+
+        if name == 'id':
+            column = model.resource_id
+        else:
+            field = self.foreign_type._fields.get(name)
+
+            if field is None or not field.sortable:
+                raise ValueError(f'Rows of "{self.label}" can not be sorted by: {name}')
+
+            column = field.column
+
+        if sort.startswith('-'):
+            return [ column.desc(), model.resource_id.desc() ]
+
+        return [ column.asc(), model.resource_id.asc() ]
+
+    def get_page(self, bound, offset=0, limit=TABLE_PAGE_SIZE, sort='id'):
+        """
+        Fetches a page of the rows, sorted by a sort key accepted by `sort_columns`.
+        """
+
+        if offset < 0 or not 0 < limit <= MAX_TABLE_PAGE_SIZE:
+            raise ValueError(f'Expected an offset of at least 0 and a limit between 1 and {MAX_TABLE_PAGE_SIZE}')
+
+        query = self.get_query(bound) \
+            .order_by(*self.sort_columns(sort)) \
+            .offset(offset) \
+            .limit(limit)
+
+        state = bound.state
+
+        return TablePage(
+            total=self.count(bound),
+            offset=offset,
+            limit=limit,
+            rows=[ self.foreign_type(from_instance=i) for i in db.session.execute(query).scalars().all() ],
+            added=self.get_rows(state.added) if offset == 0 else [],
+            removed=set(state.removed),
+        )
+
     @staticmethod
-    def get_value_json(bound):
-        return json.dumps([
-            { "id": row.id, "title": row.title() }
-            for row in bound.get()
-        ])
+    def get_page_data(bound):
+        return bound.get_page(bound).to_json()
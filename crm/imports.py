@@ -0,0 +1,431 @@
+"""
+Bulk import of resources from CSV and JSON Lines files.
+
+The columns of a CSV file, or the keys of the objects in a JSON Lines file, are the
+names of the resource type's fields. Values are converted with the fields' `parse`
+methods and applied with the same `set_value` mutations as the edit form, so each row
+is validated through a `CommitContext`. Valid rows are inserted in batches, each
+committed in a single transaction, and invalid rows are reported without aborting
+the import.
+"""
+
+import click
+import csv
+import json
+from datetime import datetime
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select
+
+from crm.db import db
+from crm.fields import ReferenceField, PasswordField, PasswordHash
+from crm.passwords import hash_passwords
+
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+
+def guess_format(filename):
+    """
+    Returns the import format matching the extension of a file name, or `None`.
+    """
+
+    extension = (filename or '').rsplit('.', 1)[-1].lower()
+
+    if extension == 'csv':
+        return 'csv'
+    elif extension in ('jsonl', 'ndjson'):
+        return 'jsonl'
+
+    return None
+
+
+def read_rows(file, format, resource_type):
+    """
+    Reads the rows of a file lazily.
+
+    :param file: A text file.
+    :returns: Iterator of tuples of the line number, the row as a dictionary and an error message.
+        Either the row or the error message is `None`.
+    :raises ValueError: If a CSV file has columns which are not fields of the resource type.
+    """
+
+    if format == 'csv':
+        reader = csv.DictReader(file)
+        unknown = [ name for name in reader.fieldnames or [] if name not in resource_type._fields and name != 'id' ]
+
+        if len(unknown) > 0:
+            raise ValueError('Unknown fields: ' + ', '.join(unknown))
+
+        return ((reader.line_num, row, None) for row in reader)
+
+    if format == 'jsonl':
+        return read_json_lines(file)
+
+    raise ValueError('Unknown import format: ' + format)
+
+
+def read_json_lines(file):
+    for line, text in enumerate(file, start=1):
+        if text.strip() == '':
+            continue
+
+        try:
+            row = json.loads(text)
+        except ValueError:
+            yield line, None, 'Invalid JSON'
+            continue
+
+        if not isinstance(row, dict):
+            yield line, None, 'Expected a JSON object'
+            continue
+
+        yield line, row, None
+
+
+class Importer:
+    """
+    Creates resources of a type from rows of field values, in batches.
+
+    :param resource_type: Subclass of `BaseResource`.
+    :param user: The user recorded as the creator of the resources and as the author of their log entries, or `None`.
+    :param batch_size: Number of rows committed at a time. Defaults to `IMPORT_BATCH_SIZE`.
+    :param on_reject: Called with the line number and the error messages of every rejected row.
+    :param on_progress: Called with the numbers of imported and rejected rows after every batch.
+    """
+
+    def __init__(self, resource_type, user=None, batch_size=None, on_reject=None, on_progress=None):
+        self.resource_type = resource_type
+        self.subject = user.instance.variant_id if user is not None else None
+        self.batch_size = batch_size or current_app.config['IMPORT_BATCH_SIZE']
+        self.on_reject = on_reject
+        self.on_progress = on_progress
+        self.imported = 0
+        self.rejected = 0
+
+    def run(self, rows):
+        """
+        Imports the rows returned by `read_rows`.
+
+        :returns: The numbers of imported and rejected rows.
+        """
+
+        batch = []
+
+        for line, row, error in rows:
+            if error is not None:
+                self.reject(line, [ error ])
+                continue
+
+            values = self.parse(line, row)
+
+            if values is None:
+                continue
+
+            batch.append((line, values))
+
+            if len(batch) >= self.batch_size:
+                self.write(batch)
+                batch = []
+
+        if len(batch) > 0:
+            self.write(batch)
+
+        return self.imported, self.rejected
+
+    def reject(self, line, errors):
+        self.rejected += 1
+
+        if self.on_reject is not None:
+            self.on_reject(line, errors)
+
+    def parse(self, line, row):
+        """
+        Converts the values of a row with the fields' `parse` methods.
+
+        Empty values are left out, as new resources have no values to clear. The "id" column
+        of files written by `crm.exports` is ignored, as the resources are given new IDs.
+        """
+
+        fields = self.resource_type._fields
+        values = dict()
+        errors = []
+
+        for name, value in row.items():
+            if name == 'id':
+                continue
+
+            if name not in fields:
+                errors.append(f'Unknown field: {name}')
+                continue
+
+            if value is None or value == '':
+                continue
+
+            try:
+                value = fields[name].parse(value)
+            except ValueError as e:
+                errors.append(f'{fields[name].label}: {e}')
+                continue
+
+            if value is not None:
+                values[name] = value
+
+        if len(errors) > 0:
+            self.reject(line, errors)
+            return None
+
+        return values
+
+    def missing_references(self, batch):
+        """
+        Returns the referenced resource IDs of the batch which do not exist or are of the wrong type, by field name.
+
+        Each reference field is checked with a single query, instead of letting the
+        foreign key constraints fail the whole batch.
+        """
+
+        from crm.models import Resource
+
+        missing = dict()
+
+        for name, field in self.resource_type._fields.items():
+            if not isinstance(field, ReferenceField):
+                continue
+
+            ids = { values[name] for _, values in batch if name in values }
+
+            if len(ids) == 0:
+                continue
+
+            query = select(Resource.id).where(Resource.id.in_(ids))
+
+            if field.resource_type is not None:
+                query = query.where(Resource.type == field.resource_type.__name__)
+
+            missing[name] = ids - set(db.session.execute(query).scalars())
+
+        return missing
+
+    def taken_values(self, batch):
+        """
+        Returns the values of the batch's unique fields which are already in use, by field name.
+
+        Each unique field is checked with a single query.
+        """
+
+        taken = dict()
+
+        for name, field in self.resource_type._fields.items():
+            if not field.column_kwargs.get('unique'):
+                continue
+
+            values = { values[name] for _, values in batch if name in values }
+
+            if len(values) == 0:
+                continue
+
+            query = select(field.column).where(field.column.in_(values))
+            taken[name] = set(db.session.execute(query).scalars())
+
+        return taken
+
+    def check(self, batch):
+        """
+        Rejects the rows of the batch which refer to missing resources, or whose unique values are
+        already in use or repeat an earlier row's.
+
+        :returns: The remaining rows.
+        """
+
+        fields = self.resource_type._fields
+        missing = self.missing_references(batch)
+        taken = self.taken_values(batch)
+        remaining = []
+
+        for line, values in batch:
+            errors = [
+                f'{fields[name].label}: Unknown resource ID {values[name]}'
+                for name, ids in missing.items()
+                if values.get(name) in ids
+            ]
+
+            errors += [
+                f'{fields[name].label}: "{values[name]}" is already in use'
+                for name, used in taken.items()
+                if name in values and values[name] in used
+            ]
+
+            if len(errors) > 0:
+                self.reject(line, errors)
+                continue
+
+            for name, used in taken.items():
+                if name in values:
+                    used.add(values[name])
+
+            remaining.append((line, values))
+
+        return remaining
+
+    def hash_passwords(self, batch):
+        """
+        Replaces the passwords of the batch with their hashes, which are computed in parallel.
+        """
+
+        for name, field in self.resource_type._fields.items():
+            if not isinstance(field, PasswordField):
+                continue
+
+            rows = [ values for _, values in batch if name in values ]
+
+            for values, hash in zip(rows, hash_passwords([ values[name] for values in rows ])):
+                values[name] = PasswordHash(hash)
+
+    def write(self, batch):
+        from crm.log_writer import get_log_writer
+        from crm.models import UserWork
+
+        batch = self.check(batch)
+        self.hash_passwords(batch)
+
+        resources = []
+        records = []
+
+        for line, values in batch:
+            resource = self.resource_type()
+            ctx = resource.create_commit_context()
+
+            # The mutations are also staged, as validation reads the new values from the staging state
+            for name, value in values.items():
+                mutation = self.resource_type._fields[name].set_value(value)
+                resource.stage_mutation(mutation)
+                ctx.add(mutation)
+
+            ctx.validate()
+
+            if ctx.has_exceptions():
+                self.reject(line, [ exception.message for exception in ctx.exceptions ])
+                continue
+
+            try:
+                # The old values have to be recorded before the mutations overwrite them
+                mutations = [ mutation_ctx.mutation for mutation_ctx in ctx.mutations ]
+                recorded = [ (mutation, mutation.record(resource)) for mutation in mutations ]
+                ctx.commit()
+            except ValueError as e:
+                self.reject(line, [ str(e) ])
+                continue
+
+            if self.subject is not None:
+                resource.instance.created_by_id = self.subject
+
+            resources.append(resource)
+            records.append([ (mutation, values) for mutation, values in recorded if values is not None ])
+
+        if len(resources) > 0:
+            subject = self.subject
+            timestamp = datetime.now()
+
+            db.session.add_all([ resource.instance for resource in resources ])
+            db.session.flush()
+
+            # The IDs are read before the commit expires the instances
+            resource_ids = [ resource.id for resource in resources ]
+
+            if subject is not None:
+                UserWork.add_created(resources, subject, timestamp)
+
+            self.resource_type.after_import(resources)
+
+            db.session.commit()
+
+            get_log_writer().write([
+                dict(
+                    resource_id=resource_id,
+                    timestamp=timestamp,
+                    subject=subject,
+                    field=mutation.field.name,
+                    mutation=mutation.name,
+                    old_value=old_value,
+                    new_value=new_value,
+                )
+                for resource_id, recorded in zip(resource_ids, records)
+                for mutation, (old_value, new_value) in recorded
+            ])
+
+        self.imported += len(resources)
+
+        if self.on_progress is not None:
+            self.on_progress(self.imported, self.rejected)
+
+
+def import_resources(resource_type, file, format, **kwargs):
+    """
+    Imports resources of a type from a CSV or JSON Lines file.
+
+    :param file: A text file.
+    :param format: Either "csv" or "jsonl".
+    :param kwargs: Passed on to `Importer`.
+    :returns: The numbers of imported and rejected rows.
+    """
+
+    return Importer(resource_type, **kwargs).run(read_rows(file, format, resource_type))
+
+
+@click.command('crm:import')
+@click.argument('type')
+@click.argument('file', type=click.File('r', encoding='utf-8'))
+@click.option('--format', type=click.Choice(IMPORT_FORMATS), default=None, help='Defaults to the extension of the file.')
+@click.option('--batch-size', type=click.IntRange(min=1), default=None, help='Number of rows committed at a time.')
+@click.option('--user', 'username', default=None, help='Username recorded as the creator of the resources.')
+@with_appcontext
+def import_command(type, file, format, batch_size, username):
+    """
+    Imports resources of a type from a CSV or JSON Lines file, whose columns or keys are field names.
+    """
+
+    from crm.models import Resource, User
+
+    resource_type = Resource.get_type(type)
+
+    if resource_type is None:
+        raise click.ClickException('Unknown resource type: ' + type)
+
+    format = format or guess_format(file.name)
+
+    if format is None:
+        raise click.ClickException('Could not tell the format of the file from its name, use --format')
+
+    user = None
+
+    if username is not None:
+        users = User.filter_by(username=username)
+
+        if len(users) == 0:
+            raise click.ClickException('No such user: ' + username)
+
+        user = users[0]
+
+    def on_reject(line, errors):
+        click.echo(f'Line {line}: ' + '; '.join(errors), err=True)
+
+    def on_progress(imported, rejected):
+        click.echo(f'{imported} rows imported, {rejected} rejected.')
+
+    try:
+        import_resources(
+            resource_type,
+            file,
+            format,
+            user=user,
+            batch_size=batch_size,
+            on_reject=on_reject,
+            on_progress=on_progress,
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+
+def init_app(app):
+    app.cli.add_command(import_command)
@@ -0,0 +1,346 @@
+"""
+Monthly partitioning, retention and archival of the resource log.
+
+On PostgreSQL the `resource_log` table is declaratively partitioned by month on
+its `timestamp` column. On other databases the table holds the recent months
+and older months are rolled into tables of their own. Months which fall outside
+of the retention period are detached from the log and written into gzip compressed
+JSONL archive segments, each accompanied by a small JSON index.
+"""
+
+import click
+import gzip
+import json
+import os
+from datetime import datetime
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import MetaData, Table, Column, select, insert, delete, func, text
+
+from crm.db import db
+from crm.utils import add_months
+
+
+def month_of(timestamp):
+    return datetime(timestamp.year, timestamp.month, 1)
+
+
+def partition_name(month):
+    return f'resource_log_y{month.year:04d}m{month.month:02d}'
+
+
+def partition_month(name):
+    return datetime.strptime(name[len('resource_log_'):], 'y%Ym%m')
+
+
+def is_partitioned():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def log_table(name):
+    """
+    Returns a table with the columns of `resource_log` but without its constraints.
+    """
+
+    from crm.models import ResourceLog
+
+    columns = [ Column(column.name, column.type) for column in ResourceLog.__table__.columns ]
+    return Table(name, MetaData(), *columns)
+
+
+def list_partitions():
+    """
+    Returns the names of the monthly partitions attached to the `resource_log` table.
+    """
+
+    if not is_partitioned():
+        return []
+
+    rows = db.session.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'resource_log' AND c.relname <> 'resource_log_default'"
+    ))
+
+    return sorted(row[0] for row in rows)
+
+
+def list_detached():
+    """
+    Returns the names of the monthly log tables which are no longer a part of the
+    `resource_log` table and are waiting to be archived.
+    """
+
+    inspector = db.inspect(db.engine)
+    attached = set(list_partitions())
+
+    return sorted(
+        name for name in inspector.get_table_names()
+        if name.startswith('resource_log_y') and name not in attached
+    )
+
+
+def create_partitions(months_ahead):
+    """
+    Creates the partitions for the current month and `months_ahead` months after it.
+
+    Rows which have already been written into the default partition are moved into the new partitions.
+    """
+
+    if not is_partitioned():
+        return []
+
+    existing = set(list_partitions())
+    created = []
+    month = month_of(datetime.now())
+
+    for i in range(months_ahead + 1):
+        start = add_months(month, i)
+        end = add_months(start, 1)
+        name = partition_name(start)
+
+        if name in existing:
+            continue
+
+        bounds = dict(start=start, end=end)
+
+        db.session.execute(text(f'CREATE TABLE {name} (LIKE resource_log INCLUDING DEFAULTS)'))
+        db.session.execute(text(
+            f'INSERT INTO {name} SELECT * FROM resource_log_default '
+            'WHERE timestamp >= :start AND timestamp < :end'
+        ), bounds)
+        db.session.execute(text(
+            'DELETE FROM resource_log_default WHERE timestamp >= :start AND timestamp < :end'
+        ), bounds)
+        db.session.execute(text(
+            f'ALTER TABLE resource_log ATTACH PARTITION {name} '
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        ))
+
+        created.append(name)
+
+    db.session.commit()
+
+    return created
+
+
+def detach_before(cutoff):
+    """
+    Removes the months preceding `cutoff` from the `resource_log` table.
+
+    On PostgreSQL the monthly partitions are detached. Elsewhere the rows are
+    moved into monthly tables of their own.
+
+    Before any rows are removed, a snapshot is captured of every affected resource
+    at its last entry before `cutoff`, so that the remaining log entries can still
+    be replayed on top of it. See `ResourceSnapshot`.
+
+    :returns: Names of the detached tables.
+    """
+
+    from crm.models import ResourceLog, ResourceSnapshot
+
+    resource_ids = db.session.execute(
+        select(ResourceLog.resource_id).where(ResourceLog.timestamp < cutoff).distinct()
+    ).scalars().all()
+
+    ResourceSnapshot.capture_many(resource_ids, until=cutoff)
+
+    detached = []
+
+    if is_partitioned():
+        for name in list_partitions():
+            if add_months(partition_month(name), 1) <= cutoff:
+                db.session.execute(text(f'ALTER TABLE resource_log DETACH PARTITION {name}'))
+                detached.append(name)
+
+        db.session.commit()
+        return detached
+
+    table = ResourceLog.__table__
+    oldest = db.session.execute(select(func.min(table.c.timestamp))).scalar()
+
+    if oldest is None:
+        return detached
+
+    month = month_of(oldest)
+
+    while add_months(month, 1) <= cutoff:
+        end = add_months(month, 1)
+        in_month = (table.c.timestamp >= month) & (table.c.timestamp < end)
+
+        if db.session.execute(select(table.c.id).where(in_month).limit(1)).first() is None:
+            month = end
+            continue
+
+        target = log_table(partition_name(month))
+        target.create(db.session.connection(), checkfirst=True)
+
+        db.session.execute(insert(target).from_select(
+            [ column.name for column in table.columns ],
+            select(*table.columns).where(in_month),
+        ))
+        db.session.execute(delete(table).where(in_month))
+
+        detached.append(target.name)
+        month = end
+
+    db.session.commit()
+
+    return detached
+
+
+def archive_table(name, directory):
+    """
+    Writes the rows of a detached log table into an archive segment and drops the table.
+
+    The segment `<name>.jsonl.gz` contains one entry per line, ordered by resource and time.
+    The index `<name>.index.json` records the time and ID ranges of the segment, as well as
+    the range of lines occupied by each resource.
+    """
+
+    table = log_table(name)
+    segment_path = os.path.join(directory, name + '.jsonl.gz')
+    index_path = os.path.join(directory, name + '.index.json')
+
+    index = dict(
+        table=name,
+        month=partition_month(name).strftime('%Y-%m'),
+        count=0,
+        first_timestamp=None,
+        last_timestamp=None,
+        first_id=None,
+        last_id=None,
+        resources=dict(),
+    )
+
+    query = select(table) \
+        .order_by(table.c.resource_id, table.c.timestamp, table.c.id) \
+        .execution_options(stream_results=True)
+
+    with gzip.open(segment_path + '.tmp', 'wt', encoding='utf-8') as segment:
+        for line, row in enumerate(db.session.execute(query).yield_per(1000)):
+            entry = dict(row._mapping)
+            entry['timestamp'] = entry['timestamp'].isoformat()
+            segment.write(json.dumps(entry, separators=(',', ':')) + '\n')
+
+            timestamp = entry['timestamp']
+            resource = index['resources'].setdefault(str(entry['resource_id']), [line, 0])
+            resource[1] += 1
+
+            index['count'] += 1
+            index['first_timestamp'] = min(index['first_timestamp'] or timestamp, timestamp)
+            index['last_timestamp'] = max(index['last_timestamp'] or timestamp, timestamp)
+            index['first_id'] = min(index['first_id'] or entry['id'], entry['id'])
+            index['last_id'] = max(index['last_id'] or entry['id'], entry['id'])
+
+    with open(index_path + '.tmp', 'w') as f:
+        json.dump(index, f)
+
+    os.replace(segment_path + '.tmp', segment_path)
+    os.replace(index_path + '.tmp', index_path)
+
+    table.drop(db.session.connection())
+    db.session.commit()
+
+    return index
+
+
+def read_archive(directory, start=None, end=None, resource_id=None):
+    """
+    Iterates over the archived log entries within a time range, optionally for a single resource.
+
+    Segments whose index shows no overlap with the query are skipped without being opened.
+    """
+
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.index.json'):
+            continue
+
+        with open(os.path.join(directory, filename)) as f:
+            index = json.load(f)
+
+        if index['count'] == 0:
+            continue
+
+        if start is not None and index['last_timestamp'] < start.isoformat():
+            continue
+
+        if end is not None and index['first_timestamp'] > end.isoformat():
+            continue
+
+        lines = None
+
+        if resource_id is not None:
+            lines = index['resources'].get(str(resource_id))
+
+            if lines is None:
+                continue
+
+        with gzip.open(os.path.join(directory, index['table'] + '.jsonl.gz'), 'rt', encoding='utf-8') as segment:
+            for line, content in enumerate(segment):
+                if lines is not None:
+                    if line < lines[0]:
+                        continue
+                    elif line >= lines[0] + lines[1]:
+                        break
+
+                entry = json.loads(content)
+                entry['timestamp'] = datetime.fromisoformat(entry['timestamp'])
+
+                if start is not None and entry['timestamp'] < start:
+                    continue
+
+                if end is not None and entry['timestamp'] > end:
+                    continue
+
+                yield entry
+
+
+@click.command('log:create-partitions')
+@click.option('--months', type=int, default=None, help='Number of months ahead to create partitions for.')
+@with_appcontext
+def create_partitions_command(months):
+    """
+    Creates the upcoming monthly partitions of the resource log. PostgreSQL only.
+    """
+
+    if not is_partitioned():
+        print('The resource log is not partitioned on this database.')
+        return
+
+    if months is None:
+        months = current_app.config['AUDIT_LOG_PARTITIONS_AHEAD']
+
+    for name in create_partitions(months):
+        print(f'Created partition {name}.')
+
+
+@click.command('log:archive')
+@click.argument('directory', type=click.Path(file_okay=False))
+@click.option('--retention', type=int, default=None, help='Number of past months to keep in the database.')
+@with_appcontext
+def archive_command(directory, retention):
+    """
+    Moves resource log entries older than the retention period into archive segments.
+    """
+
+    if retention is None:
+        retention = current_app.config['AUDIT_LOG_RETENTION_MONTHS']
+
+    os.makedirs(directory, exist_ok=True)
+
+    cutoff = add_months(month_of(datetime.now()), -retention)
+
+    for name in detach_before(cutoff):
+        print(f'Detached {name}.')
+
+    for name in list_detached():
+        index = archive_table(name, directory)
+        print(f'Archived {index["count"]} entries from {name}.')
+
+
+def init_app(app):
+    app.cli.add_command(create_partitions_command)
+    app.cli.add_command(archive_command)
@@ -0,0 +1,238 @@
+import atexit
+import itertools
+import os
+import queue
+import threading
+import time
+
+from flask import current_app
+
+from crm.db import db
+
+
+class LogWriter:
+    """
+    Writes resource log entries to the database synchronously.
+
+    Entries are dictionaries of `ResourceLog` column values, and may leave out the
+    columns which do not apply to them. Every call to `write` inserts the given
+    entries with as few multi-row inserts as possible and commits them.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def write(self, entries):
+        self.insert(entries)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def insert(self, entries):
+        from crm.models import ResourceSnapshot
+
+        if len(entries) == 0:
+            return
+
+        self.insert_entries(entries)
+
+        ResourceSnapshot.capture_due({ entry['resource_id'] for entry in entries })
+
+    def insert_entries(self, entries):
+        from crm.models import ResourceLog, ResourceSnapshot
+
+        # A multi-row insert requires all of its rows to have the same columns, so
+        # the entries are inserted in runs of consecutive entries with the same keys.
+        # Keeping the runs in order keeps the IDs of the entries in order as well.
+        for _, run in itertools.groupby(entries, key=lambda entry: frozenset(entry)):
+            db.session.execute(ResourceLog.__table__.insert(), list(run))
+
+        # Entries written late must not be skipped by the snapshots captured before them
+        ResourceSnapshot.invalidate(entries)
+
+        db.session.commit()
+
+
+class _FlushRequest:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+class BatchedLogWriter(LogWriter):
+    """
+    Collects resource log entries in memory and writes them from a background thread.
+
+    Queued entries are inserted once `batch_size` of them have accumulated, or once
+    `flush_interval` seconds have passed since the first of them was queued. The
+    queue is flushed when the process exits.
+
+    A batch which can not be written is retried `retries` times, waiting
+    `retry_delay` seconds between the attempts. If it still fails, its entries are
+    written one at a time, so that only the entries which fail on their own are lost.
+    """
+
+    def __init__(self, app, batch_size, flush_interval, retries=3, retry_delay=1.0):
+        super().__init__(app)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.queue = queue.Queue()
+        self.thread = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+        atexit.register(self.close)
+
+    def write(self, entries):
+        self.start()
+
+        for entry in entries:
+            self.queue.put(entry)
+
+    def flush(self):
+        """
+        Blocks until all of the entries queued so far have been written.
+        """
+
+        if self.thread is None or self.pid != os.getpid():
+            return
+
+        request = _FlushRequest()
+        self.queue.put(request)
+        request.done.wait()
+
+    def close(self):
+        """
+        Writes the remaining queued entries and stops the background thread.
+        """
+
+        if self.thread is None or self.pid != os.getpid():
+            return
+
+        self.queue.put(_STOP)
+        self.thread.join()
+        self.thread = None
+
+    def start(self):
+        # The thread is started lazily, so that each forked worker process gets its own
+        with self.lock:
+            if self.thread is not None and self.pid == os.getpid():
+                return
+
+            self.queue = queue.Queue()
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self.run, name='log-writer', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        stopped = False
+
+        while not stopped:
+            batch = []
+            requests = []
+
+            # Block until there is something to do, then keep collecting entries
+            # until the batch is full or the flush interval has passed.
+            item = self.queue.get()
+            deadline = time.monotonic() + self.flush_interval
+
+            while True:
+                if item is _STOP:
+                    stopped = True
+                    break
+                elif isinstance(item, _FlushRequest):
+                    requests.append(item)
+                    break
+
+                batch.append(item)
+
+                timeout = deadline - time.monotonic()
+
+                if len(batch) >= self.batch_size or timeout <= 0:
+                    break
+
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+
+            self.write_batch(batch)
+
+            for request in requests:
+                request.done.set()
+
+    def write_batch(self, batch):
+        if len(batch) == 0:
+            return
+
+        from crm.models import ResourceSnapshot
+
+        with self.app.app_context():
+            try:
+                written = self.insert_batch(batch)
+
+                try:
+                    ResourceSnapshot.capture_due({ entry['resource_id'] for entry in written })
+                except Exception:
+                    db.session.rollback()
+                    current_app.logger.exception('Failed to capture resource snapshots')
+            finally:
+                db.session.remove()
+
+    def insert_batch(self, batch):
+        """
+        Inserts a batch of entries, retrying and finally falling back to inserting them one by one.
+
+        :returns: List of the entries which were written.
+        """
+
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                time.sleep(self.retry_delay)
+
+            try:
+                self.insert_entries(batch)
+                return batch
+            except Exception:
+                db.session.rollback()
+                current_app.logger.exception(f'Failed to write {len(batch)} resource log entries (attempt {attempt + 1})')
+
+        written = []
+
+        for entry in batch:
+            try:
+                self.insert_entries([ entry ])
+                written.append(entry)
+            except Exception:
+                db.session.rollback()
+                current_app.logger.exception(f'Failed to write resource log entry: {entry!r}')
+
+        return written
+
+
+def get_log_writer():
+    return current_app.extensions['log_writer']
+
+
+def init_app(app):
+    mode = app.config['AUDIT_LOG_WRITER']
+
+    if mode == 'sync':
+        writer = LogWriter(app)
+    elif mode == 'batched':
+        writer = BatchedLogWriter(
+            app,
+            batch_size=app.config['AUDIT_LOG_BATCH_SIZE'],
+            flush_interval=app.config['AUDIT_LOG_FLUSH_INTERVAL'],
+        )
+    else:
+        raise Exception('Unknown audit log writer: ' + mode)
+
+    app.extensions['log_writer'] = writer
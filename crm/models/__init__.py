@@ -4,6 +4,11 @@ from .file import File
 from .opportunity import Opportunity
 from .sales_order import SalesOrder
 from .resource_log import ResourceLog
+from .resource_snapshot import ResourceSnapshot
+from .user_work import UserWork
+from .sales_rollup import SalesRollup, SalesRollupVersion
+from .exchange_rate import ExchangeRate
+from .group import Group
 from .resource import BaseResource
 
 Resource = BaseResource.create_resource_table()
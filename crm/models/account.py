@@ -4,11 +4,11 @@ from crm.fields import TextField, TableField
 
 class Account(BaseResource):
     name = TextField()
-    description = TextField()
+    description = TextField(deferred=True)
     email = TextField(label='E-Mail Address')
     phone = TextField(label='Phone Number')
-    mail_address = TextField(label='Mail Address')
-    billing_address = TextField(label='Billing Address')
+    mail_address = TextField(label='Mail Address', deferred=True)
+    billing_address = TextField(label='Billing Address', deferred=True)
     opportunities = TableField('Opportunity.account')
 
     __layout__ = [
@@ -16,5 +16,7 @@ class Account(BaseResource):
         Section(None, [ opportunities ]),
     ]
 
+    __title_fields__ = [ 'name' ]
+
     def title(self):
         return self.name
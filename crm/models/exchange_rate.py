@@ -0,0 +1,19 @@
+from crm.db import db
+
+class ExchangeRate(db.Model):
+    """
+    Exchange rate of a currency on a given date.
+
+    Rates are quoted against the `EXCHANGE_RATE_BASE` currency, as the number of units
+    of `currency` which one unit of the base currency buys. A rate applies from its
+    date until the date of the next rate of the same currency.
+    """
+
+    __tablename__ = 'exchange_rate'
+
+    currency = db.Column(db.String, primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    rate = db.Column(db.Numeric(18, 8), nullable=False)
+
+    # Time of the import which last wrote the rate, see `crm.exchange_rates.import_csv`
+    imported_at = db.Column(db.DateTime)
@@ -0,0 +1,376 @@
+from datetime import datetime
+from sqlalchemy import select, insert, update, delete, exists, literal, true, union_all
+from sqlalchemy.orm import aliased
+
+from crm.db import db, insert_ignore
+
+
+class Group(db.Model):
+    """
+    Team of users, with which resources can be shared.
+
+    Teams nest into a tree through `parent_id`, and the members of a team are also
+    members of all of the teams above it. Memberships are resolved through two
+    materialized tables: `GroupClosure` holds every (ancestor, descendant)-pair of
+    teams, and `UserGroup` every team each user is a member of, directly or not.
+    Checking whether a user can see a resource shared with teams is then a single
+    join of `resource_group` with `user_group_closure`.
+
+    The closure tables are maintained by the methods of this class, and can be
+    rebuilt from scratch with `flask group:rebuild-closure`. Changes to the
+    memberships increment the `principal_version` of the affected users, as the
+    groups are cached in the users' sessions, see `crm.auth`.
+    """
+
+    # "group" is a reserved word in SQL
+    __tablename__ = 'user_group'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False, unique=True)
+    parent_id = db.Column(db.Integer, db.ForeignKey('user_group.id'), index=True)
+
+    @classmethod
+    def get_by_name(cls, name):
+        return cls.query.filter_by(name=name).first()
+
+    @classmethod
+    def create(cls, name, parent_id=None):
+        """
+        Creates a group, optionally as a subgroup of another group.
+        """
+
+        group = cls(name=name, parent_id=parent_id)
+        db.session.add(group)
+        db.session.flush()
+
+        # Every group is its own ancestor at depth zero
+        ancestors = union_all(
+            select(literal(group.id), literal(group.id), literal(0)),
+            select(GroupClosure.ancestor_id, literal(group.id), GroupClosure.depth + 1)
+                .where(GroupClosure.descendant_id == parent_id),
+        )
+
+        db.session.execute(insert(GroupClosure.__table__).from_select(
+            [ 'ancestor_id', 'descendant_id', 'depth' ],
+            ancestors,
+        ))
+
+        db.session.commit()
+
+        return group
+
+    @classmethod
+    def move(cls, group_id, parent_id):
+        """
+        Moves a group and its subgroups under another group, or to the top level if `parent_id` is `None`.
+        """
+
+        if parent_id is not None and db.session.execute(
+            select(GroupClosure.depth).where(GroupClosure.ancestor_id == group_id, GroupClosure.descendant_id == parent_id)
+        ).first() is not None:
+            raise ValueError('A group can not be moved under itself or its subgroups')
+
+        subtree = select(GroupClosure.descendant_id).where(GroupClosure.ancestor_id == group_id)
+        user_ids = cls.member_ids(subtree)
+
+        # The paths from the old ancestors into the subtree are replaced with paths from the new ones
+        db.session.execute(
+            delete(GroupClosure.__table__)
+                .where(GroupClosure.descendant_id.in_(subtree))
+                .where(GroupClosure.ancestor_id.notin_(subtree))
+        )
+
+        if parent_id is not None:
+            above = aliased(GroupClosure)
+            below = aliased(GroupClosure)
+
+            db.session.execute(insert(GroupClosure.__table__).from_select(
+                [ 'ancestor_id', 'descendant_id', 'depth' ],
+                select(above.ancestor_id, below.descendant_id, above.depth + below.depth + 1)
+                    .join(below, true())
+                    .where(above.descendant_id == parent_id, below.ancestor_id == group_id),
+            ))
+
+        db.session.execute(update(cls.__table__).where(cls.id == group_id).values(parent_id=parent_id))
+
+        UserGroup.refresh(user_ids)
+
+        db.session.commit()
+
+    @classmethod
+    def remove(cls, group_id):
+        """
+        Deletes a group which has no subgroups, along with its memberships and shares.
+        """
+
+        if db.session.execute(select(cls.id).where(cls.parent_id == group_id)).first() is not None:
+            raise ValueError('Groups with subgroups can not be deleted')
+
+        user_ids = cls.member_ids([ group_id ])
+
+        db.session.execute(delete(ResourceGroupShare.__table__).where(ResourceGroupShare.group_id == group_id))
+        db.session.execute(delete(GroupMember.__table__).where(GroupMember.group_id == group_id))
+        db.session.execute(delete(GroupClosure.__table__).where(GroupClosure.descendant_id == group_id))
+        db.session.execute(delete(cls.__table__).where(cls.id == group_id))
+
+        UserGroup.refresh(user_ids)
+
+        db.session.commit()
+
+    @classmethod
+    def add_members(cls, group_id, user_ids):
+        """
+        Adds users to a group by the internal IDs of their rows in the `user` table.
+        """
+
+        user_ids = list(user_ids)
+
+        db.session.execute(insert_ignore(GroupMember.__table__), [
+            dict(group_id=group_id, user_id=user_id)
+            for user_id in user_ids
+        ])
+
+        UserGroup.refresh(user_ids)
+
+        db.session.commit()
+
+    @classmethod
+    def remove_members(cls, group_id, user_ids):
+        user_ids = list(user_ids)
+
+        db.session.execute(
+            delete(GroupMember.__table__)
+                .where(GroupMember.group_id == group_id, GroupMember.user_id.in_(user_ids))
+        )
+
+        UserGroup.refresh(user_ids)
+
+        db.session.commit()
+
+    @staticmethod
+    def member_ids(group_ids):
+        """
+        Returns the IDs of the direct members of the given groups.
+        """
+
+        return db.session.execute(
+            select(GroupMember.user_id).distinct().where(GroupMember.group_id.in_(group_ids))
+        ).scalars().all()
+
+    @classmethod
+    def rebuild(cls):
+        """
+        Recreates both closure tables from the groups' parents and direct memberships.
+
+        :returns: The number of rows written to `user_group_closure`.
+        """
+
+        tree = select(cls.id.label('ancestor_id'), cls.id.label('descendant_id'), literal(0).label('depth')) \
+            .cte('tree', recursive=True)
+
+        tree = tree.union_all(
+            select(tree.c.ancestor_id, cls.id, tree.c.depth + 1).where(cls.parent_id == tree.c.descendant_id)
+        )
+
+        db.session.execute(delete(GroupClosure.__table__))
+        db.session.execute(insert(GroupClosure.__table__).from_select(
+            [ 'ancestor_id', 'descendant_id', 'depth' ],
+            select(tree.c.ancestor_id, tree.c.descendant_id, tree.c.depth),
+        ))
+
+        count = UserGroup.refresh()
+
+        db.session.commit()
+
+        return count
+
+
+class GroupMember(db.Model):
+    """
+    Direct membership of a user in a group.
+    """
+
+    __tablename__ = 'group_member'
+
+    group_id = db.Column(db.Integer, db.ForeignKey('user_group.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True, index=True)
+
+
+class GroupClosure(db.Model):
+    """
+    Materialized transitive closure of the group tree, including a row for each group itself.
+    """
+
+    __tablename__ = 'group_closure'
+
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('user_group.id'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('user_group.id'), primary_key=True, index=True)
+
+    # Number of levels between the groups, zero for the row of a group itself
+    depth = db.Column(db.Integer, nullable=False)
+
+
+class UserGroup(db.Model):
+    """
+    Materialized memberships of users in groups, including the groups above their own groups.
+    """
+
+    __tablename__ = 'user_group_closure'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('user_group.id'), primary_key=True, index=True)
+
+    @classmethod
+    def group_ids(cls, user_id):
+        return db.session.execute(
+            select(cls.group_id).where(cls.user_id == user_id).order_by(cls.group_id)
+        ).scalars().all()
+
+    @classmethod
+    def refresh(cls, user_ids=None):
+        """
+        Recomputes the rows of the given users, or of all users if none are given,
+        and increments the `principal_version` of those users.
+
+        :returns: The number of rows written.
+        """
+
+        from crm.models import User
+
+        memberships = select(GroupMember.user_id, GroupClosure.ancestor_id) \
+            .distinct() \
+            .join(GroupClosure, GroupClosure.descendant_id == GroupMember.group_id)
+
+        removal = delete(cls.__table__)
+        versions = update(User.model.__table__)
+
+        if user_ids is not None:
+            user_ids = list(user_ids)
+
+            if len(user_ids) == 0:
+                return 0
+
+            memberships = memberships.where(GroupMember.user_id.in_(user_ids))
+            removal = removal.where(cls.user_id.in_(user_ids))
+            versions = versions.where(User.model.variant_id.in_(user_ids))
+
+        db.session.execute(removal)
+        result = db.session.execute(insert(cls.__table__).from_select([ 'user_id', 'group_id' ], memberships))
+        db.session.execute(versions.values(principal_version=User.model.principal_version + 1))
+
+        return result.rowcount
+
+    @classmethod
+    def condition(cls, resource_id, user_id):
+        """
+        Returns an SQL expression which is true if the resource is shared with any of the user's groups.
+        """
+
+        return exists() \
+            .where(ResourceGroupShare.resource_id == resource_id) \
+            .where(cls.group_id == ResourceGroupShare.group_id) \
+            .where(cls.user_id == user_id)
+
+
+class ResourceGroupShare(db.Model):
+    """
+    A resource shared with a group, and through it with all of the group's members
+    and the members of its subgroups.
+    """
+
+    __tablename__ = 'resource_group'
+
+    resource_id = db.Column(db.Integer, db.ForeignKey('resource.id'), primary_key=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('user_group.id'), primary_key=True, index=True)
+    shared_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    shared_at = db.Column(db.DateTime)
+
+    @classmethod
+    def share(cls, resource_ids, group_ids, shared_by=None):
+        """
+        Shares every one of the resources with every one of the groups.
+
+        :returns: List of the (resource ID, group ID)-pairs which were shared.
+        """
+
+        from crm.models import Resource
+
+        timestamp = datetime.now()
+
+        candidates = select(Resource.id, Group.id) \
+            .join(Group, true()) \
+            .where(Resource.id.in_(list(resource_ids)), Group.id.in_(list(group_ids))) \
+            .where(~exists().where(cls.resource_id == Resource.id, cls.group_id == Group.id))
+
+        pairs = db.session.execute(candidates).all()
+
+        if len(pairs) == 0:
+            return []
+
+        db.session.execute(insert_ignore(cls.__table__).from_select(
+            [ 'resource_id', 'group_id', 'shared_by', 'shared_at' ],
+            candidates.add_columns(literal(shared_by, db.Integer), literal(timestamp, db.DateTime)),
+        ))
+
+        db.session.commit()
+
+        cls.write_log('share', [ (resource_id, None, group_id) for resource_id, group_id in pairs ], shared_by, timestamp)
+
+        return pairs
+
+    @classmethod
+    def unshare(cls, resource_ids, group_ids, unshared_by=None):
+        """
+        Removes the shares of every one of the resources with every one of the groups.
+
+        :returns: List of the (resource ID, group ID)-pairs which were unshared.
+        """
+
+        condition = cls.resource_id.in_(list(resource_ids)) & cls.group_id.in_(list(group_ids))
+        timestamp = datetime.now()
+
+        pairs = db.session.execute(select(cls.resource_id, cls.group_id).where(condition)).all()
+
+        if len(pairs) == 0:
+            return []
+
+        db.session.execute(delete(cls.__table__).where(condition))
+        db.session.commit()
+
+        cls.write_log('unshare', [ (resource_id, group_id, None) for resource_id, group_id in pairs ], unshared_by, timestamp)
+
+        return pairs
+
+    @staticmethod
+    def write_log(mutation, changes, subject, timestamp):
+        """
+        Writes log entries for a list of (resource ID, old group ID, new group ID)-tuples.
+
+        The entries are described with the current names of the groups, see `RESOURCE_MUTATIONS`.
+        """
+
+        from crm.log_writer import get_log_writer
+
+        get_log_writer().write([
+            dict(
+                resource_id=resource_id,
+                timestamp=timestamp,
+                subject=subject,
+                mutation=mutation,
+                old_value=old,
+                new_value=new,
+            )
+            for resource_id, old, new in changes
+        ])
+
+    @classmethod
+    def groups(cls, resource_id):
+        """
+        Fetches the groups a resource is directly shared with, ordered by name.
+        """
+
+        return Group.query \
+            .join(cls, cls.group_id == Group.id) \
+            .filter(cls.resource_id == resource_id) \
+            .order_by(Group.name) \
+            .all()
@@ -5,7 +5,28 @@ from crm.fields import TextField, TableField, ReferenceField
 
 class Opportunity(BaseResource):
     name = TextField()
-    description = TextField()
+    description = TextField(deferred=True)
 
     account = ReferenceField(Account)
     sales_orders = TableField('SalesOrder.opportunity')
+
+    def save(self, context=None):
+        from crm.models import SalesRollup
+
+        super().save(context)
+
+        # The rollups of the opportunity's orders are grouped by its account
+        SalesRollup.refresh({ self.id })
+
+    @classmethod
+    def after_import(cls, resources):
+        from crm.models import SalesRollup
+
+        SalesRollup.refresh({ resource.id for resource in resources })
+
+    @classmethod
+    def after_unlink(cls, resource_ids, field, owner_id):
+        from crm.models import SalesRollup
+
+        # The rollups of the opportunities' orders no longer belong to the account
+        SalesRollup.refresh(set(resource_ids))
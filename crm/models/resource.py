@@ -1,13 +1,24 @@
-from crm.db import db
+from crm.db import db, insert_ignore
 from crm.access import AccessControlList
 from crm.fields import Field
 from crm.mutation import CommitContext
 
-from sqlalchemy import event
+from sqlalchemy import event, select, insert, update, delete, exists, literal, true, cast, func, text, DDL
+from sqlalchemy.orm import aliased, deferred, load_only
+from sqlalchemy.orm.attributes import set_committed_value
 from flask_sqlalchemy.model import DefaultMeta
 from flask import session
 from datetime import datetime
 
+# Maximum number of `resource` rows created by a single statement
+RESOURCE_BATCH_SIZE = 5000
+
+# Maximum number of IDs in the `IN` clause of a single query issued by `BaseResource.prefetch`
+PREFETCH_BATCH_SIZE = 500
+
+# Access Control List of the resource types which do not define their own
+DEFAULT_ACL = 'r=sAaOg,w=sAaO,d=Oa,c=o'
+
 
 class ResourceUserAssignment(db.Model):
     """
@@ -17,15 +28,172 @@ class ResourceUserAssignment(db.Model):
     __tablename__ = 'resource_user'
 
     user_id = db.Column(db.Integer, primary_key=True)
-    resource_id = db.Column(db.Integer, db.ForeignKey('resource.id'), primary_key=True)
+
+    # The primary key leads with `user_id`, so lookups by resource need an index of their own
+    resource_id = db.Column(db.Integer, db.ForeignKey('resource.id'), primary_key=True, index=True)
     assigned_by = db.Column(db.Integer, db.ForeignKey('user.id'))
     assigned_at = db.Column(db.DateTime)
 
+    @classmethod
+    def assign(cls, resource_ids, user_ids, assigned_by=None):
+        """
+        Assigns every one of the resources to every one of the users.
+
+        The assignments are inserted with a single `INSERT ... SELECT` statement.
+        Existing assignments are left untouched.
+
+        :param resource_ids: IDs of the resources.
+        :param user_ids: Internal IDs of the users' rows in the `user` table.
+        :param assigned_by: Internal ID of the user making the assignments, if any.
+        :returns: List of the (resource ID, user ID)-pairs which were assigned.
+        """
+
+        from crm.models import Resource, User, UserWork
+
+        resource_ids = list(resource_ids)
+        user_ids = list(user_ids)
+        timestamp = datetime.now()
+
+        candidates = select(Resource.id, User.model.variant_id) \
+            .join(User.model, true()) \
+            .where(Resource.id.in_(resource_ids), User.model.variant_id.in_(user_ids)) \
+            .where(~exists().where(cls.resource_id == Resource.id, cls.user_id == User.model.variant_id))
+
+        pairs = db.session.execute(candidates).all()
+
+        if len(pairs) == 0:
+            return []
+
+        db.session.execute(insert_ignore(cls.__table__).from_select(
+            [ 'resource_id', 'user_id', 'assigned_by', 'assigned_at' ],
+            candidates.add_columns(literal(assigned_by, db.Integer), literal(timestamp, db.DateTime)),
+        ))
+
+        UserWork.add_assigned(resource_ids, user_ids, timestamp)
+        UserWork.touch(resource_ids, timestamp)
+
+        db.session.commit()
+
+        cls.write_log('assign', [ (resource_id, None, user_id) for resource_id, user_id in pairs ], assigned_by, timestamp)
+
+        return pairs
+
+    @classmethod
+    def unassign(cls, resource_ids, user_ids, unassigned_by=None):
+        """
+        Removes the assignments of every one of the resources to every one of the users.
+
+        :returns: List of the (resource ID, user ID)-pairs which were unassigned.
+        """
+
+        from crm.models import UserWork
+
+        resource_ids = list(resource_ids)
+        user_ids = list(user_ids)
+        condition = cls.resource_id.in_(resource_ids) & cls.user_id.in_(user_ids)
+        timestamp = datetime.now()
+
+        pairs = db.session.execute(select(cls.resource_id, cls.user_id).where(condition)).all()
+
+        if len(pairs) == 0:
+            return []
+
+        db.session.execute(delete(cls).where(condition).execution_options(synchronize_session=False))
+
+        UserWork.remove_assigned(resource_ids, user_ids)
+        UserWork.touch(resource_ids, timestamp)
+
+        db.session.commit()
+
+        cls.write_log('unassign', [ (resource_id, user_id, None) for resource_id, user_id in pairs ], unassigned_by, timestamp)
+
+        return pairs
+
+    @classmethod
+    def transfer(cls, from_user_id, to_user_id, assigned_by=None):
+        """
+        Moves all assignments of one user to another user.
+
+        Resources already assigned to both users are only unassigned from the former.
+
+        :returns: List of the IDs of the resources which were reassigned.
+        """
+
+        from crm.models import UserWork
+
+        timestamp = datetime.now()
+
+        resource_ids = db.session.execute(
+            select(cls.resource_id).where(cls.user_id == from_user_id)
+        ).scalars().all()
+
+        if len(resource_ids) == 0:
+            return []
+
+        other = aliased(cls)
+
+        db.session.execute(
+            update(cls)
+                .where(cls.user_id == from_user_id)
+                .where(~exists().where(other.user_id == to_user_id, other.resource_id == cls.resource_id))
+                .values(user_id=to_user_id, assigned_by=assigned_by, assigned_at=timestamp)
+                .execution_options(synchronize_session=False)
+        )
+
+        # The remaining rows are resources to which the new user was already assigned
+        db.session.execute(
+            delete(cls)
+                .where(cls.user_id == from_user_id)
+                .execution_options(synchronize_session=False)
+        )
+
+        UserWork.remove_assigned(resource_ids, [ from_user_id ])
+        UserWork.add_assigned(resource_ids, [ to_user_id ], timestamp)
+        UserWork.touch(resource_ids, timestamp)
+
+        db.session.commit()
+
+        cls.write_log('transfer', [ (resource_id, from_user_id, to_user_id) for resource_id in resource_ids ], assigned_by, timestamp)
+
+        return resource_ids
+
+    @staticmethod
+    def write_log(mutation, changes, subject, timestamp):
+        """
+        Writes log entries for a list of (resource ID, old user ID, new user ID)-tuples.
+
+        The users are recorded in the log by their resource IDs.
+        """
+
+        from crm.models import User
+        from crm.log_writer import get_log_writer
+
+        user_ids = { user_id for _, old, new in changes for user_id in (old, new) if user_id is not None }
+
+        user_resource_ids = dict(db.session.execute(
+            select(User.model.variant_id, User.model.resource_id).where(User.model.variant_id.in_(user_ids))
+        ).all())
+
+        get_log_writer().write([
+            dict(
+                resource_id=resource_id,
+                timestamp=timestamp,
+                subject=subject,
+                mutation=mutation,
+                old_value=user_resource_ids.get(old),
+                new_value=user_resource_ids.get(new),
+            )
+            for resource_id, old, new in changes
+        ])
+
 
 class ResourceModelBase(db.Model):
     """
     Base class for the database table model which combines all the
-    different types of resources using foreign key references.
+    different types of resources.
+
+    Each row refers to the row of a resource type's table by the name of
+    the type and the ID of the row in that table.
     """
 
     # This tells SQLAlchemy that this class is not a concrete database model.
@@ -43,14 +211,49 @@ class ResourceModelBase(db.Model):
         if resource is None:
             return None
 
-        for c in cls.__metaclass__.__variant_classes__:
-            column_name = c.model.__name__.lower() + '_id'
-            id = getattr(resource, column_name)
+        c = cls.get_type(resource.type)
+
+        if c is None:
+            raise Exception('invalid resource')
+
+        return c.get(resource.variant_id)
 
-            if id is not None:
-                return c.get(id)
+    @classmethod
+    def get_resources(cls, ids):
+        """
+        Fetches multiple resources of possibly different types based on their IDs.
+
+        Issues one query for the `resource` rows and one for each of the resource
+        types present, instead of one query per resource.
+
+        :returns: A dictionary mapping the resource IDs to the wrapped resources.
+        """
+
+        ids = set(ids)
 
-        raise Exception('invalid resource')
+        if len(ids) == 0:
+            return dict()
+
+        variant_ids = dict()
+
+        for id, type, variant_id in db.session.execute(select(cls.id, cls.type, cls.variant_id).where(cls.id.in_(ids))):
+            variant_ids.setdefault(cls.get_type(type), dict())[variant_id] = id
+
+        resources = dict()
+
+        for c, ids in variant_ids.items():
+            for instance in c.model.query.filter(c.model.variant_id.in_(ids.keys())):
+                resources[ids[instance.variant_id]] = c(from_instance=instance)
+
+        return resources
+
+    @classmethod
+    def type_expression(cls):
+        """
+        Returns an SQL expression which evaluates to the name of the resource's type.
+        """
+
+        return cls.type
 
     @classmethod
     def from_instance(cls, obj):
@@ -58,16 +261,12 @@ class ResourceModelBase(db.Model):
         Wraps an SQLAlchemy object in an appropriate resource subclass.
         """
 
-        for c in cls.__metaclass__.__variant_classes__:
-            if not isinstance(obj, c):
-                continue
-
-            columns = dict()
-            columns[c.model.__tablename__] = obj.instance
+        c = cls.__metaclass__.__variant_models__.get(type(obj.instance))
 
-            return cls(**columns)
+        if c is None or not isinstance(obj, c):
+            raise ValueError('not an instance of a known resource class')
 
-        raise ValueError('not an instance of a known resource class')
+        return cls(type=c.__name__, variant_id=obj.instance.variant_id)
 
     @classmethod
     def get_type(cls, name):
@@ -75,29 +274,65 @@ class ResourceModelBase(db.Model):
         Returns a subclass of the resource base class associated with a given resource type name.
         """
 
-        for c in cls.__metaclass__.__variant_classes__:
-            if name.lower() == c.__name__.lower():
-                return c
+        return cls.__metaclass__.__variant_types__.get(name.lower())
+
+    @classmethod
+    def on_after_flush(cls, session, flush_context):
+        """
+        An event hook which SQLAlchemy calls after the pending changes have been flushed to the database.
+        """
+
+        # Collect the newly inserted objects of the resource types' models
+        variant_models = cls.__metaclass__.__variant_models__
+        inserted = dict()
 
-        return None
+        for obj in session.new:
+            c = variant_models.get(type(obj))
+
+            if c is not None and obj.resource_id is None:
+                inserted.setdefault(c, []).append(obj)
+
+        connection = session.connection()
+
+        for c, objs in inserted.items():
+            for i in range(0, len(objs), RESOURCE_BATCH_SIZE):
+                cls.create_resources(connection, c, objs[i:i + RESOURCE_BATCH_SIZE])
 
     @classmethod
-    def on_transient_to_pending(cls, session, obj):
+    def create_resources(cls, connection, c, objs):
         """
-        An event hook which SQLAlchemy calls whenever a new object is being inserted into the database.
+        Creates the `resource` rows of newly inserted objects of a resource type's model,
+        and links the objects to their resource IDs.
+
+        The rows are created with a single multi-row insert, whose resource IDs are returned
+        by the insert itself if the database supports `RETURNING`.
         """
 
-        # Check if the inserted object is a subclass of the resource base class
-        for c in cls.__metaclass__.__variant_classes__:
-            if isinstance(obj, c.model):
-                break
+        table = cls.__table__
+        variant_table = c.model.__table__
+        variant_ids = [ obj.variant_id for obj in objs ]
+
+        query = insert(table).values([ dict(type=c.__name__, variant_id=id) for id in variant_ids ])
+
+        if connection.dialect.full_returning:
+            resource_ids = dict(connection.execute(query.returning(table.c.variant_id, table.c.id)).all())
         else:
-            return
+            connection.execute(query)
+            resource_ids = dict(connection.execute(
+                select(table.c.variant_id, table.c.id)
+                    .where(table.c.type == c.__name__, table.c.variant_id.in_(variant_ids))
+            ).all())
+
+        connection.execute(
+            update(variant_table)
+                .where(variant_table.c.id.in_(variant_ids))
+                .values(resource_id=select(table.c.id)
+                    .where(table.c.type == c.__name__, table.c.variant_id == variant_table.c.id)
+                    .scalar_subquery())
+        )
 
-        # If so, create a new `resource` row which links the object to be inserted to it's resource ID
-        from crm.models import Resource
-        resource = Resource.from_instance(c(from_instance=obj))
-        session.add(resource)
+        for obj in objs:
+            set_committed_value(obj, 'resource_id', resource_ids[obj.variant_id])
 
 
 class ResourceMeta(type):
@@ -107,6 +342,10 @@ class ResourceMeta(type):
 
     __variant_classes__ = []
 
+    # The subclasses keyed by their lowercase names, and by their models
+    __variant_types__ = dict()
+    __variant_models__ = dict()
+
     def __init__(cls, name, bases, d):
         super().__init__(name, bases, d)
 
@@ -129,39 +368,41 @@ class ResourceMeta(type):
 
         # First, we define some columns which are referenced by the other columns
 
-        created_by_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-        deleted_by_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+        created_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+        deleted_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
         variant_id = db.Column('id', db.Integer, primary_key=True)
 
+        # A copy of the ID of the row in the `resource` table, so that reading the resource ID
+        # of an instance does not require loading the `resource` row.
+        resource_id = db.Column(
+            db.Integer,
+            db.ForeignKey('resource.id', use_alter=True, name=f'fk_{inst.__name__.lower()}_resource_id'),
+            unique=True,
+        )
+
         # Thses columns are present on tables of every resource type
 
         model_dict = dict(
             variant_id = variant_id,
+            resource_id = resource_id,
             created_by_id = created_by_id,
             deleted_by_id = deleted_by_id,
             created_by = db.relationship('User', foreign_keys=[created_by_id], uselist=False),
             deleted_by = db.relationship('User', foreign_keys=[deleted_by_id], uselist=False),
-            _resource = db.relationship('Resource', foreign_keys='Resource.' + inst.__name__.lower() + '_id', uselist=False),
+
+            # The `resource` row is created by `Resource.on_after_flush` once this row has been inserted
+            _resource = db.relationship('Resource', foreign_keys=[resource_id], uselist=False, viewonly=True),
 
             # This relationship represents the list of users who have been assigned to a particular resource.
-            # It involves four tables (<Resource Variant Table> -> Resource -> ResourceUserAssignment -> User)
-            # and as such is a bit cumbersome to write.  It is essentially just an ordinary many-to-many
-            # join, but instead of an normal materialized junction table, a join between the Resource
-            # and ResourceUserAssignment tables is used.
+            # It is an ordinary many-to-many relationship through the `resource_user` table, which refers
+            # to the resources by their resource IDs.
             assigned_users = db.relationship(
                 'User',
-                secondary='join(Resource, ResourceUserAssignment)',
-                primaryjoin=f'{inst.__name__}.variant_id == Resource.{inst.__name__.lower()}_id',
+                secondary='resource_user',
+                primaryjoin=f'{inst.__name__}.resource_id == ResourceUserAssignment.resource_id',
                 secondaryjoin='ResourceUserAssignment.user_id == User.variant_id',
                 uselist=True,
-            ),
-
-            events = db.relationship(
-                'ResourceLog',
-                secondary='resource',
-                primaryjoin=f'{inst.__name__}.variant_id == Resource.{inst.__name__.lower()}_id',
-                secondaryjoin='Resource.id == ResourceLog.resource_id',
-                uselist=True,
+                viewonly=True,
             ),
         )
 
@@ -181,7 +422,13 @@ class ResourceMeta(type):
                 else:
                     column_name = name + '_' + str(i)
 
-                model_dict[column_name] = column
+                # Foreign keys are indexed, unless the field says otherwise
+                if column.foreign_keys and column.index is None:
+                    column.index = True
+
+                value.column_names.append(column_name)
+                # The deferred columns of a row are loaded together, when any of them is first accessed
+                model_dict[column_name] = deferred(column, group='deferred') if value.deferred else column
 
         # The for loop below removes the processed class attributes from the class.
         # If the were left present, our `__getattr__` and `__setattr__` implementations
@@ -190,6 +437,15 @@ class ResourceMeta(type):
         for field in fields.values():
             delattr(inst, field.name)
 
+        # Plain columns, which are not fields, are moved to the model as they are.
+        # They are accessed through the `instance` of a resource.
+
+        columns = { name: value for name, value in vars(inst).items() if isinstance(value, db.Column) }
+
+        for name, column in columns.items():
+            model_dict[name] = column
+            delattr(inst, name)
+
         # Add this new subclass to the list of subclasses 
         cls.__variant_classes__.append(inst)
 
@@ -203,6 +459,18 @@ class ResourceMeta(type):
         setattr(inst, '__metaclass__', cls)
         setattr(inst, '__abstract__', False)
 
+        cls.__variant_types__[inst.__name__.lower()] = inst
+        cls.__variant_models__[model] = inst
+
+        # Date ranges are left in place as class attributes, as they are not stored in columns of their own.
+        for name, value in vars(inst).items():
+            if isinstance(value, DateRange):
+                value._assign(name, inst)
+                value.create_indexes()
+
+        for index in vars(inst).get('__indexes__', []):
+            index.create(model)
+
         return inst
 
     def __getattr__(self, name):
@@ -213,25 +481,30 @@ class ResourceMeta(type):
 
     def create_resource_table(cls):
         """
-        Creates an SQLAlchemy model for a table, which contains an foreign key column for each of the
-        known resource types, as well as an ID column.
+        Creates an SQLAlchemy model for a table, which contains the name of the resource type
+        and the ID of the row in the type's table, as well as an ID column.
 
         This table can be used to refer to an resource, without having to know it's type. 
         """
 
         properties = dict(
             id = db.Column(db.Integer, primary_key=True),
+
+            # Name of the resource type, eg. "SalesOrder"
+            type = db.Column(db.String, nullable=False),
+
+            # ID of the row in the resource type's table
+            variant_id = db.Column(db.Integer, nullable=False),
+
+            __table_args__ = (
+                db.Index('ix_resource_type_variant_id', 'type', 'variant_id', unique=True),
+            ),
             __metaclass__ = cls,
         )
 
-        for vcls in cls.__variant_classes__:
-            column_name = vcls.model.__name__.lower() + '_id'
-            properties[column_name] = db.Column(db.Integer, db.ForeignKey(getattr(vcls.model, 'variant_id')))
-            properties[vcls.model.__tablename__] = db.relationship(vcls.model, back_populates='_resource', foreign_keys='Resource.'+column_name)
-
         resource_cls = DefaultMeta('Resource', (ResourceModelBase,), properties)
 
-        event.listen(db.session, 'transient_to_pending', resource_cls.on_transient_to_pending)
+        event.listen(db.session, 'after_flush', resource_cls.on_after_flush)
 
         for vcls in cls.__variant_classes__:
             setattr(vcls, '__resource_model__', resource_cls)
@@ -239,6 +512,120 @@ class ResourceMeta(type):
         return resource_cls
 
 
+def batches(ids):
+    ids = sorted(ids)
+
+    for i in range(0, len(ids), PREFETCH_BATCH_SIZE):
+        yield ids[i:i + PREFETCH_BATCH_SIZE]
+
+
+def load_by_resource_ids(vcls, ids, options=()):
+    """
+    Fetches resources of a single type by their resource IDs.
+
+    :param options: Options of the queries, eg. those returned by `BaseResource.projection_options`.
+    :returns: A dictionary mapping the resource IDs to the wrapped resources.
+    """
+
+    resources = dict()
+
+    for batch in batches(ids):
+        for instance in vcls.model.query.options(*options).filter(vcls.model.resource_id.in_(batch)):
+            resources[instance.resource_id] = vcls(from_instance=instance)
+
+    return resources
+
+
+def prefetch_tree(resources, tree):
+    """
+    Loads the values named by a tree of field names for a list of resources, see `BaseResource.prefetch`.
+    """
+
+    from crm.fields import ReferenceField, TableField
+    from crm.models import Resource, User
+
+    if len(resources) == 0:
+        return
+
+    for name, subtree in tree.items():
+        types = dict()
+
+        for resource in resources:
+            types.setdefault(type(resource), []).append(resource)
+
+        if not any(name in ('created_by', 'assigned_users') or name in vcls._fields for vcls in types):
+            raise ValueError('Unknown field: ' + name)
+
+        related = dict()
+
+        for vcls, group in types.items():
+            field = vcls._fields.get(name)
+
+            if name == 'created_by':
+                user_ids = { r.instance.created_by_id for r in group } - { None }
+                users = dict()
+
+                for batch in batches(user_ids):
+                    for instance in User.model.query.filter(User.model.variant_id.in_(batch)):
+                        users[instance.variant_id] = User(from_instance=instance)
+
+                for resource in group:
+                    resource.prefetched[name] = users.get(resource.instance.created_by_id)
+
+                related.update((user.id, user) for user in users.values())
+
+            elif name == 'assigned_users':
+                assigned = dict()
+                users = dict()
+
+                for batch in batches({ r.id for r in group }):
+                    query = select(ResourceUserAssignment.resource_id, User.model) \
+                        .join(User.model, User.model.variant_id == ResourceUserAssignment.user_id) \
+                        .where(ResourceUserAssignment.resource_id.in_(batch))
+
+                    for resource_id, instance in db.session.execute(query):
+                        user = users.setdefault(instance.variant_id, User(from_instance=instance))
+                        assigned.setdefault(resource_id, []).append(user)
+
+                for resource in group:
+                    resource.prefetched[name] = assigned.get(resource.id, [])
+
+                related.update((user.id, user) for user in users.values())
+
+            elif isinstance(field, ReferenceField):
+                ids = { field.retrieve(resource) for resource in group } - { None }
+
+                if field.resource_type is None:
+                    targets = Resource.get_resources(ids)
+                else:
+                    targets = load_by_resource_ids(field.resource_type, ids)
+
+                for resource in group:
+                    resource.prefetched[name] = targets.get(field.retrieve(resource))
+
+                related.update(targets)
+
+            elif isinstance(field, TableField):
+                rows = dict()
+                model = field.foreign_type.model
+                column = field.foreign_field.column
+
+                for batch in batches({ r.id for r in group } - { None }):
+                    for instance in model.query.filter(column.in_(batch)).order_by(model.resource_id):
+                        row = field.foreign_type(from_instance=instance)
+                        rows.setdefault(getattr(instance, field.foreign_field.name), []).append(row)
+                        related[row.id] = row
+
+                for resource in group:
+                    resource.prefetched[name] = rows.get(resource.id, [])
+
+            elif field is not None:
+                raise ValueError(f'Field "{name}" of {vcls.__name__} can not be prefetched')
+
+        if len(subtree) > 0:
+            prefetch_tree(list(related.values()), subtree)
+
+
 class BoundField:
     """
     Represents an `Field` which is associated with a resource instance.
@@ -311,11 +698,175 @@ class Section:
         self.fields = fields
 
 
+class Index:
+    """
+    A composite or partial index on the table of a resource type, declared in `__indexes__`.
+
+    :param columns: Fields or names of the model's column attributes, eg. "created_by_id".
+    :param where: SQL condition which makes the index partial, eg. "deleted_by_id IS NULL".
+    """
+
+    def __init__(self, *columns, name=None, unique=False, where=None):
+        self.columns = columns
+        self.name = name
+        self.unique = unique
+        self.where = where
+
+    def create(self, model):
+        columns = [
+            getattr(model, column.name if isinstance(column, Field) else column)
+            for column in self.columns
+        ]
+
+        name = self.name or 'ix_' + model.__tablename__ + '_' + '_'.join(column.name for column in columns)
+        kwargs = dict()
+
+        if self.where is not None:
+            kwargs = dict(postgresql_where=text(self.where), sqlite_where=text(self.where))
+
+        # Indexes created with bound columns are added to the model's table
+        return db.Index(name, *columns, unique=self.unique, **kwargs)
+
+
+class DateRange:
+    """
+    A pair of date fields forming a range, eg. the period during which a sales order is active.
+
+    Both ends of the range are inclusive and a missing end date leaves the range open-ended.
+    Resources without a start date do not fall within any range.
+
+    The range is indexed with a GiST index over the `tsrange` of its columns on PostgreSQL,
+    and with B-tree indexes on the columns elsewhere.
+    """
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.name = None
+        self.resource = None
+
+    def _assign(self, name, resource):
+        self.name = name
+        self.resource = resource
+
+    def columns(self, entity=None):
+        entity = entity or self.resource.model
+        return getattr(entity, self.start.name), getattr(entity, self.end.name)
+
+    def create_indexes(self):
+        table = self.resource.model.__table__
+        name = f'ix_{table.name}_{self.name}'
+        start, end = self.start.name, self.end.name
+
+        for statement, dialect in [
+            (f"CREATE INDEX {name} ON {table.name} USING gist (tsrange({start}, {end}, '[]'))", True),
+            (f'CREATE INDEX {name}_start_end ON {table.name} ({start}, {end})', False),
+            (f'CREATE INDEX {name}_end ON {table.name} ({end})', False),
+        ]:
+            condition = lambda ddl, target, bind, postgresql=dialect, **kwargs: (bind.dialect.name == 'postgresql') == postgresql
+            event.listen(table, 'after_create', DDL(statement).execute_if(callable_=condition))
+
+    @staticmethod
+    def is_postgresql():
+        return db.engine.dialect.name == 'postgresql'
+
+    @staticmethod
+    def tsrange(start, end):
+        return func.tsrange(start, end, '[]')
+
+    def overlaps(self, start, end, entity=None):
+        """
+        Returns an SQL condition which matches the resources whose ranges overlap the range from `start` to `end`.
+
+        :param end: Last day of the range, or `None` for an open-ended range.
+        """
+
+        column_start, column_end = self.columns(entity)
+
+        if self.is_postgresql():
+            return column_start.isnot(None) & self.tsrange(column_start, column_end).op('&&')(self.tsrange(start, end))
+
+        condition = column_start.isnot(None) & (column_end.is_(None) | (column_end >= start))
+
+        if end is not None:
+            condition &= column_start <= end
+
+        return condition
+
+    def contains(self, day, entity=None):
+        """
+        Returns an SQL condition which matches the resources whose ranges contain the given day.
+        """
+
+        column_start, column_end = self.columns(entity)
+
+        if self.is_postgresql():
+            return column_start.isnot(None) & self.tsrange(column_start, column_end).op('@>')(cast(day, db.DateTime))
+
+        return column_start.isnot(None) & (column_start <= day) & (column_end.is_(None) | (column_end >= day))
+
+    def overlapping(self, start, end):
+        """
+        Fetches the resources whose ranges overlap the range from `start` to `end`.
+        """
+
+        query = self.resource.model.query.filter(self.overlaps(start, end))
+        return [ self.resource(from_instance=instance) for instance in query ]
+
+    def containing(self, day):
+        """
+        Fetches the resources whose ranges contain the given day.
+        """
+
+        query = self.resource.model.query.filter(self.contains(day))
+        return [ self.resource(from_instance=instance) for instance in query ]
+
+    def conflicts(self, resource=None, same=None):
+        """
+        Finds pairs of resources whose ranges overlap.
+
+        :param resource: If provided, only the conflicts of this resource are returned.
+        :param same: Name of a field, whose value the conflicting resources have to share,
+            eg. "opportunity".
+        :returns: List of (resource, resource)-tuples.
+        """
+
+        model = self.resource.model
+        other = aliased(model)
+        start, end = self.columns()
+        other_start, other_end = self.columns(other)
+
+        if self.is_postgresql():
+            overlap = self.tsrange(start, end).op('&&')(self.tsrange(other_start, other_end))
+        else:
+            overlap = (end.is_(None) | (end >= other_start)) & (other_end.is_(None) | (start <= other_end))
+
+        condition = start.isnot(None) & other_start.isnot(None) & overlap
+
+        if resource is None:
+            # Return each pair only once
+            condition &= model.variant_id < other.variant_id
+        else:
+            condition &= model.variant_id != other.variant_id
+
+        query = db.session.query(model, other).join(other, condition)
+
+        if resource is not None:
+            query = query.filter(model.variant_id == resource.instance.variant_id)
+
+        if same is not None:
+            query = query.filter(getattr(model, same) == getattr(other, same))
+
+        return [ (self.resource(from_instance=a), self.resource(from_instance=b)) for a, b in query ]
+
+
 class BaseResource(metaclass=ResourceMeta):
     """ Base parent class for all kinds of resources.
 
     :param from_instance: If provided, the created instance wraps this underlying database row.
     :type: SQLAlchemy model instance
+    :param origin: If provided, the created instance is a read-only past state of this resource.
+    :type: BaseResource
     """
 
     __abstract__ = True
@@ -333,15 +884,25 @@ class BaseResource(metaclass=ResourceMeta):
     Used when displaying this resource.  
     """
 
-    def __init__(self, from_instance=None, state=None, **kwargs):
+    __indexes__ = []
+    """List of Indexes on the table of this resource type, in addition to the indexes of foreign keys."""
+
+    __title_fields__ = []
+    """Names of the fields used by `title`, which are loaded by every projection."""
+
+    def __init__(self, from_instance=None, state=None, origin=None, **kwargs):
         instance = from_instance
 
         if instance is None:
             instance = self.model()
 
         object.__setattr__(self, 'instance', instance)
+        object.__setattr__(self, 'origin', origin)
         object.__setattr__(self, 'fields', BoundFields(self))
 
+        # Field values and related resources loaded in bulk, see `prefetch`
+        object.__setattr__(self, 'prefetched', dict())
+
         staged = state
 
         if staged is None:
@@ -353,7 +914,7 @@ class BaseResource(metaclass=ResourceMeta):
         object.__setattr__(self, 'staged', staged)
 
         if self.__acl__ is None:
-            object.__setattr__(self, '__acl__', AccessControlList('r=sAaOg,w=sAaO,d=Oa,c=o'))
+            object.__setattr__(self, '__acl__', AccessControlList(DEFAULT_ACL))
 
         for name, value in kwargs.items():
             setattr(self, name, value)
@@ -377,10 +938,10 @@ class BaseResource(metaclass=ResourceMeta):
         Returns the ID of this resource.
         """
 
-        if self.instance._resource is not None:
-            return self.instance._resource.id
-        
-        return None
+        if self.origin is not None:
+            return self.origin.get_id()
+
+        return self.instance.resource_id
 
     def set_created_by(self, user):
         """
@@ -397,6 +958,9 @@ class BaseResource(metaclass=ResourceMeta):
         For now, this also serves as the "owner" of this resource.
         """
 
+        if 'created_by' in self.prefetched:
+            return self.prefetched['created_by']
+
         if self.instance.created_by is None:
             return None
 
@@ -409,18 +973,107 @@ class BaseResource(metaclass=ResourceMeta):
         List of users to whom this resource has been assigned to.
         """
 
+        if 'assigned_users' in self.prefetched:
+            return self.prefetched['assigned_users']
+
         from crm.models import User
         return [ User(from_instance=i) for i in self.instance.assigned_users ]
 
+    def timeline(self, before=None, limit=20):
+        """
+        Returns a page of the events on this resource's timeline, newest first.
+
+        :param before: Cursor of the page preceding the requested one, or None for the first page.
+        :param limit: Maximum number of events on the page.
+        """
+
+        from crm.models.resource_log import ResourceLog, TimelinePage
+
+        if self.id is None:
+            return TimelinePage(events=[], next=None)
+
+        return ResourceLog.timeline(self.id, before=before, limit=limit)
+
+    @property
+    def read_only(self):
+        """
+        True if this is a past state of a resource, which can not be modified.
+        """
+
+        return self.origin is not None
+
+    def as_of(self, timestamp):
+        """
+        Reconstructs the state of this resource at the given point in time from the resource log.
+
+        Only the values of the fields are reconstructed. The state is replayed from the
+        nearest preceding snapshot, see `ResourceSnapshot`.
+
+        :returns: A read-only resource of the same type.
+        """
+
+        from crm.models import ResourceSnapshot
+
+        state, _ = ResourceSnapshot.replay(self.id, until=timestamp)
+
+        instance = self.model(variant_id=self.instance.variant_id)
+
+        for name, value in state.items():
+            if name in self._fields:
+                self._fields[name].restore(instance, value)
+
+        return self.__class__(from_instance=instance, origin=self)
+
+    def diff(self, start, end):
+        """
+        Compares the states of this resource at two points in time.
+
+        :returns: A dictionary mapping the names of the changed fields to (old value, new value)-pairs,
+            where the values are in the resource log's JSON representation.
+        """
+
+        from crm.models import ResourceSnapshot
+
+        before, _ = ResourceSnapshot.replay(self.id, until=start)
+        after, _ = ResourceSnapshot.replay(self.id, until=end)
+
+        changes = dict()
+
+        for name in self._fields:
+            if before.get(name) != after.get(name):
+                changes[name] = (before.get(name), after.get(name))
+
+        return changes
+
     @classmethod
-    def all(cls, *args, **kwargs):
+    def all(cls, *args, prefetch=None, projection=None, **kwargs):
         """
         Fetches all instances of this resource type from the database.
 
         Wraps a method of the same name from SQLAlchemy.
+
+        :param prefetch: Optional list of the related values to load in bulk, see `prefetch`.
+        :param projection: Optional fields to load, see `projection_options`.
         """
 
-        return [ cls(from_instance=i) for i in cls.model.query.all(*args, **kwargs) ]
+        query = cls.model.query.options(*cls.projection_options(projection, prefetch))
+
+        return cls.prefetch([ cls(from_instance=i) for i in query.all(*args, **kwargs) ], prefetch)
+
+    @classmethod
+    def accessible(cls, user, access_type=None, prefetch=None, projection=None):
+        """
+        Fetches the instances of this resource type to which the user has the given type of access,
+        by default read access. The access checks are performed by the database, see `AccessControlList.condition`.
+        """
+
+        from crm.access import AccessType
+
+        acl = cls.__acl__ or AccessControlList(DEFAULT_ACL)
+        condition = acl.condition(cls, user, access_type or AccessType.Read)
+        query = cls.model.query.options(*cls.projection_options(projection, prefetch)).filter(condition)
+
+        return cls.prefetch([ cls(from_instance=i) for i in query.all() ], prefetch)
 
     @classmethod
     def get(cls, *args, **kwargs):
@@ -436,22 +1089,104 @@ class BaseResource(metaclass=ResourceMeta):
         return cls(from_instance=cls.model.query.get(*args, **kwargs))
 
     @classmethod
-    def filter_by(cls, *args, **kwargs):
+    def filter_by(cls, *args, prefetch=None, projection=None, **kwargs):
         """
         Fetches a list of resources based on specified column values.
 
         Note that values must be specified in the format they are in-database.
         """
 
-        return [ cls(from_instance=i) for i in cls.model.query.filter_by(*args, **kwargs).all() ]
+        query = cls.model.query.options(*cls.projection_options(projection, prefetch))
+
+        return cls.prefetch([ cls(from_instance=i) for i in query.filter_by(*args, **kwargs).all() ], prefetch)
 
     @classmethod
-    def from_statement(cls, *args, **kwargs):
+    def from_statement(cls, *args, prefetch=None, **kwargs):
         """
         Executes an arbitrary SQL statement and wraps it's results into Resource objects of this type.
         """
 
-        return [ cls(from_instance=i) for i in cls.model.query.from_statement(*args, **kwargs).all() ]
+        return cls.prefetch([ cls(from_instance=i) for i in cls.model.query.from_statement(*args, **kwargs).all() ], prefetch)
+
+    @classmethod
+    def get_by_resource_ids(cls, ids, prefetch=None, projection=None):
+        """
+        Fetches instances of this resource type by their resource IDs, in the order of the IDs.
+
+        Unlike `Resource.get_resources`, this does not have to look up the types of the resources.
+        """
+
+        resources = load_by_resource_ids(cls, set(ids), cls.projection_options(projection, prefetch))
+
+        return cls.prefetch([ resources[id] for id in ids if id in resources ], prefetch)
+
+    @classmethod
+    def projection_options(cls, projection, prefetch=None):
+        """
+        Returns the query options which load only the columns needed by a projection.
+        The other columns are deferred, and loaded when they are first accessed.
+
+        :param projection: A `Section` of the layout, or a list of sections, fields or field names.
+            The fields named by `__title_fields__` and the references followed by `prefetch`
+            are always included. `None` loads all columns except those of deferred fields.
+        """
+
+        if projection is None:
+            return []
+
+        if isinstance(projection, Section):
+            projection = [ projection ]
+
+        names = set(cls.__title_fields__)
+
+        for item in projection:
+            if isinstance(item, Section):
+                names.update(field.name for field in item.fields)
+            elif isinstance(item, (Field, BoundField)):
+                names.add(item.name)
+            else:
+                names.add(item)
+
+        names.update(path.split('.')[0] for path in prefetch or [])
+        names -= { 'created_by', 'assigned_users' }
+
+        model = cls.model
+        columns = [ model.variant_id, model.resource_id, model.created_by_id, model.deleted_by_id ]
+
+        for name in sorted(names):
+            if name not in cls._fields:
+                raise ValueError(f'Unknown field of {cls.__name__}: {name}')
+
+            columns += [ getattr(model, column_name) for column_name in cls._fields[name].column_names ]
+
+        return [ load_only(*columns) ]
+
+    @staticmethod
+    def prefetch(resources, spec):
+        """
+        Loads related values of a list of resources in bulk, and caches them on the resources.
+
+        The spec is a list of paths of field names separated by dots, eg. `[ "opportunity.account" ]`.
+        The names refer to `ReferenceField`s, `TableField`s, `created_by` or `assigned_users`.
+        Each name on a path is loaded with one query per `PREFETCH_BATCH_SIZE` resources
+        and resource type, whatever the number of resources, so rendering the values takes
+        a constant number of queries. References without a resource type are followed to
+        resources of any type.
+
+        :returns: The list of resources.
+        """
+
+        tree = dict()
+
+        for path in spec or []:
+            node = tree
+
+            for name in path.split('.'):
+                node = node.setdefault(name, dict())
+
+        prefetch_tree(resources, tree)
+
+        return resources
 
     @classmethod
     def resolve_resource(cls, reference):
@@ -461,11 +1196,9 @@ class BaseResource(metaclass=ResourceMeta):
             raise ValueError('Invalid reference')
 
         resource_type = parts[0]
+        vcls = cls.__metaclass__.__variant_types__.get(resource_type.lower())
 
-        for vcls in cls.__metaclass__.__variant_classes__:
-            if vcls.__name__ == resource_type:
-                break
-        else:
+        if vcls is None or vcls.__name__ != resource_type:
             raise ValueError('Unknown resource type: ' + resource_type)
 
         if len(parts) == 1:
@@ -516,6 +1249,9 @@ class BaseResource(metaclass=ResourceMeta):
         self.stage_mutation(mutation)
 
     def stage_mutation(self, mutation):
+        if self.read_only:
+            raise ValueError('Past states of resources can not be modified')
+
         self.staged[mutation.field.name].stage_mutation(mutation)
 
     def assign_to(self, user):
@@ -524,12 +1260,15 @@ class BaseResource(metaclass=ResourceMeta):
         """
 
         from crm.models import User
+        from crm.auth import get_session_user
+
         if isinstance(user, User):
             user = user.instance
 
-        secondary = ResourceUserAssignment(user_id=user.variant_id, resource_id=self.id)
-        db.session.add(secondary)
-        db.session.commit()
+        assigner = get_session_user()
+        assigned_by = assigner.instance.variant_id if assigner else None
+
+        ResourceUserAssignment.assign([ self.id ], [ user.variant_id ], assigned_by=assigned_by)
 
     def unassign_from(self, user):
         """
@@ -537,11 +1276,78 @@ class BaseResource(metaclass=ResourceMeta):
         """
 
         from crm.models import User
+        from crm.auth import get_session_user
+
         if isinstance(user, User):
             user = user.instance
 
-        ResourceUserAssignment.query.filter_by(user_id=user.variant_id, resource_id=self.id).delete()
-        db.session.commit()
+        unassigner = get_session_user()
+        unassigned_by = unassigner.instance.variant_id if unassigner else None
+
+        ResourceUserAssignment.unassign([ self.id ], [ user.variant_id ], unassigned_by=unassigned_by)
+
+    @property
+    def shared_groups(self):
+        """
+        List of the groups with which this resource has been shared.
+        """
+
+        from crm.models.group import ResourceGroupShare
+        return ResourceGroupShare.groups(self.id)
+
+    def is_shared_with(self, user):
+        """
+        Returns True if this resource has been shared with any of the user's groups.
+        """
+
+        from crm.auth import get_session_principal
+        from crm.models.group import UserGroup, ResourceGroupShare
+
+        if self.id is None:
+            return False
+
+        user_id = user.instance.variant_id
+        principal = get_session_principal()
+
+        # The session's user has their groups cached, and most users are in none
+        if principal is not None and principal['user_id'] == user_id and 'groups' in principal:
+            if len(principal['groups']) == 0:
+                return False
+
+            condition = exists().where(
+                ResourceGroupShare.resource_id == self.id,
+                ResourceGroupShare.group_id.in_(principal['groups']),
+            )
+        else:
+            condition = UserGroup.condition(self.id, user_id)
+
+        return db.session.execute(select(condition)).scalar()
+
+    def share_with(self, group):
+        """
+        Shares this resource with the specified group.
+        """
+
+        from crm.auth import get_session_user
+        from crm.models.group import ResourceGroupShare
+
+        sharer = get_session_user()
+        shared_by = sharer.instance.variant_id if sharer else None
+
+        ResourceGroupShare.share([ self.id ], [ group.id ], shared_by=shared_by)
+
+    def unshare_from(self, group):
+        """
+        Stops sharing this resource with the specified group.
+        """
+
+        from crm.auth import get_session_user
+        from crm.models.group import ResourceGroupShare
+
+        unsharer = get_session_user()
+        unshared_by = unsharer.instance.variant_id if unsharer else None
+
+        ResourceGroupShare.unshare([ self.id ], [ group.id ], unshared_by=unshared_by)
 
     def staged_mutations(self):
         for name, state in self.staged.items():
@@ -553,13 +1359,37 @@ class BaseResource(metaclass=ResourceMeta):
     def create_commit_context(self):
         return CommitContext(self)
 
+    @classmethod
+    def after_import(cls, resources):
+        """
+        Called with each batch of resources created by `crm.imports`, once they have been
+        inserted into the database. Imported resources are not saved with `save`, so this
+        is where subclasses perform the book-keeping of their `save` overrides in bulk.
+        """
+
+        pass
+
+    @classmethod
+    def after_unlink(cls, resource_ids, field, owner_id):
+        """
+        Called with the resources whose reference `field` to `owner_id` has been cleared in bulk
+        by `TableField.remove_rows`. The resources are not saved with `save`, so like
+        `after_import`, this is where subclasses perform the book-keeping of their `save` overrides.
+        """
+
+        pass
+
     def save(self, context=None):
         """
         Saves this resource to the database and performs the associated book-keeping.
         """
 
-        from crm.models import ResourceLog
         from crm.auth import get_session_user
+        from crm.log_writer import get_log_writer
+        from crm.models import UserWork
+
+        if self.read_only:
+            raise ValueError('Past states of resources can not be modified')
 
         ctx = CommitContext(self) if context is None else context
         ctx.resource = self # XXX
@@ -574,35 +1404,55 @@ class BaseResource(metaclass=ResourceMeta):
         if ctx.has_exceptions():
             return
 
+        # The old values have to be recorded before the mutations overwrite them
+        records = []
+
+        for mutation in mutations:
+            values = mutation.record(self)
+
+            if values is not None:
+                records.append((mutation, values))
+
         ctx.commit()
 
         for state in self.staged.values():
             state.clear()
 
-        if self.instance.created_by is None and self.instance != get_session_user():
-            self.instance.created_by = get_session_user().instance
+        user = get_session_user()
+        created = False
+
+        if self.instance.created_by is None and user is not None and user.instance is not self.instance:
+            self.instance.created_by = user.instance
+            created = True
 
         db.session.add(self.instance)
         db.session.commit()
 
-        for mutation in mutations:
-            message = mutation.describe()
+        ctx.run_after_commit()
 
-            if message is None:
-                continue
-            
-            user = get_session_user()
-            subject = user.instance.variant_id if user else None
+        self.prefetched.clear()
+
+        subject = user.instance.variant_id if user else None
+        timestamp = datetime.now()
 
-            log = ResourceLog(
+        if created:
+            UserWork.add_created([ self ], subject, timestamp)
+
+        if created or len(records) > 0:
+            UserWork.touch([ self.id ], timestamp)
+            db.session.commit()
+
+        get_log_writer().write([
+            dict(
                 resource_id=self.id,
-                timestamp=datetime.now(),
+                timestamp=timestamp,
                 subject=subject,
-                message=message,
+                field=mutation.field.name,
+                mutation=mutation.name,
+                old_value=old_value,
+                new_value=new_value,
             )
-
-            db.session.add(log)
-
-        db.session.commit()
+            for mutation, (old_value, new_value) in records
+        ])
 
         print('ID', self.id)
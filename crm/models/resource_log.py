@@ -1,11 +1,245 @@
+from dataclasses import dataclass
+from datetime import datetime
+from sqlalchemy import select, tuple_
+
 from crm.db import db
 
+
+# Messages of entries which record changes to the resource itself rather than to one of its fields.
+# The old and new values of these entries are resource IDs of users, or IDs of groups for the
+# mutations in `GROUP_MUTATIONS`. The describers are given the titles of the referenced users
+# and the names of the referenced groups.
+RESOURCE_MUTATIONS = {
+    'assign': lambda entry, titles, groups: f'Assign to "{titles.get(entry.new_value)}".',
+    'unassign': lambda entry, titles, groups: f'Unassign from "{titles.get(entry.old_value)}".',
+    'transfer': lambda entry, titles, groups: f'Reassign from "{titles.get(entry.old_value)}" to "{titles.get(entry.new_value)}".',
+    'share': lambda entry, titles, groups: f'Share with "{groups.get(entry.new_value)}".',
+    'unshare': lambda entry, titles, groups: f'Stop sharing with "{groups.get(entry.old_value)}".',
+}
+
+GROUP_MUTATIONS = { 'share', 'unshare' }
+
+
 class ResourceLog(db.Model):
+    """
+    Entry on the timeline of a resource.
+
+    On PostgreSQL this table is partitioned by month on `timestamp`, see `crm.log_archive`.
+    Queries which are bounded by `timestamp` only touch the partitions they need.
+    """
+
     id = db.Column(db.Integer, primary_key=True)
     resource_id = db.Column(db.Integer, db.ForeignKey('resource.id'), nullable=False)
-    subject = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    subject = db.Column(db.Integer, db.ForeignKey('user.id'))
     timestamp = db.Column(db.DateTime, nullable=False)
-    message = db.Column(db.String, nullable=False)
+
+    # Name of the field and the mutation this entry records, alongside the JSON
+    # representations of the field's value before and after the mutation.
+    field = db.Column(db.String)
+    mutation = db.Column(db.String)
+    old_value = db.Column(db.JSON)
+    new_value = db.Column(db.JSON)
+
+    # Pre-rendered message of entries which do not record a mutation of a field.
+    message = db.Column(db.String)
 
     resource = db.relationship('Resource')
     user = db.relationship('User')
+
+    __table_args__ = (
+        # Backs the keyset pagination of resource timelines.
+        db.Index('ix_resource_log_resource_id_timestamp', 'resource_id', 'timestamp'),
+        db.Index('ix_resource_log_resource_id_field_timestamp', 'resource_id', 'field', 'timestamp'),
+    )
+
+    @classmethod
+    def describe_entries(cls, entries):
+        """
+        Renders human readable messages for a list of log entries.
+
+        The titles of all resources referenced by the entries are fetched in
+        a single batch, instead of once per entry, and so are the names of all
+        referenced groups.
+
+        :returns: List of messages in the same order as the entries.
+        """
+
+        from crm.models import Resource, Group
+
+        resources = Resource.get_resources(entry.resource_id for entry in entries if entry.field is not None)
+        fields = []
+        references = set()
+        group_ids = set()
+
+        for entry in entries:
+            field = None
+
+            if entry.resource_id in resources:
+                field = resources[entry.resource_id]._fields.get(entry.field)
+
+            if field is not None:
+                references.update(field.references(entry.old_value))
+                references.update(field.references(entry.new_value))
+            elif entry.field is None and entry.mutation in RESOURCE_MUTATIONS:
+                values = { value for value in (entry.old_value, entry.new_value) if value is not None }
+
+                if entry.mutation in GROUP_MUTATIONS:
+                    group_ids.update(values)
+                else:
+                    references.update(values)
+
+            fields.append(field)
+
+        titles = {
+            id: resource.title()
+            for id, resource in Resource.get_resources(references).items()
+        }
+
+        groups = dict()
+
+        if len(group_ids) > 0:
+            groups = dict(db.session.execute(
+                select(Group.id, Group.name).where(Group.id.in_(group_ids))
+            ).all())
+
+        messages = []
+
+        for entry, field in zip(entries, fields):
+            message = entry.message
+
+            if field is not None:
+                attr = getattr(type(field), entry.mutation, None)
+
+                if attr is not None and attr.describe_func is not None:
+                    message = attr.describe_func(field, entry, titles)
+            elif entry.field is None and entry.mutation in RESOURCE_MUTATIONS:
+                message = RESOURCE_MUTATIONS[entry.mutation](entry, titles, groups)
+
+            messages.append(message)
+
+        return messages
+
+    def describe(self):
+        return self.describe_entries([self])[0]
+
+    @classmethod
+    def recent(cls, since, limit=50):
+        """
+        Fetches the log entries written after `since` across all resources, newest first.
+        """
+
+        return cls.query \
+            .filter(cls.timestamp >= since) \
+            .order_by(cls.timestamp.desc(), cls.id.desc()) \
+            .limit(limit) \
+            .all()
+
+    @classmethod
+    def field_history(cls, resource_id, field, limit=None):
+        """
+        Fetches the log entries recording changes to a single field of a resource, newest first.
+        """
+
+        query = cls.query \
+            .filter(cls.resource_id == resource_id, cls.field == field) \
+            .order_by(cls.timestamp.desc(), cls.id.desc())
+
+        if limit is not None:
+            query = query.limit(limit)
+
+        return query.all()
+
+    @classmethod
+    def timeline(cls, resource_id, before=None, limit=20):
+        """
+        Fetches a single page of log entries associated with a resource, newest first.
+
+        :param resource_id: ID of the resource whose log entries are fetched.
+        :param before: Cursor returned as `TimelinePage.next` by a previous call.
+            Only entries older than the cursor are returned.
+        :param limit: Maximum number of entries on the page.
+        """
+
+        from crm.models import User
+
+        query = cls.query.filter(cls.resource_id == resource_id)
+
+        if before is not None:
+            timestamp, id = TimelinePage.decode_cursor(before)
+            query = query.filter(tuple_(cls.timestamp, cls.id) < tuple_(timestamp, id))
+
+        # Fetch one extra row to find out if there is an older page
+        entries = query \
+            .order_by(cls.timestamp.desc(), cls.id.desc()) \
+            .limit(limit + 1) \
+            .all()
+
+        next_cursor = None
+
+        if len(entries) > limit:
+            entries = entries[:limit]
+            next_cursor = TimelinePage.encode_cursor(entries[-1])
+
+        # Load the authors of all of the entries at once, instead of lazy-loading them one by one
+        subjects = { entry.subject for entry in entries if entry.subject is not None }
+        authors = dict()
+
+        if len(subjects) > 0:
+            query = User.model.query.filter(User.model.variant_id.in_(subjects))
+
+            authors = { row.variant_id: User(from_instance=row) for row in query }
+
+        events = [
+            TimelineEvent(
+                id=entry.id,
+                timestamp=entry.timestamp,
+                message=message,
+                author=authors.get(entry.subject),
+            )
+            for entry, message in zip(entries, cls.describe_entries(entries))
+        ]
+
+        return TimelinePage(events=events, next=next_cursor)
+
+
+@dataclass
+class TimelineEvent:
+    id: int
+    timestamp: datetime
+    message: str
+    author: object
+
+    def to_json(self):
+        return {
+            "id": self.id,
+            "timestamp": self.timestamp.isoformat(),
+            "message": self.message,
+            "author": None if self.author is None else {
+                "id": self.author.id,
+                "title": self.author.title(),
+            },
+        }
+
+
+@dataclass
+class TimelinePage:
+    events: list
+    next: str
+
+    def to_json(self):
+        return {
+            "events": [ event.to_json() for event in self.events ],
+            "next": self.next,
+        }
+
+    @staticmethod
+    def encode_cursor(entry):
+        return entry.timestamp.isoformat() + '_' + str(entry.id)
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            timestamp, id = cursor.rsplit('_', 1)
+            return datetime.fromisoformat(timestamp), int(id)
+        except ValueError:
+            raise ValueError('Invalid timeline cursor: ' + cursor)
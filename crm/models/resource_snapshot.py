@@ -0,0 +1,209 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, insert, delete, exists, func, or_, tuple_
+
+from crm.db import db
+
+# Maximum number of resources whose snapshots are captured with a single query, see `ResourceSnapshot.capture_many`
+CAPTURE_BATCH_SIZE = 500
+
+class ResourceSnapshot(db.Model):
+    """
+    Compacted state of a resource's fields, as reconstructed from the resource log.
+
+    Snapshots are captured every `AUDIT_SNAPSHOT_INTERVAL` log entries, so that
+    reconstructing a past state of a resource needs to replay at most that many
+    entries instead of the resource's whole history.
+
+    Log entries are ordered by their timestamps and then by their IDs, and a snapshot
+    is ordered like the last entry included in it. Entries may be committed after entries
+    with later timestamps, eg. by the batched log writer. A snapshot therefore only
+    includes entries older than `AUDIT_SNAPSHOT_DELAY` seconds, and writing an entry
+    which precedes some of a resource's snapshots deletes those snapshots, see `invalidate`.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    resource_id = db.Column(db.Integer, db.ForeignKey('resource.id'), nullable=False)
+
+    # ID and timestamp of the last log entry included in this snapshot
+    log_id = db.Column(db.Integer, nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False)
+
+    # Mapping from field names to their values in the resource log's JSON representation
+    state = db.Column(db.JSON, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_resource_snapshot_resource_id_timestamp', 'resource_id', 'timestamp'),
+    )
+
+    @classmethod
+    def replay(cls, resource_id, until=None):
+        """
+        Reconstructs the state of a resource's fields from the nearest snapshot and the log entries after it.
+
+        :param resource_id: ID of the resource.
+        :param until: If provided, only log entries up to and including this timestamp are applied.
+        :returns: A tuple of the state and the last log entry applied on top of the snapshot, if any.
+        """
+
+        from crm.models import ResourceLog
+
+        query = cls.query.filter(cls.resource_id == resource_id)
+
+        if until is not None:
+            query = query.filter(cls.timestamp <= until)
+
+        snapshot = query.order_by(cls.timestamp.desc(), cls.log_id.desc()).first()
+
+        state = dict()
+        entries = ResourceLog.query.filter(ResourceLog.resource_id == resource_id)
+
+        if snapshot is not None:
+            state = dict(snapshot.state)
+            entries = entries.filter(
+                tuple_(ResourceLog.timestamp, ResourceLog.id) > tuple_(snapshot.timestamp, snapshot.log_id)
+            )
+
+        if until is not None:
+            entries = entries.filter(ResourceLog.timestamp <= until)
+
+        last = None
+
+        for entry in entries.order_by(ResourceLog.timestamp, ResourceLog.id):
+            if entry.mutation == 'set_value':
+                state[entry.field] = entry.new_value
+
+            last = entry
+
+        return state, last
+
+    @classmethod
+    def capture_if_due(cls, resource_id):
+        """
+        Captures a new snapshot of the resource if enough log entries have
+        accumulated since the previous one.
+        """
+
+        cls.capture_due([ resource_id ])
+
+    @classmethod
+    def capture_due(cls, resource_ids):
+        """
+        Captures new snapshots of those of the resources which have accumulated enough
+        log entries since their previous snapshots.
+
+        The resources are checked with a single query.
+        """
+
+        from crm.models import ResourceLog
+
+        interval = current_app.config['AUDIT_SNAPSHOT_INTERVAL']
+        resource_ids = list(resource_ids)
+
+        if not interval or len(resource_ids) == 0:
+            return
+
+        # Entries which come after every snapshot of their resource, in the order of `replay`
+        included = exists() \
+            .where(cls.resource_id == ResourceLog.resource_id) \
+            .where(tuple_(cls.timestamp, cls.log_id) >= tuple_(ResourceLog.timestamp, ResourceLog.id))
+
+        due = db.session.query(ResourceLog.resource_id) \
+            .filter(ResourceLog.resource_id.in_(resource_ids)) \
+            .filter(~included) \
+            .group_by(ResourceLog.resource_id) \
+            .having(db.func.count() >= interval)
+
+        cls.capture_many([ resource_id for resource_id, in due.all() ])
+
+    @classmethod
+    def capture(cls, resource_id, until=None):
+        """
+        Captures a snapshot of the resource at its last log entry, or at the last entry up to `until`.
+        Entries written less than `AUDIT_SNAPSHOT_DELAY` seconds ago are left out.
+
+        Nothing is captured if there are no log entries after the previous snapshot.
+        """
+
+        cls.capture_many([ resource_id ], until=until)
+
+    @classmethod
+    def capture_many(cls, resource_ids, until=None):
+        """
+        Captures snapshots of the resources like `capture`, `CAPTURE_BATCH_SIZE` resources at a time.
+
+        The latest snapshots of a batch and the log entries after them are loaded with a single
+        query ordered like `replay`, and the new snapshots are inserted with a single statement.
+        """
+
+        from crm.models import ResourceLog
+
+        watermark = datetime.now() - timedelta(seconds=current_app.config['AUDIT_SNAPSHOT_DELAY'])
+        until = watermark if until is None else min(until, watermark)
+        resource_ids = sorted(set(resource_ids))
+
+        for i in range(0, len(resource_ids), CAPTURE_BATCH_SIZE):
+            batch = resource_ids[i:i + CAPTURE_BATCH_SIZE]
+
+            ranked = select(
+                cls.resource_id,
+                cls.timestamp,
+                cls.log_id,
+                cls.state,
+                func.row_number().over(
+                    partition_by=cls.resource_id,
+                    order_by=(cls.timestamp.desc(), cls.log_id.desc()),
+                ).label('rank'),
+            ) \
+                .where(cls.resource_id.in_(batch), cls.timestamp <= until) \
+                .subquery()
+
+            latest = select(ranked).where(ranked.c.rank == 1).subquery()
+
+            query = select(ResourceLog.resource_id, ResourceLog.id, ResourceLog.timestamp, ResourceLog.mutation,
+                           ResourceLog.field, ResourceLog.new_value, latest.c.state) \
+                .outerjoin(latest, latest.c.resource_id == ResourceLog.resource_id) \
+                .where(ResourceLog.resource_id.in_(batch), ResourceLog.timestamp <= until) \
+                .where(or_(
+                    latest.c.log_id.is_(None),
+                    tuple_(ResourceLog.timestamp, ResourceLog.id) > tuple_(latest.c.timestamp, latest.c.log_id),
+                )) \
+                .order_by(ResourceLog.resource_id, ResourceLog.timestamp, ResourceLog.id)
+
+            snapshots = dict()
+
+            for resource_id, log_id, timestamp, mutation, field, new_value, state in db.session.execute(query):
+                snapshot = snapshots.get(resource_id)
+
+                if snapshot is None:
+                    snapshot = snapshots[resource_id] = dict(resource_id=resource_id, state=dict(state or {}))
+
+                if mutation == 'set_value':
+                    snapshot['state'][field] = new_value
+
+                snapshot['log_id'] = log_id
+                snapshot['timestamp'] = timestamp
+
+            if len(snapshots) > 0:
+                db.session.execute(insert(cls.__table__), list(snapshots.values()))
+
+            db.session.commit()
+
+    @classmethod
+    def invalidate(cls, entries):
+        """
+        Deletes the snapshots which are ordered after the earliest of the given log entries,
+        as they were captured without it. Called as the entries are written.
+        """
+
+        timestamps = [ entry['timestamp'] for entry in entries if entry.get('timestamp') is not None ]
+
+        if len(timestamps) == 0:
+            return
+
+        # Entries are written with later IDs than any snapshot's, so only the timestamps need comparing
+        db.session.execute(
+            delete(cls.__table__)
+                .where(cls.resource_id.in_({ entry['resource_id'] for entry in entries }))
+                .where(cls.timestamp > min(timestamps))
+        )
@@ -1,18 +1,42 @@
-from crm.models.resource import BaseResource, Section
+from crm.models.resource import BaseResource, Section, DateRange
 from crm.models.opportunity import Opportunity
 from crm.fields import TextField, ReferenceField, DateField, CurrencyField
 
 
 class SalesOrder(BaseResource):
     opportunity = ReferenceField(Opportunity)
-    description = TextField()
+    description = TextField(deferred=True)
     start_date = DateField()
     end_date = DateField()
     base_price = CurrencyField()
     hourly_price = CurrencyField()
 
+    active = DateRange(start_date, end_date)
+
     __layout__ = [
         Section(None, [ opportunity, description ]),
         Section(None, [ start_date, end_date ]),
         Section(None, [ base_price, hourly_price ]),
     ]
+
+    def save(self, context=None):
+        from crm.models import SalesRollup
+
+        previous_opportunity = self.instance.opportunity
+
+        super().save(context)
+
+        SalesRollup.refresh({ previous_opportunity, self.instance.opportunity })
+
+    @classmethod
+    def after_import(cls, resources):
+        from crm.models import SalesRollup
+
+        SalesRollup.refresh({ resource.instance.opportunity for resource in resources })
+
+    @classmethod
+    def after_unlink(cls, resource_ids, field, owner_id):
+        from crm.models import SalesRollup
+
+        # The orders move from the rows of their opportunity to the rows without one
+        SalesRollup.refresh({ owner_id, None })
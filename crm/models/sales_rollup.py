@@ -0,0 +1,132 @@
+from sqlalchemy import select, delete, insert, update, func, literal, or_
+
+from crm.db import db, insert_ignore
+
+
+class SalesRollupVersion(db.Model):
+    """
+    Counter of the refreshes of the `SalesRollup` rows.
+
+    Every write to the sales orders refreshes their rollup rows, so caches of results
+    computed from the sales orders remain valid for as long as the counter is unchanged.
+    """
+
+    __tablename__ = 'sales_rollup_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+
+
+class SalesRollup(db.Model):
+    """
+    Pre-aggregated sums and counts of sales order prices.
+
+    Each row totals the orders sharing a price field, currency, account, opportunity,
+    creator and starting month. The rows of an opportunity are recomputed whenever
+    one of its sales orders, or the opportunity itself, is saved. Reports over any
+    combination of these groupings then only have to sum up the rollup rows.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Name of the `SalesOrder` price field, eg. "base_price"
+    price = db.Column(db.String, nullable=False)
+
+    currency = db.Column(db.String)
+    account_id = db.Column(db.Integer, db.ForeignKey('resource.id'))
+    opportunity_id = db.Column(db.Integer, db.ForeignKey('resource.id'))
+    creator_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    month = db.Column(db.String)
+
+    count = db.Column(db.Integer, nullable=False)
+
+    # Sum of the amounts in the currency's minor units
+    total = db.Column(db.BigInteger, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_sales_rollup_price_opportunity_id', 'price', 'opportunity_id'),
+    )
+
+    GROUPINGS = {
+        'currency': 'currency',
+        'account': 'account_id',
+        'opportunity': 'opportunity_id',
+        'creator': 'creator_id',
+        'month': 'month',
+    }
+
+    @classmethod
+    def refresh(cls, opportunity_ids=None):
+        """
+        Recomputes the rows of the given opportunities, or all of the rows if none are given.
+
+        `None` in `opportunity_ids` refers to the orders without an opportunity.
+        """
+
+        from crm.reports import SALES_ORDER_PRICES, sales_order_query, sales_order_groupings
+
+        columns = [ 'price', 'currency', 'account_id', 'opportunity_id', 'creator_id', 'month', 'count', 'total' ]
+
+        for price in SALES_ORDER_PRICES:
+            groupings, amount = sales_order_groupings(price)
+            keys = [ groupings[name] for name in cls.GROUPINGS ]
+
+            query = sales_order_query(
+                literal(price),
+                *keys,
+                func.count(),
+                func.coalesce(func.sum(amount), 0),
+            ).group_by(*keys)
+
+            condition = cls.price == price
+
+            if opportunity_ids is not None:
+                query = query.where(opportunity_condition(groupings['opportunity'], opportunity_ids))
+                condition &= opportunity_condition(cls.opportunity_id, opportunity_ids)
+
+            db.session.execute(delete(cls.__table__).where(condition))
+            db.session.execute(insert(cls.__table__).from_select(columns, query))
+
+        table = SalesRollupVersion.__table__
+        db.session.execute(insert_ignore(table).values(id=1, version=0))
+        db.session.execute(update(table).values(version=table.c.version + 1))
+
+        db.session.commit()
+
+    @classmethod
+    def version(cls):
+        """
+        Returns the number of times the rows have been refreshed, see `SalesRollupVersion`.
+        """
+
+        return db.session.execute(select(SalesRollupVersion.version)).scalar() or 0
+
+    @classmethod
+    def totals(cls, price, group_by=()):
+        """
+        Sums up the rollup rows of a price field by the given groupings.
+
+        The totals are always grouped by currency in addition to `group_by`.
+
+        :returns: List of tuples of the grouping values followed by the count and the total in minor units.
+        """
+
+        names = [ 'currency' ] + [ name for name in group_by if name != 'currency' ]
+        keys = [ getattr(cls, cls.GROUPINGS[name]) for name in names ]
+
+        query = select(*keys, func.sum(cls.count), func.sum(cls.total)) \
+            .where(cls.price == price) \
+            .group_by(*keys) \
+            .order_by(*keys)
+
+        return names, db.session.execute(query).all()
+
+
+def opportunity_condition(column, opportunity_ids):
+    ids = [ id for id in opportunity_ids if id is not None ]
+    condition = column.in_(ids)
+
+    if None in opportunity_ids:
+        condition = or_(condition, column.is_(None))
+
+    return condition
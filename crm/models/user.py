@@ -19,9 +19,24 @@ class User(BaseResource):
 
     assigned_resources = db.relationship('Resource', secondary='resource_user')
 
+    # Incremented whenever the role, the password or the groups change, so that the
+    # principals cached in the users' sessions are reloaded, see `crm.auth`
+    principal_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    # Fields whose changes increment `principal_version`
+    PRINCIPAL_FIELDS = ('role', 'password')
+
+    __title_fields__ = [ 'username' ]
+
     def title(self):
         return self.username
 
+    def save(self, context=None):
+        if self.id is not None and any(mutation.field.name in self.PRINCIPAL_FIELDS for mutation in self.staged_mutations()):
+            self.instance.principal_version = self.instance.principal_version + 1
+
+        super().save(context)
+
     def validate(self, ctx):
         super().validate(ctx)
 
@@ -0,0 +1,172 @@
+from datetime import datetime
+from sqlalchemy import select, update, delete, insert, literal, func
+
+from crm.db import db, insert_ignore
+
+# Activity time of resources which have no log entries
+EPOCH = datetime(1970, 1, 1)
+
+class UserWork(db.Model):
+    """
+    Materialized index of the resources each user has created or been assigned to.
+
+    The rows are maintained by `BaseResource.save` and the `ResourceUserAssignment`
+    operations, and can be rebuilt from scratch with `flask user:rebuild-work-index`.
+    Listing a user's resources of a given type, most recently active first, is a
+    single range scan over the index on `(user_id, type, last_activity)`.
+    """
+
+    __tablename__ = 'user_work'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    resource_id = db.Column(db.Integer, db.ForeignKey('resource.id'), primary_key=True, index=True)
+
+    # Either "created" or "assigned"
+    relation = db.Column(db.String, primary_key=True)
+
+    # Name of the resource's type, eg. "Account"
+    type = db.Column(db.String, nullable=False)
+
+    # Time of the latest change to the resource or to its assignments
+    last_activity = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_user_work_user_id_type_last_activity', 'user_id', 'type', 'last_activity'),
+    )
+
+    @classmethod
+    def add_created(cls, resources, user_id, timestamp):
+        db.session.execute(insert_ignore(cls.__table__), [
+            dict(
+                user_id=user_id,
+                resource_id=resource.id,
+                relation='created',
+                type=type(resource).__name__,
+                last_activity=timestamp,
+            )
+            for resource in resources
+        ])
+
+    @classmethod
+    def add_assigned(cls, resource_ids, user_ids, timestamp):
+        """
+        Adds rows for the existing assignments between the given resources and users.
+        """
+
+        from crm.models import Resource
+        from crm.models.resource import ResourceUserAssignment
+
+        assignments = select(
+                ResourceUserAssignment.user_id,
+                ResourceUserAssignment.resource_id,
+                literal('assigned'),
+                Resource.type_expression(),
+                literal(timestamp, db.DateTime),
+            ) \
+            .join(Resource, Resource.id == ResourceUserAssignment.resource_id) \
+            .where(ResourceUserAssignment.resource_id.in_(list(resource_ids))) \
+            .where(ResourceUserAssignment.user_id.in_(list(user_ids)))
+
+        db.session.execute(insert_ignore(cls.__table__).from_select(
+            [ 'user_id', 'resource_id', 'relation', 'type', 'last_activity' ],
+            assignments,
+        ))
+
+    @classmethod
+    def remove_assigned(cls, resource_ids, user_ids):
+        db.session.execute(
+            delete(cls.__table__)
+                .where(cls.relation == 'assigned')
+                .where(cls.resource_id.in_(list(resource_ids)))
+                .where(cls.user_id.in_(list(user_ids)))
+        )
+
+    @classmethod
+    def touch(cls, resource_ids, timestamp):
+        """
+        Updates the time of the latest activity of the given resources for all of their users.
+        """
+
+        db.session.execute(
+            update(cls.__table__)
+                .where(cls.resource_id.in_(list(resource_ids)))
+                .values(last_activity=timestamp)
+        )
+
+    @classmethod
+    def resources(cls, user_id, type, limit=None, prefetch=None, projection=None):
+        """
+        Fetches the resources of a type which the user has created or been assigned to,
+        most recently active first.
+
+        :param prefetch: Optional list of the related values to load in bulk, see `BaseResource.prefetch`.
+        :param projection: Optional fields to load, see `BaseResource.projection_options`.
+        """
+
+        from crm.models import Resource
+
+        # A resource may be both created by and assigned to the user
+        last_activity = func.max(cls.last_activity)
+
+        query = select(cls.resource_id) \
+            .where(cls.user_id == user_id, cls.type == type) \
+            .group_by(cls.resource_id) \
+            .order_by(last_activity.desc(), cls.resource_id.desc())
+
+        if limit is not None:
+            query = query.limit(limit)
+
+        ids = db.session.execute(query).scalars().all()
+
+        return Resource.get_type(type).get_by_resource_ids(ids, prefetch=prefetch, projection=projection)
+
+    @classmethod
+    def rebuild(cls):
+        """
+        Recreates all of the rows from the resource tables, the assignments and the resource log.
+
+        :returns: The number of rows written.
+        """
+
+        from crm.models import Resource, ResourceLog, BaseResource
+        from crm.models.resource import ResourceUserAssignment
+
+        columns = [ 'user_id', 'resource_id', 'relation', 'type', 'last_activity' ]
+
+        activity = select(ResourceLog.resource_id, func.max(ResourceLog.timestamp).label('timestamp')) \
+            .group_by(ResourceLog.resource_id) \
+            .subquery()
+
+        last_activity = func.coalesce(activity.c.timestamp, literal(EPOCH, db.DateTime))
+
+        db.session.execute(delete(cls.__table__))
+
+        for vcls in BaseResource.__variant_classes__:
+            db.session.execute(insert(cls.__table__).from_select(columns, select(
+                    vcls.model.created_by_id,
+                    vcls.model.resource_id,
+                    literal('created'),
+                    literal(vcls.__name__),
+                    last_activity,
+                )
+                .outerjoin(activity, activity.c.resource_id == vcls.model.resource_id)
+                .where(vcls.model.created_by_id.isnot(None), vcls.model.resource_id.isnot(None))
+            ))
+
+        db.session.execute(insert(cls.__table__).from_select(columns, select(
+                ResourceUserAssignment.user_id,
+                ResourceUserAssignment.resource_id,
+                literal('assigned'),
+                Resource.type_expression(),
+                func.coalesce(activity.c.timestamp, ResourceUserAssignment.assigned_at, literal(EPOCH, db.DateTime)),
+            )
+            .join(Resource, Resource.id == ResourceUserAssignment.resource_id)
+            .outerjoin(activity, activity.c.resource_id == Resource.id)
+        ))
+
+        count = db.session.execute(select(func.count()).select_from(cls.__table__)).scalar()
+
+        db.session.commit()
+
+        return count
+
@@ -7,6 +7,7 @@ class MutationAttribute:
         self.name = commit_func.__name__
         self.commit_func = commit_func
         self.pre_commit_func = None
+        self.record_func = None
         self.describe_func = None
         self.field = None
 
@@ -14,6 +15,10 @@ class MutationAttribute:
         self.pre_commit_func = func
         return func
 
+    def record(self, func):
+        self.record_func = func
+        return func
+
     def describe(self, func):
         self.describe_func = func
         return func
@@ -34,13 +39,21 @@ class Mutation:
     def type(self):
         return self.__class__
 
+    @property
+    def name(self):
+        return self.__class__.__name__
+
     def check(self, ctx, *args, **kwargs):
         pass
 
     def commit(self, ctx, *args, **kwargs):
         pass
 
-    def describe(self, *args, **kwargs):
+    def record(self, resource):
+        """
+        Returns the (old value, new value)-pair written to the resource's log, or None
+        if this mutation should not be logged. Called before the mutation is committed.
+        """
         pass
 
 
@@ -55,6 +68,10 @@ class DecoratorMutation(Mutation):
     def type(self):
         return self.attr
 
+    @property
+    def name(self):
+        return self.attr.name
+
     def check(self, ctx):
         if self.attr.pre_commit_func:
             self.attr.pre_commit_func(self.field, ctx, *self.args, **self.kwargs)
@@ -62,9 +79,9 @@ class DecoratorMutation(Mutation):
     def commit(self, ctx):
         self.attr.commit_func(self.field, ctx, *self.args, **self.kwargs)
 
-    def describe(self):
-        if self.attr.describe_func:
-            return self.attr.describe_func(self.field, *self.args, **self.kwargs)
+    def record(self, resource):
+        if self.attr.record_func:
+            return self.attr.record_func(self.field, resource, *self.args, **self.kwargs)
 
 
 def mutation(func):
@@ -141,6 +158,7 @@ class CommitContext:
         self.failed = False
         self.exception_policy = exception_policy
         self.exceptions = []
+        self.after_commit_funcs = []
 
         if self.exception_policy is None:
             self.exception_policy = CommitExceptionPolicy()
@@ -164,6 +182,20 @@ class CommitContext:
     def warning(self, *args, **kwargs):
         self.exception(CommitWarning(*args, **kwargs))
 
+    def after_commit(self, func):
+        """
+        Registers a function to be called once the changes made by the mutations have been
+        committed to the database, for book-keeping which commits changes of its own.
+        """
+
+        self.after_commit_funcs.append(func)
+
+    def run_after_commit(self):
+        funcs, self.after_commit_funcs = self.after_commit_funcs, []
+
+        for func in funcs:
+            func()
+
     def field(self, field):
         if isinstance(field, str):
             field = self.resource.fields[field]
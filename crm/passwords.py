@@ -0,0 +1,214 @@
+"""
+Password hashing and login rate limiting.
+
+Hashing a password is deliberately slow and CPU-bound. Many passwords are hashed
+in a pool of worker processes, one for each CPU core. Passwords given at login are
+verified in the request's own worker. Logins are rate limited per username and per
+IP address before any hashing takes place, and the number of verifications running
+at once is bounded across all of the worker processes of a host, so that a flood of
+logins turns away further logins instead of occupying every worker.
+"""
+
+import fcntl
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+# Fewer passwords than this are hashed in the calling process, as starting the pool would take longer
+MIN_POOL_PASSWORDS = 8
+
+
+def hash_password(password):
+    """
+    Hashes a password with the method and cost configured as `PASSWORD_HASH_METHOD`.
+    """
+
+    return generate_password_hash(password, method=current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def parse_hash_method(method):
+    """
+    Splits a hash method, such as "pbkdf2:sha256", into its name and parameters, filling in
+    the parameters which werkzeug fills in when hashing. The method of a hash, which is
+    its part before the first "$", always has all of its parameters.
+    """
+
+    name, *params = method.split(':')
+
+    if name == 'pbkdf2':
+        hash_name = params[0] if len(params) > 0 and params[0] else 'sha256'
+        iterations = int(params[1]) if len(params) > 1 and params[1] else DEFAULT_PBKDF2_ITERATIONS
+
+        return name, hash_name, iterations
+
+    return (name, *params)
+
+
+def needs_rehash(hash):
+    """
+    Returns true if a hash was made with other parameters than the configured ones.
+    """
+
+    method = hash.split('$', 1)[0]
+
+    return parse_hash_method(method) != parse_hash_method(current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def hash_passwords(passwords):
+    """
+    Hashes a list of passwords in parallel.
+
+    :returns: List of the hashes, in the order of the passwords.
+    """
+
+    hash = partial(generate_password_hash, method=current_app.config['PASSWORD_HASH_METHOD'])
+    workers = os.cpu_count() or 1
+
+    if workers == 1 or len(passwords) < MIN_POOL_PASSWORDS:
+        return [ hash(password) for password in passwords ]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(hash, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+class VerifierBusy(Exception):
+    """
+    Raised when a password can not be verified as too many verifications are already running.
+    """
+
+
+class VerificationSlots:
+    """
+    A limited number of slots for password verifications, shared by all processes of a host.
+
+    Each slot is an exclusive lock on a file in `directory`. Locks are taken without
+    waiting, so a verification is turned away at once when every slot is taken, and
+    the operating system releases the locks of processes which die.
+    """
+
+    def __init__(self, directory, slots):
+        self.directory = directory
+        self.slots = slots
+
+    def acquire(self):
+        """
+        Takes a free slot.
+
+        :returns: The open file of the slot, or `None` if every slot is taken.
+        """
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Trying the slots in a random order spreads the processes over them
+        for slot in random.sample(range(self.slots), self.slots):
+            file = open(os.path.join(self.directory, f'slot-{slot}'), 'a')
+
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return file
+            except BlockingIOError:
+                file.close()
+
+        return None
+
+    def release(self, file):
+        fcntl.flock(file, fcntl.LOCK_UN)
+        file.close()
+
+
+class TokenBuckets:
+    """
+    Token buckets of attempts, keyed eg. by username or IP address.
+
+    Each key may make `burst` attempts at once, and regains `rate` attempts per second
+    up to `burst`. The buckets are kept in the memory of each process.
+    """
+
+    # Number of buckets above which the full and the least recently created buckets are discarded
+    MAX_BUCKETS = 100000
+
+    def __init__(self, burst, rate):
+        self.burst = burst
+        self.rate = rate
+        self.buckets = dict()
+        self.lock = threading.Lock()
+
+    def take(self, key):
+        """
+        Takes a token from a key's bucket, and returns false if there were none left.
+        """
+
+        now = time.monotonic()
+
+        with self.lock:
+            tokens, last = self.buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+
+            if tokens < 1:
+                self.buckets[key] = (tokens, now)
+                return False
+
+            self.buckets[key] = (tokens - 1, now)
+
+            if len(self.buckets) > self.MAX_BUCKETS:
+                self.prune(now)
+
+            return True
+
+    def prune(self, now):
+        self.buckets = {
+            key: (tokens, last)
+            for key, (tokens, last) in self.buckets.items()
+            if tokens + (now - last) * self.rate < self.burst
+        }
+
+        # Under a flood of distinct keys, keep the newer half
+        if len(self.buckets) > self.MAX_BUCKETS // 2:
+            self.buckets = dict(list(self.buckets.items())[-(self.MAX_BUCKETS // 2):])
+
+
+def check_login_rate(username, address):
+    """
+    Returns false if there have been too many login attempts for the username or from the address.
+    """
+
+    buckets = current_app.extensions['login_rate_limit']
+
+    return buckets.take('address:' + str(address)) and buckets.take('username:' + username.lower())
+
+
+def verify_password(hash, password):
+    """
+    Checks a password given at login against a hash in one of the verification slots.
+
+    :raises VerifierBusy: If every slot is taken.
+    """
+
+    slots = current_app.extensions['password_verification_slots']
+    slot = slots.acquire()
+
+    if slot is None:
+        raise VerifierBusy()
+
+    try:
+        return check_password_hash(hash, password)
+    finally:
+        slots.release(slot)
+
+
+def init_app(app):
+    app.extensions['password_verification_slots'] = VerificationSlots(
+        directory=app.config['LOGIN_HASH_LOCK_DIR'] or os.path.join(tempfile.gettempdir(), 'crm-login-slots'),
+        slots=app.config['LOGIN_HASH_SLOTS'],
+    )
+
+    app.extensions['login_rate_limit'] = TokenBuckets(
+        burst=app.config['LOGIN_RATE_BURST'],
+        rate=app.config['LOGIN_RATE_PER_MINUTE'] / 60,
+    )
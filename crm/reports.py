@@ -0,0 +1,381 @@
+"""
+Sales reports computed by the database.
+
+Prices are summed up as integer minor units with SQL `GROUP BY` queries, so the
+totals are exact and no sales order has to be loaded into Python to compute them.
+Totals across currencies are summed up by currency and date in the database, and
+the sums are then converted at once, see `crm.exchange_rates.RateTable`.
+"""
+
+import click
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import date
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select, func, type_coerce
+
+from crm.db import db
+from crm.fields import CurrencyValue
+from crm.utils import add_months
+
+
+SALES_ORDER_PRICES = ('base_price', 'hourly_price')
+
+SALES_ORDER_GROUPINGS = ('currency', 'account', 'opportunity', 'creator', 'month')
+
+
+def month_expression(column):
+    """
+    Returns an SQL expression which formats a timestamp column as "YYYY-MM".
+    """
+
+    if db.engine.dialect.name == 'postgresql':
+        return func.to_char(column, 'YYYY-MM')
+
+    return func.strftime('%Y-%m', column)
+
+
+def sales_order_groupings(price):
+    """
+    Returns the SQL expressions of the groupings for a price field of `SalesOrder`,
+    alongside the expression of the price's amount.
+
+    The expressions refer to the tables joined by `sales_order_query`.
+    """
+
+    from crm.models import SalesOrder, Opportunity
+
+    if price not in SALES_ORDER_PRICES:
+        raise ValueError('Unknown price field: ' + price)
+
+    order = SalesOrder.model
+
+    groupings = dict(
+        currency=getattr(order, price + '_1'),
+        account=Opportunity.model.account,
+        opportunity=order.opportunity,
+        creator=order.created_by_id,
+        month=month_expression(order.start_date),
+    )
+
+    return groupings, getattr(order, price)
+
+
+def sales_order_query(*columns):
+    """
+    Returns a query selecting the given columns from the sales orders joined with their opportunities.
+    """
+
+    from crm.models import SalesOrder, Opportunity
+
+    order = SalesOrder.model
+
+    return select(*columns) \
+        .select_from(order) \
+        .outerjoin(Opportunity.model, Opportunity.model.resource_id == order.opportunity)
+
+
+def sales_totals(price='base_price', group_by=(), rollup=False, currency=None):
+    """
+    Computes the number of sales orders and the sum of a price field, grouped by currency
+    and by any of the groupings in `SALES_ORDER_GROUPINGS`.
+
+    :param price: Name of the price field, either "base_price" or "hourly_price".
+    :param group_by: Names of the groupings in addition to the currency.
+    :param rollup: If true, the totals are summed up from the `SalesRollup` table
+        instead of the sales orders themselves.
+    :param currency: If provided, the prices are converted into this currency using the
+        exchange rates on the orders' start dates, and the totals are not grouped by currency.
+    :returns: List of dictionaries with the values of the groupings, "count" and "total".
+        Converted totals also include the number of orders which could not be converted
+        for a lack of exchange rates as "unconverted".
+    """
+
+    from crm.models import SalesRollup
+
+    for name in group_by:
+        if name not in SALES_ORDER_GROUPINGS:
+            raise ValueError('Unknown grouping: ' + name)
+
+    if currency is not None:
+        if rollup:
+            raise ValueError('Converted totals can not be computed from the rollups')
+
+        return converted_sales_totals(price, group_by, currency)
+
+    if rollup:
+        names, rows = SalesRollup.totals(price, group_by)
+    else:
+        names = [ 'currency' ] + [ name for name in group_by if name != 'currency' ]
+        groupings, amount = sales_order_groupings(price)
+        keys = [ groupings[name] for name in names ]
+
+        query = sales_order_query(*keys, func.count(), func.coalesce(func.sum(amount), 0)) \
+            .group_by(*keys) \
+            .order_by(*keys)
+
+        rows = db.session.execute(query).all()
+
+    totals = []
+
+    for row in rows:
+        values = dict(zip(names, row))
+        values['count'] = row[-2]
+        values['total'] = CurrencyValue.from_minor_units(row[-1], values['currency'])
+        totals.append(values)
+
+    return totals
+
+
+def converted_sales_totals(price, group_by, currency):
+    from crm.models import SalesOrder
+    from crm.exchange_rates import RateTable
+
+    names = [ name for name in group_by if name != 'currency' ]
+    groupings, amount = sales_order_groupings(price)
+    keys = [ groupings[name] for name in names ]
+
+    # Orders sharing a currency and a start date are converted with the same rate,
+    # so the database sums them up before the sums are converted in a single pass.
+    day = type_coerce(func.date(SalesOrder.model.start_date), db.Date)
+
+    query = sales_order_query(
+            func.sum(amount),
+            func.count(),
+            func.count(amount),
+            groupings['currency'],
+            day,
+            *keys,
+        ) \
+        .group_by(groupings['currency'], day, *keys)
+
+    rows = db.session.execute(query).all()
+
+    if len(rows) == 0:
+        return []
+
+    amounts, counts, priced, currencies, dates = ([ row[i] for row in rows ] for i in range(5))
+    rates = RateTable(set(currencies) | { currency })
+    converted = rates.convert(amounts, currencies, dates, currency)
+
+    totals = dict()
+
+    for row, value in zip(rows, converted):
+        group = totals.setdefault(tuple(row[5:]), [ 0, 0, 0 ])
+        group[0] += row[1]
+
+        if value is not None:
+            group[1] += value
+        else:
+            group[2] += row[2]
+
+    return [
+        dict(
+            zip(names, key),
+            count=count,
+            total=CurrencyValue.from_minor_units(total, currency),
+            unconverted=unconverted,
+        )
+        for key, (count, total, unconverted) in sorted(totals.items(), key=lambda item: [ (v is None, v) for v in item[0] ])
+    ]
+
+
+def month_boundaries(first, last):
+    """
+    Returns the ordinals of the first days of the months from `first` up to and including the month after `last`.
+    """
+
+    month = date(first.year, first.month, 1)
+    boundaries = [ month.toordinal() ]
+
+    while month <= last:
+        month = add_months(month, 1)
+        boundaries.append(month.toordinal())
+
+    return boundaries
+
+
+def spread_over_months(amount, start, end, boundaries, totals):
+    """
+    Splits an amount of minor units across the months between two days, in proportion
+    to the number of days covered in each month, and adds the shares into `totals`.
+
+    The shares are rounded down cumulatively, so that they always sum up to the amount.
+
+    :param start: Ordinal of the first day.
+    :param end: Ordinal of the last day.
+    :param boundaries: Month boundaries returned by `month_boundaries`.
+    :param totals: List of totals with an item for each month in `boundaries`.
+    """
+
+    if end < start:
+        end = start
+
+    days = end - start + 1
+    i = bisect_right(boundaries, start) - 1
+    allocated = 0
+
+    while boundaries[i] <= end:
+        covered = min(end + 1, boundaries[i + 1]) - start
+        share = amount * covered // days - allocated
+        totals[i] += share
+        allocated += share
+        i += 1
+
+
+# Number of projections, by currency and range of months, kept in the memory of each process
+PROJECTION_CACHE_SIZE = 32
+
+_projection_cache = OrderedDict()
+_projection_cache_lock = threading.Lock()
+
+
+def revenue_projection(currency=None, start=None, end=None):
+    """
+    Projects the monthly revenue of the sales orders by spreading their base prices
+    evenly over the days between their start and end dates.
+
+    The orders are summed up by currency, start date and end date in the database,
+    and only the sums are spread over the months. Orders without a start date are
+    left out. The result is cached until the sales orders are next written, see
+    `SalesRollup.version`, or until exchange rates are next imported if the prices
+    are converted.
+
+    :param currency: If provided, the prices are converted into this currency using
+        the exchange rates on the orders' start dates.
+    :param start: First month of the projection, as a date. Defaults to the first month with revenue.
+    :param end: Last month of the projection, as a date. Defaults to the last month with revenue.
+    :returns: List of dictionaries with "month" ("YYYY-MM"), "currency" and "total", ordered by month.
+    """
+
+    from crm.models import SalesOrder, SalesRollup, ExchangeRate
+    from crm.exchange_rates import RateTable
+
+    start = None if start is None else date(start.year, start.month, 1)
+    end = None if end is None else date(end.year, end.month, 1)
+
+    latest = SalesRollup.version()
+
+    if currency is not None:
+        latest = (latest, db.session.execute(select(func.max(ExchangeRate.imported_at))).scalar())
+
+    key = (currency, start, end)
+
+    with _projection_cache_lock:
+        cached = _projection_cache.get(key)
+
+        if cached is not None and cached[0] == latest:
+            _projection_cache.move_to_end(key)
+            return cached[1]
+
+    order = SalesOrder.model
+    start_day = type_coerce(func.date(order.start_date), db.Date)
+    end_day = type_coerce(func.date(order.end_date), db.Date)
+
+    query = select(func.sum(order.base_price), order.base_price_1, start_day, end_day) \
+        .where(order.start_date.isnot(None), order.base_price.isnot(None)) \
+        .group_by(order.base_price_1, start_day, end_day)
+
+    rows = db.session.execute(query).all()
+    amounts, currencies, starts, ends = ([ row[i] for row in rows ] for i in range(4))
+
+    if currency is not None:
+        rates = RateTable(set(currencies) | { currency })
+        amounts = rates.convert(amounts, currencies, starts, currency)
+        currencies = [ currency ] * len(rows)
+
+    projection = []
+
+    if len(rows) > 0:
+        boundaries = month_boundaries(min(starts), max(max(day, last or day) for day, last in zip(starts, ends)))
+        months = [ date.fromordinal(day) for day in boundaries[:-1] ]
+        totals = dict()
+
+        for amount, row_currency, row_start, row_end in zip(amounts, currencies, starts, ends):
+            if amount is None:
+                continue
+
+            spread_over_months(
+                amount,
+                row_start.toordinal(),
+                (row_end or row_start).toordinal(),
+                boundaries,
+                totals.setdefault(row_currency, [ 0 ] * len(months)),
+            )
+
+        for i, month in enumerate(months):
+            if (start is not None and month < start) or (end is not None and month > end):
+                continue
+
+            for row_currency in sorted(totals, key=lambda name: name or ''):
+                if totals[row_currency][i] != 0:
+                    projection.append(dict(
+                        month=month.strftime('%Y-%m'),
+                        currency=row_currency,
+                        total=CurrencyValue.from_minor_units(totals[row_currency][i], row_currency),
+                    ))
+
+    with _projection_cache_lock:
+        _projection_cache[key] = (latest, projection)
+        _projection_cache.move_to_end(key)
+
+        while len(_projection_cache) > PROJECTION_CACHE_SIZE:
+            _projection_cache.popitem(last=False)
+
+    return projection
+
+
+@click.command('report:sales')
+@click.option('--price', type=click.Choice(SALES_ORDER_PRICES), default='base_price')
+@click.option('--group-by', type=click.Choice(SALES_ORDER_GROUPINGS), multiple=True)
+@click.option('--rollup', is_flag=True, help='Sum up the pre-aggregated rollup table.')
+@click.option('--convert', is_flag=True, help='Convert the totals into the reporting currency.')
+@with_appcontext
+def sales_report_command(price, group_by, rollup, convert):
+    """
+    Prints the totals of a sales order price grouped by currency and the given groupings.
+    """
+
+    currency = current_app.config['REPORTING_CURRENCY'] if convert else None
+
+    for row in sales_totals(price, group_by, rollup=rollup, currency=currency):
+        keys = ', '.join(f'{name}={row[name]}' for name in row if name not in ('count', 'total', 'unconverted'))
+        print(f'{keys}: {row["count"]} orders, {row["total"]}')
+
+
+@click.command('report:rebuild-rollups')
+@with_appcontext
+def rebuild_rollups_command():
+    """
+    Recomputes all of the sales order rollups.
+    """
+
+    from crm.models import SalesRollup
+
+    SalesRollup.refresh()
+
+    print('Sales order rollups rebuilt.')
+
+
+@click.command('report:revenue')
+@click.option('--start', type=click.DateTime(formats=['%Y-%m']), default=None, help='First month, as YYYY-MM.')
+@click.option('--end', type=click.DateTime(formats=['%Y-%m']), default=None, help='Last month, as YYYY-MM.')
+@click.option('--convert', is_flag=True, help='Convert the totals into the reporting currency.')
+@with_appcontext
+def revenue_report_command(start, end, convert):
+    """
+    Prints the projected monthly revenue of the sales orders.
+    """
+
+    currency = current_app.config['REPORTING_CURRENCY'] if convert else None
+
+    for row in revenue_projection(currency, start, end):
+        print(f'{row["month"]}: {row["total"]}')
+
+
+def init_app(app):
+    app.cli.add_command(sales_report_command)
+    app.cli.add_command(revenue_report_command)
+    app.cli.add_command(rebuild_rollups_command)
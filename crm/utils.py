@@ -3,3 +3,7 @@ import random
 
 def generate_random_string(length):
     return ''.join(random.choice(string.ascii_letters) for _ in range(0, length))
+
+def add_months(month, count):
+    years, month_index = divmod(month.month - 1 + count, 12)
+    return month.replace(year=month.year + years, month=month_index + 1, day=1)
@@ -1,5 +1,7 @@
 from flask import Blueprint, render_template, request, session, redirect, flash, url_for
+from crm.db import db
 from crm.models import User
+from crm.passwords import check_login_rate, verify_password, needs_rehash, hash_password, VerifierBusy
 from crm.utils import generate_random_string
 
 blueprint = Blueprint('auth', __name__)
@@ -16,17 +18,37 @@ def login_post():
     if 'username' not in request.form:
         return ''
 
-    user = User.filter_by(username=request.form['username']).pop()
+    username = request.form['username']
 
-    if not user:
+    # Checked before looking up the user, so that floods of attempts cost no hashing
+    if not check_login_rate(username, request.remote_addr):
+        flash('Too many login attempts, please try again later.', 'error')
+        return redirect(url_for('auth.login'))
+
+    instance = User.model.query.filter_by(username=username).first()
+
+    if instance is None or instance.password is None:
         flash('Invalid credentials', 'error')
         return redirect(url_for('auth.login'))
 
-    if not user.fields.password.compare(request.form['password']):
+    password = request.form.get('password', '')
+
+    try:
+        valid = verify_password(instance.password, password)
+    except VerifierBusy:
+        flash('The server is busy, please try again in a moment.', 'error')
+        return redirect(url_for('auth.login'))
+
+    if not valid:
         flash('Invalid credentials', 'error')
         return redirect(url_for('auth.login'))
 
-    session['user_id'] = user.instance.variant_id
+    # Hashes made with older parameters are replaced while the password is at hand
+    if needs_rehash(instance.password):
+        instance.password = hash_password(password)
+        db.session.commit()
+
+    session['user_id'] = instance.variant_id
     session['CSRF'] = generate_random_string(32)
 
     return redirect(url_for('dashboard'))
@@ -34,6 +56,7 @@ def login_post():
 @blueprint.route('/logout')
 def logout():
     session.pop('user_id', None)
+    session.pop('principal', None)
     session.pop('CSRF', None)
 
     return redirect(url_for('auth.login'))
@@ -0,0 +1,32 @@
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+
+from crm.auth import require_role
+from crm.exports import EXPORT_FORMATS, export_chunks
+from crm.models import Resource
+from crm.models.user import UserRole
+
+blueprint = Blueprint('exports', __name__)
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/jsonl',
+}
+
+@blueprint.route('/export/<type>')
+@require_role(UserRole.Administrator)
+def export_file(type):
+    resource_type = Resource.get_type(type)
+
+    if resource_type is None:
+        return jsonify(error='Unknown resource type: ' + type), 400
+
+    format = request.args.get('format', 'csv')
+
+    if format not in EXPORT_FORMATS:
+        return jsonify(error='Expected the format as the "format" parameter, either "csv" or "jsonl"'), 400
+
+    return Response(
+        stream_with_context(export_chunks(resource_type, format)),
+        mimetype=MIMETYPES[format],
+        headers={ 'Content-Disposition': f'attachment; filename={resource_type.__name__}.{format}' },
+    )
@@ -0,0 +1,43 @@
+import io
+from flask import Blueprint, request, jsonify
+
+from crm.auth import require_role, check_csrf, get_session_user
+from crm.imports import IMPORT_FORMATS, guess_format, import_resources
+from crm.models import Resource
+from crm.models.user import UserRole
+
+blueprint = Blueprint('imports', __name__)
+
+@blueprint.route('/import/<type>', methods=['POST'])
+@check_csrf
+@require_role(UserRole.Administrator)
+def import_file(type):
+    resource_type = Resource.get_type(type)
+
+    if resource_type is None:
+        return jsonify(error='Unknown resource type: ' + type), 400
+
+    # The file is either uploaded as the "file" form field, or sent as the request body
+    upload = request.files.get('file')
+    stream = upload.stream if upload is not None else request.stream
+
+    format = request.args.get('format') or guess_format(upload.filename if upload is not None else None)
+
+    if format not in IMPORT_FORMATS:
+        return jsonify(error='Expected the format as the "format" parameter, either "csv" or "jsonl"'), 400
+
+    rejected = []
+
+    try:
+        imported, _ = import_resources(
+            resource_type,
+            io.TextIOWrapper(stream, encoding='utf-8', newline=''),
+            format,
+            user=get_session_user(),
+            batch_size=request.args.get('batch_size', type=int),
+            on_reject=lambda line, errors: rejected.append(dict(line=line, errors=errors)),
+        )
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    return jsonify(imported=imported, rejected=rejected)
@@ -0,0 +1,44 @@
+from flask import Blueprint, request, jsonify
+from datetime import datetime
+
+from crm.auth import require_role
+from crm.models.user import UserRole
+from crm.reports import sales_totals, revenue_projection
+
+blueprint = Blueprint('reports', __name__)
+
+@blueprint.route('/reports/sales')
+@require_role(UserRole.Administrator)
+def sales():
+    try:
+        totals = sales_totals(
+            price=request.args.get('price', 'base_price'),
+            group_by=request.args.getlist('group_by'),
+            rollup=request.args.get('rollup') == '1',
+            currency=request.args.get('currency'),
+        )
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    return jsonify([
+        dict(row, total={ "amount": str(row['total'].amount), "currency": row['total'].currency })
+        for row in totals
+    ])
+
+@blueprint.route('/reports/revenue')
+@require_role(UserRole.Administrator)
+def revenue():
+    try:
+        start, end = [
+            None if request.args.get(name) is None else datetime.strptime(request.args[name], '%Y-%m')
+            for name in ('from', 'to')
+        ]
+    except ValueError:
+        return jsonify(error='Expected months in the form YYYY-MM as the "from" and "to" parameters'), 400
+
+    projection = revenue_projection(currency=request.args.get('currency'), start=start, end=end)
+
+    return jsonify([
+        dict(row, total={ "amount": str(row['total'].amount), "currency": row['total'].currency })
+        for row in projection
+    ])
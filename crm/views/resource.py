@@ -1,11 +1,11 @@
 import json
-from flask import Blueprint, redirect, url_for, render_template, flash, request, session
+from flask import Blueprint, redirect, url_for, render_template, flash, request, session, jsonify
 from datetime import datetime
 from dataclasses import dataclass
 
-from crm.fields import ActionContext
+from crm.fields import ActionContext, TABLE_PAGE_SIZE
 from crm.access import AccessType
-from crm.models import Resource, User
+from crm.models import Resource, User, Group
 from crm.auth import get_session_user, require_auth, check_csrf
 from crm.utils import generate_random_string
 from crm.db import db
@@ -119,13 +119,118 @@ def view(id):
     return render_template(
         'view-resource.html',
         resource=resource,
+        timeline=resource.timeline().to_json(),
         users=json.dumps([
             { "id": user.id, "title": user.title(), "type": "User" }
-            for user in User.all()
+            for user in User.all(projection=[])
             if user not in resource.assigned_users
         ]),
+        groups=Group.query.order_by(Group.name).all(),
     )
 
+@blueprint.route('/view/<id>/timeline')
+@require_auth
+def timeline(id):
+    resource = Resource.get_resource(id)
+
+    if resource is None or not resource.check_access(get_session_user(), AccessType.Read):
+        return jsonify(error='Not found'), 404
+
+    try:
+        page = resource.timeline(before=request.args.get('before'))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    return jsonify(page.to_json())
+
+@blueprint.route('/view/<id>/history')
+@require_auth
+def history(id):
+    resource = Resource.get_resource(id)
+
+    if resource is None or not resource.check_access(get_session_user(), AccessType.Read):
+        return jsonify(error='Not found'), 404
+
+    try:
+        timestamp = datetime.fromisoformat(request.args['at'])
+    except (KeyError, ValueError):
+        return jsonify(error='Expected an ISO 8601 timestamp as the "at" parameter'), 400
+
+    past = resource.as_of(timestamp)
+
+    return jsonify({
+        field.name: field.dump(field.retrieve(past))
+        for field in past.fields
+        if field.check_access(AccessType.Read)
+    })
+
+@blueprint.route('/view/<id>/diff')
+@require_auth
+def diff(id):
+    resource = Resource.get_resource(id)
+
+    if resource is None or not resource.check_access(get_session_user(), AccessType.Read):
+        return jsonify(error='Not found'), 404
+
+    try:
+        start = datetime.fromisoformat(request.args['from'])
+        end = datetime.fromisoformat(request.args['to'])
+    except (KeyError, ValueError):
+        return jsonify(error='Expected ISO 8601 timestamps as the "from" and "to" parameters'), 400
+
+    return jsonify({
+        name: { "before": before, "after": after }
+        for name, (before, after) in resource.diff(start, end).items()
+        if resource.fields[name].check_access(AccessType.Read)
+    })
+
+def table_page(resource, name):
+    """
+    Responds with a page of the rows of a `TableField`, as requested by the query parameters.
+    """
+
+    field = resource.fields[name] if name in resource._fields else None
+
+    if field is None or field.widget != 'table' or not field.check_access(AccessType.Read):
+        return jsonify(error='Not found'), 404
+
+    try:
+        page = field.get_page(
+            field,
+            offset=int(request.args.get('offset', 0)),
+            limit=int(request.args.get('limit', TABLE_PAGE_SIZE)),
+            sort=request.args.get('sort', 'id'),
+        )
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    return jsonify(page.to_json())
+
+@blueprint.route('/view/<id>/table/<name>')
+@require_auth
+def table(id, name):
+    resource = Resource.get_resource(id)
+
+    if resource is None or not resource.check_access(get_session_user(), AccessType.Read):
+        return jsonify(error='Not found'), 404
+
+    return table_page(resource, name)
+
+@blueprint.route('/edit/<id>/<key>/table/<name>')
+@require_auth
+def edit_table(id, key, name):
+    edit_session = EditSession.get(key)
+
+    # The session has to belong to the resource in the URL, whose access is checked
+    if edit_session is None or str(edit_session.resource_id) != id:
+        return jsonify(error='Not found'), 404
+
+    if not edit_session.resource.check_access(get_session_user(), AccessType.Write):
+        return jsonify(error='Not found'), 404
+
+    # The rows are paged with the changes staged in the editing session applied
+    return table_page(edit_session.resource, name)
+
 @blueprint.route('/edit/<id>/assign', methods=['POST'])
 @check_csrf
 @require_auth
@@ -152,6 +257,32 @@ def unassign(resource_id, user_id):
     resource.unassign_from(user)
     return redirect(url_for('resource.view', id=resource.id))
 
+@blueprint.route('/edit/<id>/share', methods=['POST'])
+@check_csrf
+@require_auth
+def share(id):
+    resource = Resource.get_resource(id)
+    group = Group.query.get(request.form['group'])
+
+    if group is None or not resource.check_access(get_session_user(), AccessType.Write):
+        return redirect(url_for('dashboard'))
+
+    resource.share_with(group)
+    return redirect(url_for('resource.view', id=resource.id))
+
+@blueprint.route('/edit/<resource_id>/unshare/<group_id>')
+@check_csrf
+@require_auth
+def unshare(resource_id, group_id):
+    resource = Resource.get_resource(resource_id)
+    group = Group.query.get(group_id)
+
+    if group is None or not resource.check_access(get_session_user(), AccessType.Write):
+        return redirect(url_for('dashboard'))
+
+    resource.unshare_from(group)
+    return redirect(url_for('resource.view', id=resource.id))
+
 
 @blueprint.route('/edit/<id>')
 @require_auth
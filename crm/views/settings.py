@@ -14,7 +14,7 @@ def settings():
 @blueprint.route('/settings/users')
 @require_role(UserRole.Administrator)
 def user_management():
-    users = User.all()
+    users = User.all(projection=[ 'role' ])
 
     return render_template('settings-user-management.html', users=users)
 
@@ -0,0 +1,61 @@
+"""Identify resources by type and variant ID
+
+Revision ID: 5b2e8f0c4d71
+Revises: 9e4b1d7c5a38
+Create Date: 2026-10-19 19:41:27.630194
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2e8f0c4d71'
+down_revision = '9e4b1d7c5a38'
+branch_labels = None
+depends_on = None
+
+
+# Resource type names, the columns which referred to their tables, and the tables
+VARIANT_COLUMNS = [
+    ('Account', 'account_id', 'account'),
+    ('Opportunity', 'opportunity_id', 'opportunity'),
+    ('SalesOrder', 'salesorder_id', 'sales_order'),
+    ('User', 'user_id', 'user'),
+]
+
+
+def upgrade():
+    with op.batch_alter_table('resource', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('type', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('variant_id', sa.Integer(), nullable=True))
+
+    for type, column, _ in VARIANT_COLUMNS:
+        op.execute(f"UPDATE resource SET type = '{type}', variant_id = {column} WHERE {column} IS NOT NULL")
+
+    with op.batch_alter_table('resource', schema=None) as batch_op:
+        batch_op.alter_column('type', existing_type=sa.String(), nullable=False)
+        batch_op.alter_column('variant_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_index('ix_resource_type_variant_id', ['type', 'variant_id'], unique=True)
+
+        for _, column, _ in VARIANT_COLUMNS:
+            batch_op.drop_index(batch_op.f(f'ix_resource_{column}'))
+            batch_op.drop_column(column)
+
+
+def downgrade():
+    with op.batch_alter_table('resource', schema=None) as batch_op:
+        for _, column, table in VARIANT_COLUMNS:
+            batch_op.add_column(sa.Column(column, sa.Integer(), nullable=True))
+            batch_op.create_foreign_key(None, table, [column], ['id'])
+
+    for type, column, _ in VARIANT_COLUMNS:
+        op.execute(f"UPDATE resource SET {column} = variant_id WHERE type = '{type}'")
+
+    with op.batch_alter_table('resource', schema=None) as batch_op:
+        for _, column, _ in VARIANT_COLUMNS:
+            batch_op.create_index(batch_op.f(f'ix_resource_{column}'), [column], unique=True)
+
+        batch_op.drop_index('ix_resource_type_variant_id')
+        batch_op.drop_column('variant_id')
+        batch_op.drop_column('type')
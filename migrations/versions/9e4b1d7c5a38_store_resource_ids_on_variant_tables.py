@@ -0,0 +1,52 @@
+"""Store resource IDs on variant tables
+
+Revision ID: 9e4b1d7c5a38
+Revises: c81f4d6a2e95
+Create Date: 2026-10-19 19:12:05.402871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4b1d7c5a38'
+down_revision = 'c81f4d6a2e95'
+branch_labels = None
+depends_on = None
+
+
+# Variant tables and the columns of the `resource` table which refer to them
+VARIANT_TABLES = [
+    ('account', 'account_id'),
+    ('opportunity', 'opportunity_id'),
+    ('sales_order', 'salesorder_id'),
+    ('user', 'user_id'),
+]
+
+
+def upgrade():
+    for table, column in VARIANT_TABLES:
+        name = column[:-len('_id')]
+
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('resource_id', sa.Integer(), nullable=True))
+
+        op.execute(
+            f'UPDATE "{table}" SET resource_id = '
+            f'(SELECT resource.id FROM resource WHERE resource.{column} = "{table}".id)'
+        )
+
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_unique_constraint(f'uq_{table}_resource_id', ['resource_id'])
+            batch_op.create_foreign_key(f'fk_{name}_resource_id', 'resource', ['resource_id'], ['id'])
+
+
+def downgrade():
+    for table, column in reversed(VARIANT_TABLES):
+        name = column[:-len('_id')]
+
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_constraint(f'fk_{name}_resource_id', type_='foreignkey')
+            batch_op.drop_constraint(f'uq_{table}_resource_id', type_='unique')
+            batch_op.drop_column('resource_id')
@@ -0,0 +1,122 @@
+"""Partition resource log by month
+
+Revision ID: a4c8e2d05b17
+Revises: e19b7c3f8a60
+Create Date: 2026-10-19 15:26:48.604177
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from datetime import datetime
+
+# revision identifiers, used by Alembic.
+revision = 'a4c8e2d05b17'
+down_revision = 'e19b7c3f8a60'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = 'id, resource_id, subject, timestamp, field, mutation, old_value, new_value, message'
+
+INDEXES = [
+    ('ix_resource_log_resource_id_timestamp', 'resource_id, timestamp'),
+    ('ix_resource_log_resource_id_field_timestamp', 'resource_id, field, timestamp'),
+]
+
+
+def add_months(month, count):
+    years, month_index = divmod(month.month - 1 + count, 12)
+    return datetime(month.year + years, month_index + 1, 1)
+
+
+def set_aside(name):
+    # Frees the names of the table, its primary key, sequence and indexes for the new table
+    op.execute(f'ALTER TABLE resource_log RENAME TO {name}')
+    op.execute(f'ALTER TABLE {name} RENAME CONSTRAINT resource_log_pkey TO {name}_pkey')
+    op.execute('ALTER SEQUENCE resource_log_id_seq OWNED BY NONE')
+
+    for index, _ in INDEXES:
+        op.execute(f'DROP INDEX {index}')
+
+
+def create_indexes():
+    for index, columns in INDEXES:
+        op.execute(f'CREATE INDEX {index} ON resource_log ({columns})')
+
+
+def upgrade():
+    # Only PostgreSQL supports declarative partitioning. Elsewhere the log
+    # is split into monthly tables by `flask log:archive`.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    set_aside('resource_log_unpartitioned')
+
+    op.execute('''
+        CREATE TABLE resource_log (
+            id INTEGER NOT NULL DEFAULT nextval('resource_log_id_seq'),
+            resource_id INTEGER NOT NULL REFERENCES resource (id),
+            subject INTEGER REFERENCES "user" (id),
+            timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            field VARCHAR,
+            mutation VARCHAR,
+            old_value JSON,
+            new_value JSON,
+            message VARCHAR,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    ''')
+
+    op.execute('ALTER SEQUENCE resource_log_id_seq OWNED BY resource_log.id')
+    op.execute('CREATE TABLE resource_log_default PARTITION OF resource_log DEFAULT')
+
+    # Create partitions for every month with existing entries and for the next three months
+    oldest = op.get_bind().execute(sa.text('SELECT min(timestamp) FROM resource_log_unpartitioned')).scalar()
+    now = datetime.now()
+    month = datetime(now.year, now.month, 1)
+
+    if oldest is not None:
+        month = min(month, datetime(oldest.year, oldest.month, 1))
+
+    while month < add_months(datetime(now.year, now.month, 1), 4):
+        end = add_months(month, 1)
+        name = f'resource_log_y{month.year:04d}m{month.month:02d}'
+        op.execute(
+            f'CREATE TABLE {name} PARTITION OF resource_log '
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')"
+        )
+        month = end
+
+    op.execute(f'INSERT INTO resource_log ({COLUMNS}) SELECT {COLUMNS} FROM resource_log_unpartitioned')
+    op.execute('DROP TABLE resource_log_unpartitioned')
+
+    create_indexes()
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    set_aside('resource_log_partitioned')
+
+    op.execute('''
+        CREATE TABLE resource_log (
+            id INTEGER NOT NULL DEFAULT nextval('resource_log_id_seq'),
+            resource_id INTEGER NOT NULL REFERENCES resource (id),
+            subject INTEGER REFERENCES "user" (id),
+            timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            field VARCHAR,
+            mutation VARCHAR,
+            old_value JSON,
+            new_value JSON,
+            message VARCHAR,
+            PRIMARY KEY (id)
+        )
+    ''')
+
+    op.execute('ALTER SEQUENCE resource_log_id_seq OWNED BY resource_log.id')
+    op.execute(f'INSERT INTO resource_log ({COLUMNS}) SELECT {COLUMNS} FROM resource_log_partitioned')
+    op.execute('DROP TABLE resource_log_partitioned')
+
+    create_indexes()
@@ -0,0 +1,33 @@
+"""Index the active range of sales orders
+
+Revision ID: a7e3c2f9b814
+Revises: f2c6b8a4d915
+Create Date: 2026-10-19 18:21:16.250437
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'a7e3c2f9b814'
+down_revision = 'f2c6b8a4d915'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # See `DateRange.create_indexes`
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("CREATE INDEX ix_sales_order_active ON sales_order USING gist (tsrange(start_date, end_date, '[]'))")
+    else:
+        op.create_index('ix_sales_order_active_start_end', 'sales_order', ['start_date', 'end_date'], unique=False)
+        op.create_index('ix_sales_order_active_end', 'sales_order', ['end_date'], unique=False)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_sales_order_active', table_name='sales_order')
+    else:
+        op.drop_index('ix_sales_order_active_end', table_name='sales_order')
+        op.drop_index('ix_sales_order_active_start_end', table_name='sales_order')
@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+# The testing configuration is read from the environment when `crm.config` is imported
+os.environ['FLASK_ENV'] = 'testing'
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('SECRET_KEY', 'testing')
+
+from crm import create_app
+from crm.db import db as _db
+
+
+@pytest.fixture
+def app():
+    app = create_app()
+
+    with app.app_context():
+        _db.create_all()
+
+        yield app
+
+        _db.session.remove()
+        _db.drop_all()
+
+
+@pytest.fixture
+def db(app):
+    return _db
+
+
+@pytest.fixture
+def admin(db):
+    from crm.models import User
+    from crm.models.user import UserRole
+
+    user = User(username='admin', password='admin', role=UserRole.Administrator)
+    user.save()
+
+    return user
+
+
+@pytest.fixture
+def request_context(app, admin):
+    """
+    Request context with the administrator logged in, as `save()` logs the session's user.
+    """
+
+    from flask import session
+
+    with app.test_request_context():
+        session['user_id'] = admin.instance.variant_id
+
+        yield
@@ -0,0 +1,71 @@
+def login(client, username, password):
+    return client.post('/login', data=dict(username=username, password=password))
+
+
+def test_login(app, admin):
+    client = app.test_client()
+
+    assert login(client, 'admin', 'wrong').headers['Location'].endswith('/login')
+
+    with client.session_transaction() as session:
+        assert 'user_id' not in session
+
+    login(client, 'admin', 'admin')
+
+    with client.session_transaction() as session:
+        assert session['user_id'] == admin.instance.variant_id
+
+
+def test_login_rate_limit(app, admin):
+    client = app.test_client()
+
+    for _ in range(app.config['LOGIN_RATE_BURST']):
+        login(client, 'admin', 'wrong')
+
+    # The correct password is not even checked once the attempts have run out
+    login(client, 'admin', 'admin')
+
+    with client.session_transaction() as session:
+        assert 'user_id' not in session
+
+
+def test_login_when_verifications_are_busy(app, admin, tmp_path):
+    from crm.passwords import VerificationSlots
+
+    app.extensions['password_verification_slots'] = VerificationSlots(str(tmp_path), 2)
+
+    # Another worker process holding every slot has its own open files, like this instance
+    other = VerificationSlots(str(tmp_path), 2)
+    held = [ other.acquire(), other.acquire() ]
+
+    assert None not in held
+    assert other.acquire() is None
+
+    client = app.test_client()
+    login(client, 'admin', 'admin')
+
+    with client.session_transaction() as session:
+        assert 'user_id' not in session
+
+    other.release(held.pop())
+    login(client, 'admin', 'admin')
+
+    with client.session_transaction() as session:
+        assert session['user_id'] == admin.instance.variant_id
+
+
+def test_needs_rehash(app):
+    from werkzeug.security import generate_password_hash
+    from crm.passwords import needs_rehash
+
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256'
+
+    # werkzeug records the iteration count it fills in, which is the configured cost
+    assert not needs_rehash(generate_password_hash('password', method='pbkdf2:sha256'))
+    assert needs_rehash(generate_password_hash('password', method='pbkdf2:sha256:1000'))
+    assert needs_rehash(generate_password_hash('password', method='pbkdf2:sha512'))
+
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+
+    assert not needs_rehash(generate_password_hash('password', method='pbkdf2:sha256:1000'))
+    assert needs_rehash(generate_password_hash('password', method='pbkdf2:sha256'))
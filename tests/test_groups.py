@@ -0,0 +1,144 @@
+import pytest
+
+from crm.access import AccessType
+
+
+def closure(db):
+    from crm.models.group import GroupClosure
+
+    return sorted(db.session.execute(
+        db.select(GroupClosure.ancestor_id, GroupClosure.descendant_id, GroupClosure.depth)
+    ).all())
+
+
+@pytest.fixture
+def tree(db):
+    from crm.models import Group
+
+    sales = Group.create('Sales')
+    nordic = Group.create('Nordic', parent_id=sales.id)
+    finland = Group.create('Finland', parent_id=nordic.id)
+    support = Group.create('Support')
+
+    return sales, nordic, finland, support
+
+
+@pytest.fixture
+def member(db):
+    from crm.models import User
+    from crm.models.user import UserRole
+
+    user = User(username='member', password='member', role=UserRole.Sales)
+    user.save()
+
+    return user
+
+
+def test_create(db, tree):
+    sales, nordic, finland, support = tree
+
+    assert closure(db) == sorted([
+        (sales.id, sales.id, 0),
+        (nordic.id, nordic.id, 0),
+        (finland.id, finland.id, 0),
+        (support.id, support.id, 0),
+        (sales.id, nordic.id, 1),
+        (sales.id, finland.id, 2),
+        (nordic.id, finland.id, 1),
+    ])
+
+
+def test_move(db, tree, member):
+    from crm.models import Group
+    from crm.models.group import UserGroup
+
+    sales, nordic, finland, support = tree
+    user_id = member.instance.variant_id
+
+    Group.add_members(finland.id, [ user_id ])
+    Group.move(nordic.id, support.id)
+
+    assert closure(db) == sorted([
+        (sales.id, sales.id, 0),
+        (nordic.id, nordic.id, 0),
+        (finland.id, finland.id, 0),
+        (support.id, support.id, 0),
+        (support.id, nordic.id, 1),
+        (support.id, finland.id, 2),
+        (nordic.id, finland.id, 1),
+    ])
+    assert UserGroup.group_ids(user_id) == sorted([ nordic.id, finland.id, support.id ])
+
+    moved = closure(db)
+    Group.rebuild()
+
+    assert closure(db) == moved
+
+
+def test_move_under_subgroup(db, tree):
+    from crm.models import Group
+
+    sales, nordic, finland, _ = tree
+    before = closure(db)
+
+    with pytest.raises(ValueError):
+        Group.move(sales.id, finland.id)
+
+    with pytest.raises(ValueError):
+        Group.move(nordic.id, nordic.id)
+
+    assert closure(db) == before
+
+
+def test_remove(db, tree, member, request_context):
+    from crm.models import Account, Group
+    from crm.models.group import UserGroup
+
+    _, nordic, finland, _ = tree
+    finland_id = finland.id
+    user_id = member.instance.variant_id
+
+    account = Account(name='Acme')
+    account.save()
+    account.share_with(finland)
+
+    Group.add_members(finland.id, [ user_id ])
+
+    assert account.check_access(member, AccessType.Read)
+
+    with pytest.raises(ValueError):
+        Group.remove(nordic.id)
+
+    Group.remove(finland_id)
+
+    assert all(finland_id not in row[:2] for row in closure(db))
+    assert UserGroup.group_ids(user_id) == []
+    assert account.shared_groups == []
+    assert not account.check_access(member, AccessType.Read)
+
+
+def test_share_log(db, tree, request_context):
+    from crm.models import Account, ResourceLog
+
+    sales, _, _, _ = tree
+
+    account = Account(name='Acme')
+    account.save()
+    account.share_with(sales)
+    account.unshare_from(sales)
+
+    entries = ResourceLog.query \
+        .filter(ResourceLog.resource_id == account.id, ResourceLog.mutation.in_([ 'share', 'unshare' ])) \
+        .order_by(ResourceLog.id) \
+        .all()
+
+    assert [ (entry.old_value, entry.new_value) for entry in entries ] == [ (None, sales.id), (sales.id, None) ]
+
+    # The entries are described with the current names of the groups
+    sales.name = 'Sales & Marketing'
+    db.session.commit()
+
+    assert ResourceLog.describe_entries(entries) == [
+        'Share with "Sales & Marketing".',
+        'Stop sharing with "Sales & Marketing".',
+    ]
@@ -0,0 +1,53 @@
+from datetime import datetime
+
+from crm.log_writer import LogWriter, BatchedLogWriter
+
+
+def mixed_entries(resource_id):
+    timestamp = datetime(2026, 1, 1)
+
+    return [
+        dict(resource_id=resource_id, timestamp=timestamp, field='name', mutation='set_value', old_value=None, new_value='Acme'),
+        dict(resource_id=resource_id, timestamp=timestamp, message='Imported.'),
+        dict(resource_id=resource_id, timestamp=timestamp, mutation='assign', new_value=1),
+        dict(resource_id=resource_id, timestamp=timestamp, field='name', mutation='set_value', old_value='Acme', new_value='Acme Oy'),
+    ]
+
+
+def logged(resource_id):
+    from crm.models import ResourceLog
+
+    return ResourceLog.query.filter_by(resource_id=resource_id).order_by(ResourceLog.id).all()
+
+
+def test_insert_mixed_entries(app):
+    LogWriter(app).write(mixed_entries(1))
+
+    entries = logged(1)
+
+    assert [ (entry.field, entry.mutation, entry.message) for entry in entries ] == [
+        ('name', 'set_value', None),
+        (None, None, 'Imported.'),
+        (None, 'assign', None),
+        ('name', 'set_value', None),
+    ]
+    assert entries[3].new_value == 'Acme Oy'
+
+
+def test_batch_of_mixed_entries(app):
+    writer = BatchedLogWriter(app, batch_size=10, flush_interval=0)
+    writer.write_batch(mixed_entries(1) + mixed_entries(2))
+
+    assert len(logged(1)) == 4
+    assert len(logged(2)) == 4
+
+
+def test_failed_batch_falls_back_to_single_entries(app):
+    writer = BatchedLogWriter(app, batch_size=10, flush_interval=0, retries=1, retry_delay=0)
+
+    # `timestamp` is required, so the whole batch fails and only this entry is lost
+    invalid = dict(resource_id=1, message='Invalid.')
+
+    writer.write_batch(mixed_entries(1)[:2] + [ invalid ] + mixed_entries(1)[2:])
+
+    assert [ entry.message for entry in logged(1) ] == [ None, 'Imported.', None, None ]
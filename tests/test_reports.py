@@ -0,0 +1,86 @@
+import io
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from crm import reports
+from crm.fields import CurrencyValue
+
+
+@pytest.fixture
+def order(request_context):
+    from crm.models import SalesOrder
+
+    # The cache is shared by the apps of all tests, whose databases start over from the same IDs
+    reports._projection_cache.clear()
+
+    order = SalesOrder(description='Order')
+    order.start_date = datetime(2026, 1, 1)
+    order.end_date = datetime(2026, 1, 31)
+    order.base_price = CurrencyValue(Decimal('100.00'), 'USD')
+    order.save()
+
+    return order
+
+
+def import_rates(text):
+    from crm.exchange_rates import import_csv
+
+    import_csv(io.StringIO('date,currency,rate\n' + text))
+
+
+def test_converted_projection_follows_imported_rates(order):
+    import_rates('2026-01-01,USD,2.0\n')
+
+    assert reports.revenue_projection(currency='EUR')[0]['total'] == CurrencyValue(Decimal('50.00'), 'EUR')
+
+    # Overwriting a rate writes no log entries, but still invalidates the cached projection
+    import_rates('2026-01-01,USD,4.0\n')
+
+    assert reports.revenue_projection(currency='EUR')[0]['total'] == CurrencyValue(Decimal('25.00'), 'EUR')
+
+
+def test_projection_follows_edits_before_their_logs_are_written(order, monkeypatch):
+    from crm.log_writer import LogWriter
+    from crm.models import Resource
+
+    assert reports.revenue_projection()[0]['total'] == CurrencyValue(Decimal('100.00'), 'USD')
+
+    # A batched writer may write the log entries of an edit long after it has been committed
+    monkeypatch.setattr(LogWriter, 'write', lambda self, entries: None)
+
+    order = Resource.get_resource(order.id)
+    order.base_price = CurrencyValue(Decimal('200.00'), 'USD')
+    order.save()
+
+    assert reports.revenue_projection()[0]['total'] == CurrencyValue(Decimal('200.00'), 'USD')
+
+
+def test_projection_cache_is_bounded(order, monkeypatch):
+    monkeypatch.setattr(reports, 'PROJECTION_CACHE_SIZE', 3)
+
+    for month in range(1, 6):
+        reports.revenue_projection(start=datetime(2026, month, 1))
+
+    assert list(reports._projection_cache) == [
+        (None, datetime(2026, month, 1).date(), None)
+        for month in (3, 4, 5)
+    ]
+
+
+def test_amounts_without_currency_are_in_the_base_currency(app, request_context):
+    from crm.exchange_rates import RateTable
+
+    app.config['EXCHANGE_RATE_BASE'] = 'USD'
+    import_rates('2026-01-01,EUR,0.5\n2026-02-01,EUR,0.25\n')
+
+    rates = RateTable({ None, 'USD', 'EUR' })
+    converted = rates.convert(
+        [ 1000, 1000, 2000, None, 1000 ],
+        [ None, 'USD', None, None, 'EUR' ],
+        [ datetime(2026, 1, 5), datetime(2026, 1, 5), datetime(2026, 2, 5), None, datetime(2025, 1, 1) ],
+        'EUR',
+    )
+
+    assert converted == [ 500, 500, 500, None, None ]
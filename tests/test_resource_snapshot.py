@@ -0,0 +1,118 @@
+from datetime import datetime
+
+import pytest
+
+
+@pytest.fixture
+def account(request_context):
+    from crm.models import Account
+
+    account = Account(name='Acme')
+    account.save()
+
+    return account
+
+
+def rename(account, timestamp, name):
+    from crm.log_writer import get_log_writer
+
+    get_log_writer().write([
+        dict(resource_id=account.id, timestamp=timestamp, field='name', mutation='set_value', new_value=name),
+    ])
+
+
+def test_as_of(account):
+    rename(account, datetime(2026, 1, 1), 'January')
+    rename(account, datetime(2026, 3, 1), 'March')
+
+    # Written late, but ordered by its timestamp
+    rename(account, datetime(2026, 2, 1), 'February')
+
+    assert account.as_of(datetime(2026, 1, 15)).name == 'January'
+    assert account.as_of(datetime(2026, 2, 15)).name == 'February'
+    assert account.as_of(datetime(2026, 3, 15)).name == 'March'
+
+
+def test_as_of_from_snapshots(app, account):
+    from crm.models import ResourceSnapshot
+
+    app.config['AUDIT_SNAPSHOT_INTERVAL'] = 2
+
+    for month in range(1, 13):
+        rename(account, datetime(2026, month, 1), f'Month {month}')
+
+    assert ResourceSnapshot.query.filter_by(resource_id=account.id).count() > 0
+
+    for month in range(1, 13):
+        assert account.as_of(datetime(2026, month, 15)).name == f'Month {month}'
+
+
+def test_late_entries_invalidate_snapshots(account):
+    from crm.models import ResourceSnapshot
+
+    snapshots = ResourceSnapshot.query.filter_by(resource_id=account.id)
+
+    rename(account, datetime(2025, 5, 1), 'May')
+    ResourceSnapshot.capture(account.id)
+
+    assert snapshots.one().timestamp == datetime(2025, 5, 1)
+
+    # Written after the snapshot, but ordered before it
+    rename(account, datetime(2025, 4, 1), 'April')
+
+    assert snapshots.count() == 0
+    assert account.as_of(datetime(2025, 4, 15)).name == 'April'
+    assert account.as_of(datetime(2025, 5, 15)).name == 'May'
+
+    ResourceSnapshot.capture(account.id)
+
+    assert snapshots.one().state['name'] == 'May'
+
+    # Entries ordered after the snapshot leave it be
+    rename(account, datetime(2025, 6, 1), 'June')
+
+    assert snapshots.count() == 1
+    assert account.as_of(datetime(2025, 6, 15)).name == 'June'
+
+
+def test_capture_leaves_out_recent_entries(account):
+    from crm.models import ResourceSnapshot
+
+    rename(account, datetime(2025, 1, 1), 'January')
+    rename(account, datetime.now(), 'Now')
+    ResourceSnapshot.capture(account.id)
+
+    snapshot = ResourceSnapshot.query.filter_by(resource_id=account.id).one()
+
+    assert snapshot.state['name'] == 'January'
+
+    state, last = ResourceSnapshot.replay(account.id)
+
+    assert state['name'] == 'Now'
+
+
+def test_capture_many_matches_replay(account):
+    from crm.models import Account, ResourceSnapshot
+
+    other = Account(name='Other')
+    other.save()
+
+    for month in range(1, 6):
+        rename(account, datetime(2025, month, 1), f'Month {month}')
+        rename(other, datetime(2025, month, 2), f'Other {month}')
+
+    # Captured on top of an earlier snapshot of one resource, and from scratch for the other
+    ResourceSnapshot.capture(account.id, until=datetime(2025, 2, 15))
+
+    replayed = { resource.id: ResourceSnapshot.replay(resource.id, until=datetime(2025, 4, 15)) for resource in (account, other) }
+
+    ResourceSnapshot.capture_many([ account.id, other.id ], until=datetime(2025, 4, 15))
+
+    for resource_id, (state, last) in replayed.items():
+        snapshot = ResourceSnapshot.query.filter_by(resource_id=resource_id) \
+            .order_by(ResourceSnapshot.timestamp.desc()).first()
+
+        assert (snapshot.state, snapshot.log_id, snapshot.timestamp) == (state, last.id, last.timestamp)
+
+    assert account.as_of(datetime(2025, 4, 15)).name == 'Month 4'
+    assert other.as_of(datetime(2025, 4, 15)).name == 'Other 4'
@@ -0,0 +1,73 @@
+import pytest
+
+
+@pytest.fixture
+def client(app, admin):
+    client = app.test_client()
+
+    with client.session_transaction() as session:
+        session['user_id'] = admin.instance.variant_id
+
+    return client
+
+
+def test_edit_table(client, request_context):
+    from crm.models import Account, Opportunity
+    from crm.views.resource import EditSession
+
+    account = Account(name='Acme')
+    account.save()
+
+    other = Account(name='Other')
+    other.save()
+
+    opportunity = Opportunity(name='Deal')
+    opportunity.account = account
+    opportunity.save()
+
+    key = EditSession.create(account).key
+
+    response = client.get(f'/edit/{account.id}/{key}/table/opportunities')
+
+    assert response.status_code == 200
+    assert [ row['id'] for row in response.get_json()['rows'] ] == [ opportunity.id ]
+
+    # The session of one resource can not be read through the URL of another
+    assert client.get(f'/edit/{other.id}/{key}/table/opportunities').status_code == 404
+    assert client.get(f'/edit/foo/{key}/table/opportunities').status_code == 404
+
+
+def test_view_escapes_timeline(client, request_context):
+    from crm.models import Account
+
+    account = Account(name='</script><script>alert(1)</script>')
+    account.save()
+
+    response = client.get(f'/view/{account.id}')
+
+    assert response.status_code == 200
+    assert '<script>alert(1)' not in response.get_data(as_text=True)
+
+
+def test_view_escapes_table_rows(client, request_context, monkeypatch):
+    from crm.models import Account, Opportunity
+
+    account = Account(name='Acme')
+    account.save()
+
+    from crm.views.resource import EditSession
+
+    # Rows are listed by their titles, which may come from fields
+    monkeypatch.setattr(Opportunity, 'title', lambda self: self.name)
+
+    opportunity = Opportunity(name='</script><script>alert(1)</script>')
+    opportunity.account = account
+    opportunity.save()
+
+    key = EditSession.create(account).key
+
+    for url in (f'/view/{account.id}', f'/edit/{account.id}/{key}'):
+        response = client.get(url)
+
+        assert response.status_code == 200
+        assert '<script>alert(1)' not in response.get_data(as_text=True)
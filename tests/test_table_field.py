@@ -0,0 +1,110 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from crm.fields import CurrencyValue
+
+
+@pytest.fixture
+def orders(request_context):
+    from crm.models import Account, Opportunity, SalesOrder
+
+    account = Account(name='Acme')
+    account.save()
+
+    opportunity = Opportunity(name='Deal')
+    opportunity.account = account
+    opportunity.save()
+
+    orders = []
+
+    for i in range(3):
+        order = SalesOrder(description=f'Order {i}')
+        order.opportunity = opportunity
+        order.start_date = datetime(2026, 1, 5)
+        order.base_price = CurrencyValue(Decimal('10.00'), 'EUR')
+        order.save()
+        orders.append(order)
+
+    return account, opportunity, orders
+
+
+def rollups_match(group_by):
+    from crm.reports import sales_totals
+
+    return sales_totals(group_by=group_by, rollup=True) == sales_totals(group_by=group_by)
+
+
+def test_remove_rows_unlinks_in_bulk(orders):
+    from crm.models import Resource, ResourceLog, SalesOrder
+
+    _, opportunity, orders = orders
+    removed = [ orders[0].id, orders[1].id ]
+
+    opportunity = Resource.get_resource(opportunity.id)
+    opportunity.stage_mutation(type(opportunity).sales_orders.remove_rows(removed))
+    opportunity.save()
+
+    assert [ order.id for order in SalesOrder.filter_by(opportunity=opportunity.id) ] == [ orders[2].id ]
+
+    for id in removed:
+        entry = ResourceLog.query.filter_by(resource_id=id, field='opportunity').order_by(ResourceLog.id.desc()).first()
+
+        assert (entry.old_value, entry.new_value) == (opportunity.id, None)
+
+    assert rollups_match([ 'opportunity' ])
+
+
+def test_remove_rows_refreshes_rollups_of_foreign_resources(orders):
+    from crm.models import Account, Resource
+
+    account, opportunity, _ = orders
+
+    account = Resource.get_resource(account.id)
+    account.stage_mutation(Account.opportunities.remove_rows([ opportunity.id ]))
+    account.save()
+
+    assert Resource.get_resource(opportunity.id).instance.account is None
+    assert rollups_match([ 'account' ])
+
+
+def test_remove_rows_is_committed_by_save(orders, db):
+    from crm.models import Resource, SalesOrder
+    from crm.mutation import CommitContext
+
+    _, opportunity, orders = orders
+
+    opportunity = Resource.get_resource(opportunity.id)
+    ctx = CommitContext(opportunity)
+    ctx.add(type(opportunity).sales_orders.remove_rows([ orders[0].id ]))
+    ctx.commit()
+
+    # Nothing has been committed before the owner is saved
+    db.session.rollback()
+
+    assert len(SalesOrder.filter_by(opportunity=opportunity.id)) == 3
+    assert ctx.after_commit_funcs != []
+
+
+def test_remove_rows_logs_only_unlinked_rows(orders):
+    from crm.models import Resource, ResourceLog, SalesOrder
+
+    _, opportunity, orders = orders
+
+    other = SalesOrder(description='Other order')
+    other.save()
+
+    opportunity = Resource.get_resource(opportunity.id)
+    opportunity.stage_mutation(type(opportunity).sales_orders.remove_rows([ orders[0].id, other.id ]))
+    opportunity.save()
+
+    entry = ResourceLog.query.filter_by(resource_id=opportunity.id, field='sales_orders').one()
+
+    assert entry.old_value == [ orders[0].id ]
+
+    # Removing rows which are no longer linked is not logged at all
+    opportunity.stage_mutation(type(opportunity).sales_orders.remove_rows([ orders[0].id ]))
+    opportunity.save()
+
+    assert ResourceLog.query.filter_by(resource_id=opportunity.id, field='sales_orders').count() == 1